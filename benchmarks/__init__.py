@@ -0,0 +1 @@
+"""Offline benchmarks for Rohlik Voice Assistant."""
@@ -0,0 +1,74 @@
+"""Minimal Home Assistant stand-in for driving the integration offline."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+import os
+import tempfile
+from types import SimpleNamespace
+from typing import Any
+
+from custom_components.rohlik_voice import async_create_runtime
+from custom_components.rohlik_voice.const import (
+    CONF_OPENAI_API_KEY,
+    CONF_ROHLIK_EMAIL,
+    CONF_ROHLIK_PASSWORD,
+    DOMAIN,
+)
+
+ENTRY_ID = "benchmark"
+
+
+class FakeHass:
+    """The parts of HomeAssistant the integration uses outside of setup."""
+
+    def __init__(self, config_dir: str | None = None) -> None:
+        """Initialize with a throwaway config directory."""
+        config_dir = config_dir or tempfile.mkdtemp(prefix="rohlik_bench_")
+        self.loop = asyncio.get_running_loop()
+        self.data: dict[str, Any] = {}
+        self.entries: dict[str, SimpleNamespace] = {}
+        self.config = SimpleNamespace(
+            config_dir=config_dir,
+            language="cs",
+            path=lambda *parts: os.path.join(config_dir, *parts),
+        )
+        self.config_entries = SimpleNamespace(async_get_entry=self.entries.get)
+        self.bus = SimpleNamespace(async_fire=lambda event_type, event_data=None: None)
+        # Any token is accepted by the in-process proxy
+        self.auth = SimpleNamespace(async_validate_access_token=lambda token: token)
+
+    def async_add_executor_job(
+        self, target: Callable, *args: Any
+    ) -> asyncio.Future[Any]:
+        """Schedule a blocking function, returning a Future like HA does."""
+        return self.loop.run_in_executor(None, target, *args)
+
+    def async_create_task(self, target: Any, name: str | None = None, **kwargs: Any):
+        """Schedule a coroutine."""
+        return self.loop.create_task(target, name=name)
+
+    def async_create_background_task(
+        self, target: Any, name: str, eager_start: bool = False
+    ):
+        """Schedule a coroutine that is not awaited on shutdown."""
+        return self.loop.create_task(target, name=name)
+
+    async def async_add_entry(
+        self, options: dict[str, Any] | None = None
+    ) -> tuple[SimpleNamespace, dict[str, Any]]:
+        """Create a config entry and its runtime data like async_setup_entry."""
+        entry = SimpleNamespace(
+            entry_id=ENTRY_ID,
+            data={
+                CONF_ROHLIK_EMAIL: "bench@example.com",
+                CONF_ROHLIK_PASSWORD: "secret",
+                CONF_OPENAI_API_KEY: "sk-benchmark",
+            },
+            options=options or {},
+        )
+        data = await async_create_runtime(self, entry)
+        self.entries[entry.entry_id] = entry
+        self.data.setdefault(DOMAIN, {})[entry.entry_id] = data
+        return entry, data
@@ -0,0 +1,364 @@
+"""Concurrent-client load generator for the /api/rohlik_voice/ws proxy.
+
+Opens N simulated card clients. Each client streams PCM16 at real-time pace,
+commits it, alternates with typed ``text`` turns and sends ``ping`` messages,
+measuring ping round trip, audio-out latency (commit to first audio frame)
+and text latency (typed message to first transcript frame of the chat
+agent). The run reports event-loop lag, memory per session and dropped
+audio frames.
+
+By default the proxy view is hosted in-process against the local Realtime,
+chat and MCP stubs, so clients, proxy and stubs share one event loop; loop lag
+is therefore an upper bound for the proxy alone. Use ``--url`` to target a
+running Home Assistant instead (memory and loop lag are then not measured
+on the server side).
+
+Usage (from the repository root, with Home Assistant installed):
+
+    python -m benchmarks.load_ws --clients 8 --turns 5
+    python -m benchmarks.load_ws --clients 4 --pcm recording_24k_mono.raw
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+import math
+import struct
+import time
+import tracemalloc
+from typing import Any
+from unittest.mock import patch
+
+import aiohttp
+from aiohttp import web
+
+from custom_components.rohlik_voice import websocket_api as websocket_api_module
+from custom_components.rohlik_voice.const import WS_PATH
+from custom_components.rohlik_voice.conversation import RohlikConversationAgent
+from custom_components.rohlik_voice.mcp_client import RohlikMCPClient
+from custom_components.rohlik_voice.websocket_api import RohlikVoiceWebSocketView
+
+from .fake_hass import FakeHass
+from .run import make_conversation_input, stub_endpoints
+from .stubs import StubConfig, StubServer
+
+SAMPLE_RATE = 24000
+BYTES_PER_MS = SAMPLE_RATE * 2 // 1000
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Return a nearest-rank percentile, 0 for no samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def synth_utterance(duration_ms: int) -> bytes:
+    """Return a PCM16 tone standing in for recorded speech."""
+    samples = duration_ms * SAMPLE_RATE // 1000
+    return b"".join(
+        struct.pack("<h", int(8000 * math.sin(2 * math.pi * 220 * i / SAMPLE_RATE)))
+        for i in range(samples)
+    )
+
+
+@dataclass
+class LoadStats:
+    """Measurements collected across all clients."""
+
+    ping_rtt_ms: list[float] = field(default_factory=list)
+    audio_out_ms: list[float] = field(default_factory=list)
+    text_out_ms: list[float] = field(default_factory=list)
+    loop_lag_ms: list[float] = field(default_factory=list)
+    frames_expected: int = 0
+    frames_received: int = 0
+    failed_sessions: int = 0
+
+
+class SimulatedClient:
+    """One card client talking to the proxy."""
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        pcm: bytes,
+        chunk_ms: int,
+        frames_per_response: int,
+        stats: LoadStats,
+    ) -> None:
+        """Initialize the client."""
+        self._session = session
+        self._url = url
+        self._pcm = pcm
+        self._chunk_bytes = chunk_ms * BYTES_PER_MS
+        self._chunk_ms = chunk_ms
+        self._frames_per_response = frames_per_response
+        self._stats = stats
+        self._ws: aiohttp.ClientWebSocketResponse | None = None
+        self._frames = 0
+        self._first_frame: asyncio.Event = asyncio.Event()
+        self._transcript: asyncio.Event = asyncio.Event()
+        self._pong: asyncio.Event = asyncio.Event()
+        self._connected: asyncio.Event = asyncio.Event()
+
+    async def run(self, turns: int, ready: asyncio.Barrier | None = None) -> None:
+        """Connect and run a number of turns."""
+        try:
+            ws = await self._session.ws_connect(self._url)
+        except Exception:
+            if ready is not None:
+                await ready.abort()
+            raise
+        async with ws:
+            self._ws = ws
+            reader = asyncio.create_task(self._read())
+            try:
+                try:
+                    await asyncio.wait_for(self._connected.wait(), timeout=15)
+                except asyncio.TimeoutError:
+                    if ready is not None:
+                        await ready.abort()
+                    raise
+                if ready is not None:
+                    await ready.wait()
+                for turn in range(turns):
+                    await self._ping()
+                    if turn % 2:
+                        await self._text_turn()
+                    else:
+                        await self._audio_turn()
+            finally:
+                reader.cancel()
+                await ws.close()
+
+    async def _read(self) -> None:
+        """Consume frames from the proxy."""
+        async for msg in self._ws:
+            if msg.type == aiohttp.WSMsgType.BINARY:
+                self._frames += 1
+                self._first_frame.set()
+            elif msg.type == aiohttp.WSMsgType.TEXT:
+                data = msg.json()
+                if data.get("type") == "connected":
+                    self._connected.set()
+                elif data.get("type") == "pong":
+                    self._pong.set()
+                elif data.get("type") == "transcript":
+                    self._transcript.set()
+
+    async def _ping(self) -> None:
+        """Measure a ping/pong round trip."""
+        self._pong.clear()
+        start = time.perf_counter()
+        await self._ws.send_json({"type": "ping"})
+        await asyncio.wait_for(self._pong.wait(), timeout=10)
+        self._stats.ping_rtt_ms.append((time.perf_counter() - start) * 1000)
+
+    async def _audio_turn(self) -> None:
+        """Stream the utterance at real-time pace and commit it."""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for index, offset in enumerate(range(0, len(self._pcm), self._chunk_bytes)):
+            await self._ws.send_bytes(self._pcm[offset : offset + self._chunk_bytes])
+            # Pace against the wall clock so slow sends do not accumulate
+            delay = start + (index + 1) * self._chunk_ms / 1000 - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await self._await_response({"type": "audio_commit"})
+
+    async def _text_turn(self) -> None:
+        """Send a typed query, answered by the chat agent in transcript frames."""
+        self._transcript.clear()
+        start = time.perf_counter()
+        await self._ws.send_json({"type": "text", "text": "Přidej mléko do košíku"})
+        try:
+            await asyncio.wait_for(self._transcript.wait(), timeout=30)
+        except asyncio.TimeoutError:
+            return
+        self._stats.text_out_ms.append((time.perf_counter() - start) * 1000)
+
+    async def _await_response(self, message: dict) -> None:
+        """Send a message and collect the audio response."""
+        self._frames = 0
+        self._first_frame.clear()
+        self._stats.frames_expected += self._frames_per_response
+        start = time.perf_counter()
+        await self._ws.send_json(message)
+        try:
+            await asyncio.wait_for(self._first_frame.wait(), timeout=30)
+        except asyncio.TimeoutError:
+            return
+        self._stats.audio_out_ms.append((time.perf_counter() - start) * 1000)
+
+        # Response is complete when all frames arrived or the stream goes idle
+        received = -1
+        while self._frames != received and self._frames < self._frames_per_response:
+            received = self._frames
+            await asyncio.sleep(1.0)
+        self._stats.frames_received += min(self._frames, self._frames_per_response)
+
+
+async def monitor_loop_lag(stats: LoadStats, interval: float = 0.05) -> None:
+    """Sample how late the event loop wakes up from a sleep."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        stats.loop_lag_ms.append(max(0.0, (loop.time() - start - interval) * 1000))
+
+
+def agent_converse(agent: RohlikConversationAgent) -> Callable[..., Awaitable[Any]]:
+    """Return an async_converse stand-in, FakeHass has no conversation component."""
+
+    async def async_converse(hass: FakeHass, text: str, *args: Any, **kwargs: Any):
+        return await agent.async_process(make_conversation_input(text))
+
+    return async_converse
+
+
+async def start_local_proxy(
+    server: StubServer,
+) -> tuple[web.AppRunner, str, RohlikMCPClient, RohlikConversationAgent]:
+    """Host the proxy view in-process against the stubs."""
+    hass = FakeHass()
+    entry, data = await hass.async_add_entry()
+    client = data["mcp_client"]
+    agent = RohlikConversationAgent(hass, entry)
+    view = RohlikVoiceWebSocketView(hass)
+    app = web.Application()
+    app.router.add_get(WS_PATH, view.get)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"ws://127.0.0.1:{port}{WS_PATH}", client, agent
+
+
+async def main(args: argparse.Namespace) -> None:
+    """Run the load test and print a report."""
+    if args.pcm:
+        with open(args.pcm, "rb") as pcm_file:
+            pcm = pcm_file.read()
+    else:
+        pcm = synth_utterance(args.utterance_ms)
+
+    config = StubConfig(
+        mcp_latency=args.mcp_latency / 1000,
+        llm_first_token=args.llm_first_token / 1000,
+        audio_chunks=args.audio_chunks,
+        audio_chunk_ms=args.audio_chunk_ms,
+        audio_interval=args.audio_chunk_ms / 1000 if args.paced_audio else 0,
+    )
+    stats = LoadStats()
+    server = StubServer(config)
+    runner = client = agent = None
+    local = args.url is None
+
+    await server.start()
+    with (
+        stub_endpoints(server),
+        patch.object(websocket_api_module.conversation, "async_converse") as converse,
+        patch.object(websocket_api_module, "agent_entity_id", return_value=None),
+    ):
+        if local:
+            runner, url, client, agent = await start_local_proxy(server)
+            converse.side_effect = agent_converse(agent)
+            url += "?token=load"
+            tracemalloc.start()
+            baseline, _ = tracemalloc.get_traced_memory()
+        else:
+            url = args.url
+            if args.token:
+                url += f"?token={args.token}"
+
+        lag_task = asyncio.create_task(monitor_loop_lag(stats))
+        ready = asyncio.Barrier(args.clients + 1)
+        start = time.perf_counter()
+        async with aiohttp.ClientSession() as session:
+            clients = [
+                SimulatedClient(
+                    session, url, pcm, args.chunk_ms, args.audio_chunks, stats
+                )
+                for _ in range(args.clients)
+            ]
+            tasks = [
+                asyncio.create_task(c.run(args.turns, ready)) for c in clients
+            ]
+            # All sessions open at once: sample memory before the turns start
+            current = None
+            try:
+                await asyncio.wait_for(ready.wait(), timeout=30)
+                if local:
+                    current, _ = tracemalloc.get_traced_memory()
+            except (asyncio.TimeoutError, asyncio.BrokenBarrierError):
+                pass
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        elapsed = time.perf_counter() - start
+        lag_task.cancel()
+
+        stats.failed_sessions = sum(isinstance(r, Exception) for r in results)
+        if local:
+            tracemalloc.stop()
+            await runner.cleanup()
+            await agent.close()
+            await client.close()
+    await server.stop()
+
+    dropped = stats.frames_expected - stats.frames_received
+    print(f"sessions          {args.clients} ({stats.failed_sessions} failed), {elapsed:.1f} s")
+    print(
+        f"ping rtt          p50={percentile(stats.ping_rtt_ms, 50):.1f} ms"
+        f"  p95={percentile(stats.ping_rtt_ms, 95):.1f} ms"
+    )
+    print(
+        f"audio-out latency p50={percentile(stats.audio_out_ms, 50):.1f} ms"
+        f"  p95={percentile(stats.audio_out_ms, 95):.1f} ms"
+    )
+    print(
+        f"text latency      p50={percentile(stats.text_out_ms, 50):.1f} ms"
+        f"  p95={percentile(stats.text_out_ms, 95):.1f} ms"
+    )
+    print(
+        f"event-loop lag    p50={percentile(stats.loop_lag_ms, 50):.1f} ms"
+        f"  p99={percentile(stats.loop_lag_ms, 99):.1f} ms"
+        f"  max={max(stats.loop_lag_ms, default=0):.1f} ms"
+    )
+    if current is not None:
+        print(f"memory/session    {(current - baseline) / args.clients / 1024:.1f} KiB")
+    print(
+        f"audio frames      {stats.frames_received}/{stats.frames_expected}"
+        f" received, {dropped} dropped"
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--url", help="proxy URL of a running Home Assistant")
+    parser.add_argument("--token", help="access token for --url")
+    parser.add_argument("--pcm", help="recorded PCM16 24 kHz mono file")
+    parser.add_argument("--utterance-ms", type=int, default=1500)
+    parser.add_argument("--chunk-ms", type=int, default=170, help="client frame size")
+    parser.add_argument("--audio-chunks", type=int, default=25, help="per response")
+    parser.add_argument("--audio-chunk-ms", type=int, default=40)
+    parser.add_argument(
+        "--paced-audio",
+        action="store_true",
+        help="stub streams response audio at real-time pace",
+    )
+    parser.add_argument("--mcp-latency", type=float, default=50, help="ms")
+    parser.add_argument("--llm-first-token", type=float, default=150, help="ms")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,381 @@
+"""Replay recorded conversation turns as repeatable benchmarks.
+
+The integration writes turn traces when "Record conversation turns" is enabled
+in its options, to ``<config>/rohlik_voice_traces/<entry_id>.jsonl`` (rotated
+to ``.1``, ``.2``, ...). Each turn is replayed through a fresh
+``RohlikConversationAgent`` or ``RealtimeAPIHandler`` against stubs that answer
+every OpenAI and MCP request with the recorded response after the recorded
+latency.
+
+Usage (from the repository root, with Home Assistant installed):
+
+    python -m benchmarks.replay /config/rohlik_voice_traces/*.jsonl
+    python -m benchmarks.replay traces.jsonl --speed 0 --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+from collections import deque
+import json
+import time
+from typing import Any
+
+from aiohttp import WSMsgType, web
+
+from custom_components.rohlik_voice.catalog import enabled_tools
+from custom_components.rohlik_voice.conversation import RohlikConversationAgent
+from custom_components.rohlik_voice.realtime_api import (
+    AUDIO_BYTES_PER_MS,
+    RealtimeAPIHandler,
+)
+from custom_components.rohlik_voice.trace import TRACE_AGENT, TRACE_REALTIME
+
+from .fake_hass import FakeHass
+from .run import BenchResult, make_conversation_input, stub_endpoints
+from .stubs import STUB_TOOLS, sse_message
+
+# Input audio is sent in chunks of this length
+AUDIO_CHUNK_MS = 40
+
+
+def load_traces(paths: list[str]) -> list[dict[str, Any]]:
+    """Read traces from JSONL files, oldest first."""
+    traces = []
+    for path in paths:
+        with open(path, encoding="utf-8") as file:
+            traces.extend(json.loads(line) for line in file if line.strip())
+    return sorted(traces, key=lambda trace: trace["started_at"])
+
+
+def assemble_message(deltas: list[dict[str, Any]]) -> dict[str, Any]:
+    """Rebuild an assistant message from recorded stream deltas."""
+    content = ""
+    tool_calls: dict[int, dict[str, Any]] = {}
+    for delta in deltas:
+        content += delta.get("content") or ""
+        for fragment in delta.get("tool_calls") or ():
+            call = tool_calls.setdefault(
+                fragment["index"],
+                {
+                    "id": "",
+                    "type": "function",
+                    "function": {"name": "", "arguments": ""},
+                },
+            )
+            call["id"] = fragment.get("id") or call["id"]
+            function = fragment.get("function", {})
+            call["function"]["name"] += function.get("name") or ""
+            call["function"]["arguments"] += function.get("arguments") or ""
+    message: dict[str, Any] = {"role": "assistant", "content": content or None}
+    if tool_calls:
+        message["tool_calls"] = [tool_calls[index] for index in sorted(tool_calls)]
+    return message
+
+
+class TurnScript:
+    """The recorded responses of one turn, handed out in order."""
+
+    def __init__(self, trace: dict[str, Any], speed: float) -> None:
+        """Split the trace into per-protocol queues."""
+        self.trace = trace
+        self.speed = speed
+        events = trace["events"]
+        self.openai = deque(event for event in events if event["type"] == "openai")
+        self._mcp = [event for event in events if event["type"] == "mcp"]
+        self._used: set[int] = set()
+        # Realtime server events, one list per response, with the offset the
+        # response was requested at: the turn start or the last tool result
+        self.responses: deque[tuple[float, list[dict[str, Any]]]] = deque()
+        current: list[dict[str, Any]] = []
+        requested_at = 0.0
+        for event in events:
+            if event["type"] != "realtime":
+                if not current:
+                    requested_at = event["t"]
+                continue
+            current.append(event)
+            if event["event"].get("type") == "response.done":
+                self.responses.append((requested_at, current))
+                requested_at = event["t"]
+                current = []
+        self.done = asyncio.get_running_loop().create_future()
+
+    async def sleep(self, duration_ms: float | None) -> None:
+        """Wait a recorded duration, scaled by the replay speed."""
+        if duration_ms and self.speed:
+            await asyncio.sleep(duration_ms / 1000 * self.speed)
+
+    def take_mcp(self, tool: str, arguments: dict[str, Any]) -> dict[str, Any] | None:
+        """Return the recorded call matching a request, preferring exact args."""
+        fallback = None
+        for index, event in enumerate(self._mcp):
+            if event["tool"] != tool:
+                continue
+            if index not in self._used and event["arguments"] == arguments:
+                self._used.add(index)
+                return event
+            if fallback is None or index not in self._used:
+                fallback = index
+        if fallback is None:
+            return None
+        self._used.add(fallback)
+        return self._mcp[fallback]
+
+
+class ReplayServer:
+    """Serve the recorded responses of the current turn."""
+
+    def __init__(self) -> None:
+        """Initialize the server."""
+        self.script: TurnScript | None = None
+        self._runner: web.AppRunner | None = None
+        self.port = 0
+
+    @property
+    def mcp_url(self) -> str:
+        """Return the replay MCP endpoint."""
+        return f"http://127.0.0.1:{self.port}/mcp"
+
+    @property
+    def chat_url(self) -> str:
+        """Return the replay chat completions endpoint."""
+        return f"http://127.0.0.1:{self.port}/v1/chat/completions"
+
+    @property
+    def realtime_url(self) -> str:
+        """Return the replay Realtime endpoint."""
+        return f"ws://127.0.0.1:{self.port}/v1/realtime"
+
+    async def handle_mcp(self, request: web.Request) -> web.Response:
+        """Answer MCP requests from the recorded calls."""
+        body = await request.json()
+        message: dict[str, Any] = {"jsonrpc": "2.0", "id": body.get("id")}
+        if body.get("method") == "tools/list":
+            message["result"] = {
+                "tools": [
+                    {
+                        "name": name,
+                        "description": f"Replayed {name}",
+                        "inputSchema": {"type": "object", "properties": {}},
+                    }
+                    for name in STUB_TOOLS
+                ]
+            }
+        else:
+            params = body.get("params", {})
+            event = self.script and self.script.take_mcp(
+                params.get("name"), params.get("arguments", {})
+            )
+            if event is None:
+                message["result"] = {"content": []}
+            else:
+                await self.script.sleep(event["duration_ms"])
+                result = event["result"]
+                if "error" in result:
+                    message["error"] = result["error"]
+                else:
+                    message["result"] = result
+        return web.Response(text=sse_message(message), content_type="text/event-stream")
+
+    async def handle_chat(self, request: web.Request) -> web.StreamResponse:
+        """Answer chat completions with the next recorded response."""
+        body = await request.json()
+        script = self.script
+        event = script.openai.popleft() if script and script.openai else None
+        if event is None:
+            speech = script.trace.get("speech") if script else None
+            deltas = [{"role": "assistant", "content": speech or ""}]
+            event = {"stream": deltas, "duration_ms": 0, "first_token_ms": 0}
+        if "stream" in event:
+            deltas = event["stream"]
+            message = assemble_message(deltas)
+        else:
+            message = event["response"]["choices"][0]["message"]
+            deltas = [{"role": "assistant", **message}]
+            for index, call in enumerate(deltas[0].get("tool_calls") or ()):
+                call["index"] = index
+
+        if not body.get("stream"):
+            await script.sleep(event["duration_ms"])
+            choice = {"index": 0, "message": message}
+            return web.json_response(
+                event.get("response")
+                or {"id": "chatcmpl-replay", "choices": [choice]}
+            )
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        first_token_ms = event.get("first_token_ms") or event["duration_ms"]
+        await script.sleep(first_token_ms)
+        step = (event["duration_ms"] - first_token_ms) / max(len(deltas), 1)
+        for delta in deltas:
+            chunk = {"id": "chatcmpl-replay", "choices": [{"index": 0, "delta": delta}]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await script.sleep(step)
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def handle_realtime(self, request: web.Request) -> web.WebSocketResponse:
+        """Replay the recorded server events of one response per request."""
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        script = self.script
+
+        async def respond() -> None:
+            if not script.responses:
+                await ws.send_json({"type": "response.done", "response": {}})
+                script.done.done() or script.done.set_result(None)
+                return
+            previous, events = script.responses.popleft()
+            for event in events:
+                await script.sleep(event["t"] - previous)
+                previous = event["t"]
+                message = dict(event["event"])
+                if "audio_bytes" in message:
+                    audio = bytes(message.pop("audio_bytes") // 2 * 2)
+                    message["delta"] = base64.b64encode(audio).decode()
+                await ws.send_json(message)
+            if not script.responses:
+                script.done.done() or script.done.set_result(None)
+
+        await ws.send_json({"type": "session.created", "session": {"id": "replay"}})
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            event_type = json.loads(msg.data).get("type")
+            if event_type == "session.update":
+                await ws.send_json({"type": "session.updated"})
+            elif event_type == "response.create":
+                asyncio.create_task(respond())
+        return ws
+
+    async def start(self) -> None:
+        """Start serving on a free port."""
+        app = web.Application()
+        app.router.add_post("/mcp", self.handle_mcp)
+        app.router.add_post("/v1/chat/completions", self.handle_chat)
+        app.router.add_get("/v1/realtime", self.handle_realtime)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        """Stop the server."""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def replay_agent(trace: dict[str, Any]) -> str:
+    """Replay a chat agent turn on a fresh entry and return its speech."""
+    hass = FakeHass()
+    entry, data = await hass.async_add_entry()
+    agent = RohlikConversationAgent(hass, entry)
+    try:
+        result = await agent.async_process(
+            make_conversation_input(trace["input"]["text"])
+        )
+    finally:
+        await agent.close()
+        await data["mcp_client"].close()
+    return result.response.speech.get("plain", {}).get("speech", "")
+
+
+async def replay_realtime(trace: dict[str, Any], script: TurnScript) -> str:
+    """Replay a Realtime turn and return the transcript it produced."""
+    hass = FakeHass()
+    entry, data = await hass.async_add_entry()
+    enabled = enabled_tools(entry.options)
+    transcript: list[str] = []
+
+    async def on_function_call(name: str, arguments: dict) -> Any:
+        return await data["executor"].async_execute(name, arguments, enabled)
+
+    handler = RealtimeAPIHandler(
+        api_key="sk-replay",
+        on_transcript=transcript.append,
+        on_function_call=on_function_call,
+        tools=data["catalog"].llm_tools(enabled),
+    )
+    try:
+        if not await handler.connect():
+            raise RuntimeError("Realtime replay connection failed")
+        turn_input = trace["input"]
+        if "text" in turn_input:
+            await handler.send_text(turn_input["text"])
+        else:
+            # Silence of the recorded length stands in for the user's audio
+            chunk = bytes(AUDIO_CHUNK_MS * AUDIO_BYTES_PER_MS)
+            for _ in range(turn_input.get("audio_ms", 0) // AUDIO_CHUNK_MS):
+                await handler.send_audio(chunk)
+            await handler.commit_audio()
+        await asyncio.wait_for(script.done, timeout=120)
+    finally:
+        await handler.disconnect()
+        await data["mcp_client"].close()
+    return "".join(transcript)
+
+
+async def main(args: argparse.Namespace) -> None:
+    """Replay every trace and report latencies against the recordings."""
+    traces = load_traces(args.traces)
+    server = ReplayServer()
+    await server.start()
+    latencies: dict[str, list[float]] = {TRACE_AGENT: [], TRACE_REALTIME: []}
+    recorded: dict[str, list[float]] = {TRACE_AGENT: [], TRACE_REALTIME: []}
+    mismatches = 0
+    start = time.perf_counter()
+    try:
+        with stub_endpoints(server):
+            for _ in range(args.repeat):
+                for trace in traces:
+                    kind = trace["kind"]
+                    script = server.script = TurnScript(trace, args.speed)
+                    turn_start = time.perf_counter()
+                    if kind == TRACE_AGENT:
+                        speech = await replay_agent(trace)
+                    else:
+                        speech = await replay_realtime(trace, script)
+                    latencies[kind].append((time.perf_counter() - turn_start) * 1000)
+                    recorded[kind].append(trace["duration_ms"] or 0.0)
+                    if speech.strip() != (trace["speech"] or "").strip():
+                        mismatches += 1
+    finally:
+        await server.stop()
+    wall_time = time.perf_counter() - start
+
+    for kind, samples in latencies.items():
+        if not samples:
+            continue
+        print(BenchResult(kind, samples, wall_time).report())
+        original = BenchResult(kind, recorded[kind], wall_time)
+        print(
+            f"{'recorded':<10} p50={original.percentile(50):7.1f} ms  "
+            f"p95={original.percentile(95):7.1f} ms  "
+            f"p99={original.percentile(99):7.1f} ms"
+        )
+    print(f"turns={len(traces) * args.repeat} speech mismatches={mismatches}")
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("traces", nargs="+", help="trace JSONL files")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="scale of the recorded latencies, 0 replays without waiting",
+    )
+    parser.add_argument("--repeat", type=int, default=1)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,288 @@
+"""Offline end-to-end benchmarks for Rohlik Voice Assistant.
+
+Runs the MCP client, the conversation agent and the Realtime handler against
+the local stubs in ``benchmarks.stubs`` and reports turn latency, throughput
+and (optionally) memory allocated by the integration.
+
+Usage (from the repository root, with Home Assistant installed):
+
+    python -m benchmarks.run --turns 50 --concurrency 4
+    python -m benchmarks.run --only agent --allocations
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import ExitStack, contextmanager
+from dataclasses import MISSING, dataclass, fields
+import time
+import tracemalloc
+from typing import Any
+from unittest.mock import patch
+
+from homeassistant.components.conversation import ConversationInput
+from homeassistant.core import Context
+
+from custom_components.rohlik_voice import conversation as conversation_module
+from custom_components.rohlik_voice import mcp_client as mcp_client_module
+from custom_components.rohlik_voice import realtime_api as realtime_module
+from custom_components.rohlik_voice.conversation import RohlikConversationAgent
+from custom_components.rohlik_voice.mcp_client import RohlikMCPClient
+from custom_components.rohlik_voice.realtime_api import RealtimeAPIHandler
+
+from .fake_hass import FakeHass
+from .stubs import StubConfig, StubServer
+
+INTEGRATION_PATH = "custom_components/rohlik_voice"
+
+
+@dataclass
+class BenchResult:
+    """Latency samples and resource usage of one benchmark."""
+
+    name: str
+    latencies_ms: list[float]
+    wall_time: float
+    allocated_kib: float | None = None
+    peak_kib: float | None = None
+
+    def percentile(self, percentile: float) -> float:
+        """Return a nearest-rank percentile of the latencies."""
+        ordered = sorted(self.latencies_ms)
+        rank = max(0, min(len(ordered) - 1, round(percentile / 100 * len(ordered)) - 1))
+        return ordered[rank]
+
+    def report(self) -> str:
+        """Format the result as one table row."""
+        turns = len(self.latencies_ms)
+        row = (
+            f"{self.name:<10} turns={turns:<4} "
+            f"p50={self.percentile(50):7.1f} ms  p95={self.percentile(95):7.1f} ms  "
+            f"p99={self.percentile(99):7.1f} ms  "
+            f"throughput={turns / self.wall_time:6.1f} turns/s"
+        )
+        if self.allocated_kib is not None:
+            row += (
+                f"  alloc={self.allocated_kib / turns:7.1f} KiB/turn"
+                f"  peak={self.peak_kib:8.1f} KiB"
+            )
+        return row
+
+
+@contextmanager
+def stub_endpoints(server: StubServer) -> Iterator[None]:
+    """Point the integration at the stub servers."""
+    with ExitStack() as stack:
+        stack.enter_context(
+            patch.object(mcp_client_module, "ROHLIK_MCP_URL", server.mcp_url)
+        )
+        stack.enter_context(
+            patch.object(conversation_module, "OPENAI_CHAT_URL", server.chat_url)
+        )
+        # FakeHass has no chat sessions to stream into
+        stack.enter_context(
+            patch.object(conversation_module, "STREAMING_SUPPORTED", False)
+        )
+        stack.enter_context(
+            patch.object(realtime_module, "OPENAI_REALTIME_URL", server.realtime_url)
+        )
+        yield
+
+
+def make_conversation_input(text: str) -> ConversationInput:
+    """Build a ConversationInput for whatever HA version is installed."""
+    values: dict[str, Any] = {
+        "text": text,
+        "context": Context(),
+        "conversation_id": None,
+        "device_id": None,
+        "language": "cs",
+        "agent_id": None,
+    }
+    kwargs = {}
+    for dataclass_field in fields(ConversationInput):
+        if dataclass_field.name in values:
+            kwargs[dataclass_field.name] = values[dataclass_field.name]
+        elif (
+            dataclass_field.default is MISSING
+            and dataclass_field.default_factory is MISSING
+        ):
+            kwargs[dataclass_field.name] = None
+    return ConversationInput(**kwargs)
+
+
+async def run_turns(
+    name: str,
+    turn: Callable[[int], Awaitable[None]],
+    turns: int,
+    concurrency: int,
+    allocations: bool,
+) -> BenchResult:
+    """Run turns with bounded concurrency and collect latencies."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def timed(index: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await turn(index)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    # Warm-up turn, not measured
+    await turn(-1)
+
+    if allocations:
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(i) for i in range(turns)))
+    wall_time = time.perf_counter() - start
+
+    result = BenchResult(name, latencies, wall_time)
+    if allocations:
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        integration = [
+            stat
+            for stat in after.compare_to(before, "filename")
+            if INTEGRATION_PATH in stat.traceback[0].filename
+        ]
+        result.allocated_kib = sum(stat.size_diff for stat in integration) / 1024
+        result.peak_kib = peak / 1024
+    return result
+
+
+async def bench_mcp(
+    server: StubServer, turns: int, concurrency: int, allocations: bool
+) -> BenchResult:
+    """Benchmark RohlikMCPClient search round trips."""
+    client = RohlikMCPClient("bench@example.com", "secret")
+
+    async def turn(index: int) -> None:
+        result = await client.search_products(keyword="mléko")
+        assert "error" not in result, result
+
+    try:
+        return await run_turns("mcp", turn, turns, concurrency, allocations)
+    finally:
+        await client.close()
+
+
+async def bench_agent(
+    server: StubServer, turns: int, concurrency: int, allocations: bool
+) -> BenchResult:
+    """Benchmark RohlikConversationAgent.async_process turns."""
+    hass = FakeHass()
+    entry, data = await hass.async_add_entry()
+    client = data["mcp_client"]
+    agent = RohlikConversationAgent(hass, entry)
+    # Repeated turns would be answered from learned plans, without OpenAI
+    plans = patch.object(data["plan_cache"], "lookup", return_value=None)
+
+    async def turn(index: int) -> None:
+        result = await agent.async_process(
+            make_conversation_input("Přidej mléko do košíku")
+        )
+        assert result.response.error_code is None, result.response.speech
+
+    try:
+        with plans:
+            return await run_turns("agent", turn, turns, concurrency, allocations)
+    finally:
+        await agent.close()
+        await client.close()
+
+
+async def bench_realtime(
+    server: StubServer, turns: int, concurrency: int, allocations: bool
+) -> BenchResult:
+    """Benchmark RealtimeAPIHandler text turns including a tool call."""
+    client = RohlikMCPClient("bench@example.com", "secret")
+    audio_chunks = server.config.audio_chunks
+
+    async def session_turn(index: int) -> None:
+        received = 0
+        done = asyncio.get_running_loop().create_future()
+
+        def on_audio_delta(audio: bytes) -> None:
+            nonlocal received
+            received += 1
+            if received == audio_chunks and not done.done():
+                done.set_result(None)
+
+        async def on_function_call(name: str, arguments: dict) -> Any:
+            return await client.search_products(keyword=arguments.get("keyword", ""))
+
+        handler = RealtimeAPIHandler(
+            api_key="sk-benchmark",
+            on_audio_delta=on_audio_delta,
+            on_function_call=on_function_call,
+        )
+        if not await handler.connect():
+            raise RuntimeError("Realtime stub connection failed")
+        try:
+            await handler.send_text("Přidej mléko do košíku")
+            await asyncio.wait_for(done, timeout=30)
+        finally:
+            await handler.disconnect()
+
+    try:
+        return await run_turns(
+            "realtime", session_turn, turns, concurrency, allocations
+        )
+    finally:
+        await client.close()
+
+
+BENCHMARKS = {
+    "mcp": bench_mcp,
+    "agent": bench_agent,
+    "realtime": bench_realtime,
+}
+
+
+async def main(args: argparse.Namespace) -> None:
+    """Start the stubs and run the selected benchmarks."""
+    config = StubConfig(
+        mcp_latency=args.mcp_latency / 1000,
+        products_per_search=args.products,
+        llm_latency=args.llm_latency / 1000,
+        llm_first_token=args.llm_first_token / 1000,
+    )
+    server = StubServer(config)
+    await server.start()
+    try:
+        with stub_endpoints(server):
+            for name in args.only or BENCHMARKS:
+                result = await BENCHMARKS[name](
+                    server, args.turns, args.concurrency, args.allocations
+                )
+                print(result.report())
+    finally:
+        await server.stop()
+    print("stub requests:", dict(sorted(config.stats.items())))
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS))
+    parser.add_argument("--mcp-latency", type=float, default=50, help="ms")
+    parser.add_argument("--llm-latency", type=float, default=300, help="ms")
+    parser.add_argument("--llm-first-token", type=float, default=150, help="ms")
+    parser.add_argument("--products", type=int, default=20, help="per search")
+    parser.add_argument(
+        "--allocations",
+        action="store_true",
+        help="trace memory allocated by the integration (slows the run)",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,340 @@
+"""Local stub servers for the Rohlik MCP and OpenAI APIs.
+
+The stubs speak just enough of each protocol for the integration to run a
+full turn without network access:
+
+- ``POST /mcp`` - Rohlik MCP, answers ``tools/list`` and ``tools/call`` as
+  SSE-framed JSON-RPC messages
+- ``POST /v1/chat/completions`` - OpenAI chat completions with one
+  ``search_products`` tool call per user message
+- ``GET /v1/realtime`` - OpenAI Realtime websocket that calls
+  ``search_products`` and then streams a transcript and PCM16 audio
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+from dataclasses import dataclass, field
+import json
+from typing import Any
+
+from aiohttp import WSMsgType, web
+
+# Tool names the stub MCP server advertises
+STUB_TOOLS = [
+    "search_products",
+    "add_items_to_cart",
+    "get_cart",
+    "remove_cart_item",
+    "update_cart_item",
+    "clear_cart",
+    "get_user_info",
+]
+
+
+@dataclass
+class StubConfig:
+    """Latency and payload knobs shared by all stubs."""
+
+    mcp_latency: float = 0.05
+    products_per_search: int = 20
+    llm_latency: float = 0.3
+    llm_first_token: float = 0.15
+    reply_text: str = "Přidal jsem mléko do košíku."
+    audio_chunks: int = 25
+    audio_chunk_ms: int = 40
+    audio_interval: float = 0.0
+    stats: dict[str, int] = field(default_factory=dict)
+
+    def count(self, key: str, amount: int = 1) -> None:
+        """Increment a request counter."""
+        self.stats[key] = self.stats.get(key, 0) + amount
+
+
+def make_products(count: int) -> list[dict[str, Any]]:
+    """Return a list of fake search results."""
+    return [
+        {
+            "productId": 1000000 + i,
+            "productName": f"Mléko polotučné {i} 1 l",
+            "brand": "Stub",
+            "price": {"amount": 24.9 + i, "currency": "CZK"},
+            "pricePerUnit": {"amount": 24.9 + i, "currency": "CZK", "unit": "l"},
+            "inStock": i % 7 != 0,
+        }
+        for i in range(count)
+    ]
+
+
+def sse_message(payload: dict[str, Any]) -> str:
+    """Frame a JSON-RPC message as an SSE event."""
+    return f"event: message\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def mcp_text_result(data: Any) -> dict[str, Any]:
+    """Wrap data as MCP text content."""
+    return {"content": [{"type": "text", "text": json.dumps(data, ensure_ascii=False)}]}
+
+
+def build_app(config: StubConfig) -> web.Application:
+    """Create an aiohttp application serving all stubs."""
+    app = web.Application()
+    cart: dict[int, int] = {}
+
+    async def handle_mcp(request: web.Request) -> web.Response:
+        body = await request.json()
+        method = body.get("method")
+        config.count(f"mcp.{method}")
+        await asyncio.sleep(config.mcp_latency)
+
+        if method == "tools/list":
+            result: dict[str, Any] = {
+                "tools": [
+                    {
+                        "name": name,
+                        "description": f"Stub {name}",
+                        "inputSchema": {"type": "object", "properties": {}},
+                    }
+                    for name in STUB_TOOLS
+                ]
+            }
+        else:
+            params = body.get("params", {})
+            name = params.get("name")
+            arguments = params.get("arguments", {})
+            config.count(f"mcp.tools/call.{name}")
+            if name == "search_products":
+                result = mcp_text_result(make_products(config.products_per_search))
+            elif name == "add_items_to_cart":
+                for item in arguments.get("items", []):
+                    product_id = int(item["productId"])
+                    cart[product_id] = cart.get(product_id, 0) + int(item["quantity"])
+                result = mcp_text_result({"success": True, "cart": cart})
+            elif name == "update_cart_item":
+                cart[int(arguments["product_id"])] = int(arguments["quantity"])
+                result = mcp_text_result({"success": True})
+            elif name == "remove_cart_item":
+                cart.pop(int(arguments["product_id"]), None)
+                result = mcp_text_result({"success": True})
+            elif name == "clear_cart":
+                cart.clear()
+                result = mcp_text_result({"success": True})
+            elif name == "get_cart":
+                result = mcp_text_result(
+                    {
+                        "items": [
+                            {
+                                "productId": product_id,
+                                "productName": f"Produkt {product_id}",
+                                "quantity": quantity,
+                                "price": {"amount": 24.9, "currency": "CZK"},
+                                "inStock": True,
+                            }
+                            for product_id, quantity in cart.items()
+                        ],
+                        "totalPrice": {
+                            "amount": round(24.9 * sum(cart.values()), 2),
+                            "currency": "CZK",
+                        },
+                    }
+                )
+            else:
+                result = mcp_text_result({"ok": True})
+
+        return web.Response(
+            text=sse_message({"jsonrpc": "2.0", "id": body.get("id"), "result": result}),
+            content_type="text/event-stream",
+        )
+
+    def chat_message(messages: list[dict[str, Any]], with_tools: bool) -> dict[str, Any]:
+        """Return the assistant message for a conversation."""
+        if with_tools and messages[-1].get("role") == "user":
+            return {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {
+                        "id": f"call_{len(messages)}",
+                        "type": "function",
+                        "function": {
+                            "name": "search_products",
+                            "arguments": json.dumps({"keyword": "mléko"}),
+                        },
+                    }
+                ],
+            }
+        return {"role": "assistant", "content": config.reply_text}
+
+    async def handle_chat(request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        config.count("chat.completions")
+        message = chat_message(body["messages"], bool(body.get("tools")))
+        usage = {"prompt_tokens": 500, "completion_tokens": 20, "total_tokens": 520}
+
+        if not body.get("stream"):
+            await asyncio.sleep(config.llm_latency)
+            return web.json_response(
+                {
+                    "id": "chatcmpl-stub",
+                    "model": body.get("model"),
+                    "choices": [
+                        {"index": 0, "message": message, "finish_reason": "stop"}
+                    ],
+                    "usage": usage,
+                }
+            )
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await asyncio.sleep(config.llm_first_token)
+
+        async def send_delta(delta: dict[str, Any], finish: str | None = None) -> None:
+            chunk = {
+                "id": "chatcmpl-stub",
+                "model": body.get("model"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+
+        if message.get("tool_calls"):
+            call = message["tool_calls"][0]
+            await send_delta({"role": "assistant", "tool_calls": [{"index": 0, **call}]})
+            await send_delta({}, "tool_calls")
+        else:
+            words = message["content"].split(" ")
+            step = (config.llm_latency - config.llm_first_token) / max(len(words), 1)
+            await send_delta({"role": "assistant", "content": ""})
+            for i, word in enumerate(words):
+                await send_delta({"content": word if i == 0 else f" {word}"})
+                await asyncio.sleep(step)
+            await send_delta({}, "stop")
+        if body.get("stream_options", {}).get("include_usage"):
+            chunk = {"id": "chatcmpl-stub", "choices": [], "usage": usage}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def handle_realtime(request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        config.count("realtime.sessions")
+        counter = 0
+        pending_call = True
+        chunk = base64.b64encode(bytes(config.audio_chunk_ms * 48)).decode()
+
+        async def respond() -> None:
+            nonlocal counter, pending_call
+            counter += 1
+            response_id = f"resp_{counter}"
+            item_id = f"item_{counter}"
+            await ws.send_json(
+                {"type": "response.created", "response": {"id": response_id}}
+            )
+            await asyncio.sleep(config.llm_first_token)
+            if pending_call:
+                pending_call = False
+                await ws.send_json(
+                    {
+                        "type": "response.function_call_arguments.done",
+                        "response_id": response_id,
+                        "call_id": f"call_{counter}",
+                        "name": "search_products",
+                        "arguments": json.dumps({"keyword": "mléko"}),
+                    }
+                )
+            else:
+                pending_call = True
+                await ws.send_json(
+                    {
+                        "type": "response.audio_transcript.delta",
+                        "response_id": response_id,
+                        "item_id": item_id,
+                        "delta": config.reply_text,
+                    }
+                )
+                for _ in range(config.audio_chunks):
+                    await ws.send_json(
+                        {
+                            "type": "response.audio.delta",
+                            "response_id": response_id,
+                            "item_id": item_id,
+                            "delta": chunk,
+                        }
+                    )
+                    config.count("realtime.audio_chunks")
+                    if config.audio_interval:
+                        await asyncio.sleep(config.audio_interval)
+            await ws.send_json(
+                {
+                    "type": "response.done",
+                    "response": {
+                        "id": response_id,
+                        "status": "completed",
+                        "usage": {
+                            "input_tokens": 800,
+                            "output_tokens": 120,
+                            "input_token_details": {"cached_tokens": 0, "audio_tokens": 300},
+                            "output_token_details": {"audio_tokens": 100},
+                        },
+                    },
+                }
+            )
+
+        await ws.send_json({"type": "session.created", "session": {"id": "sess_stub"}})
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            event = json.loads(msg.data)
+            event_type = event.get("type")
+            config.count(f"realtime.{event_type}")
+            if event_type == "session.update":
+                await ws.send_json({"type": "session.updated"})
+            elif event_type == "response.create":
+                asyncio.create_task(respond())
+        return ws
+
+    app.router.add_post("/mcp", handle_mcp)
+    app.router.add_post("/v1/chat/completions", handle_chat)
+    app.router.add_get("/v1/realtime", handle_realtime)
+    return app
+
+
+class StubServer:
+    """Run the stub application on a local port."""
+
+    def __init__(self, config: StubConfig | None = None) -> None:
+        """Initialize the server."""
+        self.config = config or StubConfig()
+        self._runner: web.AppRunner | None = None
+        self.port = 0
+
+    @property
+    def mcp_url(self) -> str:
+        """Return the stub MCP endpoint."""
+        return f"http://127.0.0.1:{self.port}/mcp"
+
+    @property
+    def chat_url(self) -> str:
+        """Return the stub chat completions endpoint."""
+        return f"http://127.0.0.1:{self.port}/v1/chat/completions"
+
+    @property
+    def realtime_url(self) -> str:
+        """Return the stub Realtime endpoint."""
+        return f"ws://127.0.0.1:{self.port}/v1/realtime"
+
+    async def start(self) -> None:
+        """Start serving on a free port."""
+        self._runner = web.AppRunner(build_app(self.config))
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        """Stop the server."""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
@@ -2,58 +2,203 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
+from typing import Any
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
-from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
 
 from .const import (
     DOMAIN,
     CONF_ROHLIK_EMAIL,
     CONF_ROHLIK_PASSWORD,
     CONF_OPENAI_API_KEY,
+    CATALOG_REFRESH_INTERVAL,
+    DATA_VIEWS_REGISTERED,
+    MCP_RETRY_MIN,
     PLATFORMS,
+    WRITE_QUEUE_REPLAY_INTERVAL,
 )
+from .cart_watch import CartWatchdog
+from .catalog import ToolCatalog
+from .executor import RohlikToolExecutor
+from .history import PurchaseHistory
 from .mcp_client import RohlikMCPClient
+from .metrics import LatencyMetrics
+from .phrase_audio import PhraseAudioCache
+from .plan_cache import PlanCache
+from .prefetch import SearchCache
+from .product_index import ProductIndex
+from .ranker import ProductRanker
+from .trace import TraceRecorder
+from .usage import UsageTracker
+from .router import ModelRouter
+from .profiler import LoopLagMonitor
+from .services import async_register_services, async_unregister_services
+from .write_queue import WriteQueue
 
 _LOGGER = logging.getLogger(__name__)
 
 
-async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-    """Set up Rohlik Voice Assistant from a config entry."""
-    _LOGGER.info("Setting up Rohlik Voice Assistant v2.0")
-
+async def async_create_runtime(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Create the per-entry objects stored in hass.data, without network I/O."""
     # Get credentials from config entry (stored encrypted)
     email = entry.data[CONF_ROHLIK_EMAIL]
     password = entry.data[CONF_ROHLIK_PASSWORD]
     api_key = entry.data[CONF_OPENAI_API_KEY]
 
-    # Create MCP client
-    mcp_client = RohlikMCPClient(email, password)
+    # Per-stage latency metrics shared by all components
+    metrics = LatencyMetrics()
 
-    # Test connection
-    try:
-        if not await mcp_client.test_connection():
-            raise ConfigEntryNotReady("Failed to connect to Rohlik MCP server")
-    except Exception as err:
-        await mcp_client.close()
-        raise ConfigEntryNotReady(f"Error connecting to Rohlik: {err}") from err
+    # Create MCP client; the connection is checked in the background
+    mcp_client = RohlikMCPClient(email, password, metrics=metrics)
 
-    # Store in hass.data
-    hass.data.setdefault(DOMAIN, {})
-    hass.data[DOMAIN][entry.entry_id] = {
+    # Tool schemas from the last run, refreshed once the server answers
+    catalog = ToolCatalog(hass, entry.entry_id, mcp_client)
+    await catalog.async_load()
+
+    # Products seen in search and cart results, searchable offline
+    product_index = ProductIndex(hass, entry.entry_id)
+    await product_index.async_load()
+    mcp_client.add_result_listener(product_index.observe)
+
+    # Successful cart adds, the basis of ranking and "the usual"
+    history = PurchaseHistory(hass, entry.entry_id)
+    await history.async_load()
+    mcp_client.add_result_listener(history.observe)
+
+    # Cart writes accepted while Rohlik is down, replayed on recovery
+    write_queue = WriteQueue(hass, entry.entry_id, mcp_client)
+    await write_queue.async_load()
+    mcp_client.add_result_listener(write_queue.observe)
+
+    # Cart snapshots diffed for stock and price changes
+    cart_watch = CartWatchdog(hass, entry, mcp_client)
+    mcp_client.add_result_listener(cart_watch.observe)
+
+    # Tool-call plans learned for repeated phrasings
+    plan_cache = PlanCache(hass, entry.entry_id)
+    await plan_cache.async_load()
+
+    # Token usage and cost, checked against the daily budget
+    usage = UsageTracker(hass, entry)
+    await usage.async_load()
+
+    # Searches shared between speculative prefetches and tool calls
+    search_cache = SearchCache(hass, mcp_client, product_index)
+
+    return {
         "mcp_client": mcp_client,
         "openai_api_key": api_key,
+        "metrics": metrics,
+        "catalog": catalog,
+        "product_index": product_index,
+        "search_cache": search_cache,
+        "history": history,
+        "write_queue": write_queue,
+        "plan_cache": plan_cache,
+        "cart_watch": cart_watch,
+        # Picks the chat model per turn from the entry options
+        "router": ModelRouter(entry, usage),
+        "usage": usage,
+        "trace_recorder": TraceRecorder(hass, entry),
+        # Reply audio for the card's assist mode, loaded on first use
+        "phrase_audio": PhraseAudioCache(hass),
+        "executor": RohlikToolExecutor(
+            mcp_client,
+            catalog,
+            product_index,
+            search_cache,
+            ProductRanker(history, entry),
+            history,
+            write_queue,
+            cart_watch,
+            usage,
+        ),
     }
 
+
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Set up Rohlik Voice Assistant from a config entry."""
+    _LOGGER.info("Setting up Rohlik Voice Assistant v2.0")
+
+    data = await async_create_runtime(hass, entry)
+
+    # Log event-loop stalls caused by this integration
+    loop_monitor = LoopLagMonitor(hass)
+    loop_monitor.async_start()
+    data["loop_monitor"] = loop_monitor
+
+    # Store in hass.data
+    hass.data.setdefault(DOMAIN, {})
+    hass.data[DOMAIN][entry.entry_id] = data
+
+    async_register_services(hass)
+    _async_register_views(hass)
+
     # Set up platforms (conversation agent)
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
+    # Don't hold up startup on a slow or unreachable Rohlik server
+    entry.async_create_background_task(
+        hass, _async_warm_up(data["mcp_client"], data["catalog"]), f"{DOMAIN}_warm_up"
+    )
+
+    async def _async_refresh_catalog(_now: Any) -> None:
+        """Pick up tool schema changes without a restart."""
+        await data["catalog"].async_refresh()
+        # Results of the old schema must not outlive it
+        data["search_cache"].invalidate()
+
+    entry.async_on_unload(
+        async_track_time_interval(
+            hass, _async_refresh_catalog, CATALOG_REFRESH_INTERVAL
+        )
+    )
+
+    async def _async_replay_writes(_now: Any) -> None:
+        """Probe for recovery while cart writes are queued."""
+        await data["write_queue"].async_replay()
+
+    entry.async_on_unload(
+        async_track_time_interval(
+            hass, _async_replay_writes, WRITE_QUEUE_REPLAY_INTERVAL
+        )
+    )
+
+    # Poll the cart in the background, faster while it is being edited
+    data["cart_watch"].async_start()
+    entry.async_on_unload(data["cart_watch"].async_stop)
+
     _LOGGER.info("Rohlik Voice Assistant setup complete")
     return True
 
 
+async def _async_warm_up(mcp_client: RohlikMCPClient, catalog: ToolCatalog) -> None:
+    """Validate the Rohlik connection and fetch tools, retrying with backoff."""
+    while not await mcp_client.async_warm_up():
+        await asyncio.sleep(mcp_client.retry_in or MCP_RETRY_MIN)
+    await catalog.async_update(mcp_client.tools)
+
+
+@callback
+def _async_register_views(hass: HomeAssistant) -> None:
+    """Register the audio proxy and websocket commands once."""
+    if hass.data.get(DATA_VIEWS_REGISTERED):
+        return
+
+    # Imported lazily, the Realtime client itself loads on the first session
+    from .websocket_api import RohlikVoiceWebSocketView, async_register_websocket_api
+
+    hass.http.register_view(RohlikVoiceWebSocketView(hass))
+    async_register_websocket_api(hass)
+    hass.data[DATA_VIEWS_REGISTERED] = True
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     _LOGGER.info("Unloading Rohlik Voice Assistant")
@@ -66,8 +211,16 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         mcp_client = hass.data[DOMAIN][entry.entry_id].get("mcp_client")
         if mcp_client:
             await mcp_client.close()
+        await hass.data[DOMAIN][entry.entry_id]["product_index"].async_save()
+        await hass.data[DOMAIN][entry.entry_id]["history"].async_save()
+        await hass.data[DOMAIN][entry.entry_id]["plan_cache"].async_save()
+        await hass.data[DOMAIN][entry.entry_id]["usage"].async_save()
+        hass.data[DOMAIN][entry.entry_id]["loop_monitor"].async_stop()
         hass.data[DOMAIN].pop(entry.entry_id)
 
+    if not hass.data.get(DOMAIN):
+        async_unregister_services(hass)
+
     return unload_ok
 
 
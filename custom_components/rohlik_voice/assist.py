@@ -0,0 +1,290 @@
+"""Card audio through a Home Assistant Assist pipeline."""
+
+from __future__ import annotations
+
+from array import array
+import asyncio
+from collections.abc import AsyncIterator
+import io
+import logging
+from typing import Any
+import wave
+
+from aiohttp import web
+
+from homeassistant.components import stt, tts
+from homeassistant.components.assist_pipeline import (
+    Pipeline,
+    PipelineEvent,
+    PipelineEventType,
+    PipelineNotFound,
+    PipelineStage,
+    async_get_pipeline,
+    async_pipeline_from_audio_stream,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import Context, HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+
+from .codec import json_loads, send_json
+from .const import CONF_ASSIST_PIPELINE, DOMAIN
+from .conversation import agent_entity_id
+from .phrase_audio import FIXED_PHRASES, PhraseAudioCache, is_cacheable, voice_key
+from .websocket_api import async_card_text_turn
+
+_LOGGER = logging.getLogger(__name__)
+
+# The card records and plays 24 kHz mono PCM16, STT engines take 16 kHz
+CARD_SAMPLE_RATE = 24000
+SAMPLE_BYTES = 2
+# TTS audio is sent to the card in frames of this length
+TTS_FRAME_MS = 100
+
+TTS_AUDIO_OUTPUT = {
+    tts.ATTR_PREFERRED_FORMAT: "wav",
+    tts.ATTR_PREFERRED_SAMPLE_RATE: CARD_SAMPLE_RATE,
+    tts.ATTR_PREFERRED_SAMPLE_CHANNELS: 1,
+    tts.ATTR_PREFERRED_SAMPLE_BYTES: SAMPLE_BYTES,
+}
+
+
+class Downsampler:
+    """Convert 24 kHz PCM16 chunks to 16 kHz, carrying partial frames over."""
+
+    def __init__(self) -> None:
+        """Initialize the downsampler."""
+        self._rest = b""
+
+    def convert(self, pcm: bytes) -> bytes:
+        """Return every 3 input samples as 2 output samples."""
+        data = self._rest + pcm
+        usable = len(data) // (3 * SAMPLE_BYTES) * (3 * SAMPLE_BYTES)
+        self._rest = data[usable:]
+        samples = array("h", data[:usable])
+        out = array("h", bytes(usable * 2 // 3))
+        out[0::2] = samples[0::3]
+        out[1::2] = array(
+            "h", ((a + b) >> 1 for a, b in zip(samples[1::3], samples[2::3]))
+        )
+        return out.tobytes()
+
+
+def wav_to_pcm(data: bytes) -> bytes | None:
+    """Return the frames of a WAV file in the card's format, else None."""
+    try:
+        with wave.open(io.BytesIO(data)) as wav:
+            if (
+                wav.getframerate() != CARD_SAMPLE_RATE
+                or wav.getnchannels() != 1
+                or wav.getsampwidth() != SAMPLE_BYTES
+            ):
+                return None
+            return wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        return None
+
+
+class AssistCardSession:
+    """Run card turns through an Assist pipeline with the Rohlik agent."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        ws: web.WebSocketResponse,
+        phrase_audio: PhraseAudioCache,
+    ) -> None:
+        """Initialize the session."""
+        self._hass = hass
+        self._entry = entry
+        self._ws = ws
+        self._phrase_audio = phrase_audio
+        self._pipeline: Pipeline | None = None
+        self._audio: asyncio.Queue[bytes | None] | None = None
+        self._downsampler = Downsampler()
+        self._turn: asyncio.Task | None = None
+        self._turns = 0
+        self._conversation_id: str | None = None
+
+    def _pipeline_error(self) -> str | None:
+        """Load the configured pipeline, or return why it cannot be used."""
+        pipeline_id = self._entry.options.get(CONF_ASSIST_PIPELINE) or None
+        try:
+            pipeline = async_get_pipeline(self._hass, pipeline_id)
+        except PipelineNotFound:
+            return f"Asistent {pipeline_id} neexistuje"
+        if pipeline.stt_engine is None or pipeline.tts_engine is None:
+            return f"Asistent {pipeline.name} nemá nastavený převod řeči"
+        agent_id = agent_entity_id(self._hass, self._entry.entry_id)
+        if pipeline.conversation_engine not in (agent_id, self._entry.entry_id):
+            return f"Asistent {pipeline.name} nepoužívá agenta Rohlik Voice"
+        self._pipeline = pipeline
+        return None
+
+    @property
+    def _tts_options(self) -> dict[str, Any]:
+        """Return the TTS options of the pipeline voice in the card's format."""
+        options = dict(TTS_AUDIO_OUTPUT)
+        if self._pipeline.tts_voice:
+            options[tts.ATTR_VOICE] = self._pipeline.tts_voice
+        return options
+
+    @property
+    def _voice(self) -> str:
+        """Return the phrase cache key of the pipeline voice."""
+        return voice_key(
+            self._pipeline.tts_engine, self._pipeline.tts_language, self._tts_options
+        )
+
+    async def async_handle(self) -> None:
+        """Serve the card until it disconnects."""
+        if error := self._pipeline_error():
+            await send_json(self._ws, {"type": "error", "message": error})
+            await self._ws.close()
+            return
+        await send_json(self._ws, {"type": "connected"})
+        prewarm = self._hass.async_create_background_task(
+            self._async_prewarm(), f"{DOMAIN}_phrase_prewarm"
+        )
+        try:
+            async for msg in self._ws:
+                if msg.type == web.WSMsgType.BINARY:
+                    self._audio_chunk(msg.data)
+                elif msg.type == web.WSMsgType.TEXT:
+                    try:
+                        data = msg.json(loads=json_loads)
+                        msg_type = data.get("type", "")
+
+                        if msg_type == "audio_commit":
+                            if self._audio is not None:
+                                self._audio.put_nowait(None)
+                                self._audio = None
+                        elif msg_type == "text":
+                            text = data.get("text", "")
+                            self._start_turn(self._async_text_turn(text))
+                        elif msg_type == "ping":
+                            await send_json(self._ws, {"type": "pong"})
+
+                    except Exception as err:
+                        _LOGGER.error("Error processing message: %s", err)
+                elif msg.type == web.WSMsgType.ERROR:
+                    _LOGGER.error("WebSocket error: %s", self._ws.exception())
+                    break
+        finally:
+            prewarm.cancel()
+            if self._audio is not None:
+                self._audio.put_nowait(None)
+            if self._turn is not None:
+                self._turn.cancel()
+
+    async def _async_prewarm(self) -> None:
+        """Synthesize the fixed replies the cache lacks for the pipeline voice."""
+        voice = self._voice
+        for text in FIXED_PHRASES:
+            if not await self._phrase_audio.async_contains(voice, text):
+                if (pcm := await self._async_synthesize(text)) is not None:
+                    await self._phrase_audio.async_put(voice, text, pcm)
+
+    def _start_turn(self, coro: Any) -> None:
+        """Run a turn, replacing one still in progress (barge-in)."""
+        if self._turn is not None and not self._turn.done():
+            self._turn.cancel()
+        self._turns += 1
+        self._turn = self._hass.async_create_background_task(
+            coro, f"{DOMAIN}_assist_turn"
+        )
+
+    def _audio_chunk(self, pcm: bytes) -> None:
+        """Feed microphone audio into the current pipeline run."""
+        if self._audio is None:
+            self._audio = asyncio.Queue()
+            self._downsampler = Downsampler()
+            self._start_turn(self._async_audio_turn(self._audio))
+        self._audio.put_nowait(self._downsampler.convert(pcm))
+
+    async def _async_audio_turn(self, audio: asyncio.Queue[bytes | None]) -> None:
+        """Run the pipeline from speech to the agent's reply, then speak it."""
+        events: dict[PipelineEventType, dict[str, Any]] = {}
+
+        def on_event(event: PipelineEvent) -> None:
+            events[event.type] = event.data or {}
+
+        async def stt_stream() -> AsyncIterator[bytes]:
+            while (chunk := await audio.get()) is not None:
+                yield chunk
+
+        await async_pipeline_from_audio_stream(
+            self._hass,
+            context=Context(),
+            event_callback=on_event,
+            stt_metadata=stt.SpeechMetadata(
+                language=self._hass.config.language,
+                format=stt.AudioFormats.WAV,
+                codec=stt.AudioCodecs.PCM,
+                bit_rate=stt.AudioBitRates.BITRATE_16,
+                sample_rate=stt.AudioSampleRates.SAMPLERATE_16000,
+                channel=stt.AudioChannels.CHANNEL_MONO,
+            ),
+            stt_stream=stt_stream(),
+            pipeline_id=self._pipeline.id,
+            conversation_id=self._conversation_id,
+            # Speech is synthesized here, so repeated replies come from the cache
+            end_stage=PipelineStage.INTENT,
+        )
+
+        if error := events.get(PipelineEventType.ERROR):
+            await send_json(
+                self._ws, {"type": "error", "message": error.get("message", "")}
+            )
+            return
+        if intent := events.get(PipelineEventType.INTENT_END):
+            output = intent.get("intent_output", {})
+            self._conversation_id = output.get("conversation_id")
+            speech = output.get("response", {}).get("speech", {}).get("plain", {})
+            if text := speech.get("speech"):
+                await send_json(self._ws, {"type": "transcript", "text": text})
+                await self._async_speak(text)
+
+    async def _async_text_turn(self, text: str) -> None:
+        """Answer a typed message with the Rohlik agent, without audio."""
+        self._conversation_id = await async_card_text_turn(
+            self._hass, self._entry.entry_id, self._ws, text, self._conversation_id
+        )
+
+    async def _async_synthesize(self, text: str) -> bytes | None:
+        """Return the reply spoken by the pipeline's TTS engine as card PCM."""
+        media_id = tts.generate_media_source_id(
+            self._hass,
+            text,
+            engine=self._pipeline.tts_engine,
+            language=self._pipeline.tts_language,
+            options=self._tts_options,
+        )
+        try:
+            extension, data = await tts.async_get_media_source_audio(
+                self._hass, media_id
+            )
+        except HomeAssistantError as err:
+            _LOGGER.error("Failed to get TTS audio: %s", err)
+            return None
+        pcm = wav_to_pcm(data) if extension == "wav" else None
+        if pcm is None:
+            _LOGGER.error("TTS returned %s audio the card cannot play", extension)
+        return pcm
+
+    async def _async_speak(self, text: str) -> None:
+        """Send a reply's audio, from the phrase cache when it was spoken before."""
+        voice = self._voice
+        cacheable = is_cacheable(text)
+        pcm = await self._phrase_audio.async_get(voice, text) if cacheable else None
+        if pcm is None:
+            if (pcm := await self._async_synthesize(text)) is None:
+                return
+            if cacheable:
+                await self._phrase_audio.async_put(voice, text, pcm)
+        await send_json(
+            self._ws, {"type": "audio_start", "item_id": f"assist_{self._turns}"}
+        )
+        frame = CARD_SAMPLE_RATE * SAMPLE_BYTES * TTS_FRAME_MS // 1000
+        for start in range(0, len(pcm), frame):
+            await self._ws.send_bytes(pcm[start : start + frame])
@@ -0,0 +1,256 @@
+"""Background watch of the cart for stock and price changes."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+import logging
+import time
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import async_call_later
+from homeassistant.util import dt as dt_util
+
+from .const import CONF_DELIVERY_CUTOFF, DOMAIN
+from .mcp_client import RohlikMCPClient
+from .parsers import Product, parse_cart
+
+_LOGGER = logging.getLogger(__name__)
+
+EVENT_CART_CHANGED = f"{DOMAIN}_cart_changed"
+# Formatted with the entry id
+SIGNAL_CART_UPDATED = f"{DOMAIN}_cart_updated_{{}}"
+
+# Polling intervals (seconds): empty cart, filled cart, shortly after a
+# cart write or before the delivery cutoff
+IDLE_INTERVAL = 30 * 60
+CART_INTERVAL = 10 * 60
+ACTIVE_INTERVAL = 2 * 60
+# How long a cart write keeps the watch active
+ACTIVE_WINDOW = 15 * 60
+# How long before the delivery cutoff the watch is active
+CUTOFF_WINDOW = timedelta(hours=2)
+# Let the warm-up reach the server before the first check
+START_DELAY = 60
+# A snapshot this fresh answers status questions without a call
+MAX_STATUS_AGE = CART_INTERVAL
+
+CART_WRITES = frozenset(
+    {"add_items_to_cart", "update_cart_item", "remove_cart_item", "clear_cart"}
+)
+
+
+@dataclass(slots=True)
+class CartDiff:
+    """Changes between two cart snapshots."""
+
+    added: list[Product] = field(default_factory=list)
+    removed: list[Product] = field(default_factory=list)
+    # (before, after) pairs
+    quantity: list[tuple[Product, Product]] = field(default_factory=list)
+    price: list[tuple[Product, Product]] = field(default_factory=list)
+    stock: list[tuple[Product, Product]] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        """Return True if anything changed."""
+        return bool(
+            self.added or self.removed or self.quantity or self.price or self.stock
+        )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the changes as event data."""
+        return {
+            "added": [product.as_dict() for product in self.added],
+            "removed": [product.as_dict() for product in self.removed],
+            "quantity_changed": [
+                {
+                    "id": new.id,
+                    "name": new.name,
+                    "old": old.quantity,
+                    "new": new.quantity,
+                }
+                for old, new in self.quantity
+            ],
+            "price_changed": [
+                {"id": new.id, "name": new.name, "old": old.price, "new": new.price}
+                for old, new in self.price
+            ],
+            "out_of_stock": [
+                {"id": new.id, "name": new.name}
+                for _, new in self.stock
+                if new.in_stock is False
+            ],
+            "back_in_stock": [
+                {"id": new.id, "name": new.name}
+                for _, new in self.stock
+                if new.in_stock is not False
+            ],
+        }
+
+
+def diff_carts(old: dict[int, Product], new: dict[int, Product]) -> CartDiff:
+    """Compare two snapshots line by line."""
+    diff = CartDiff()
+    for product_id, after in new.items():
+        before = old.get(product_id)
+        if before is None:
+            diff.added.append(after)
+            continue
+        if before.quantity != after.quantity:
+            diff.quantity.append((before, after))
+        if before.price != after.price:
+            diff.price.append((before, after))
+        if (before.in_stock is False) != (after.in_stock is False):
+            diff.stock.append((before, after))
+    diff.removed.extend(
+        product for product_id, product in old.items() if product_id not in new
+    )
+    return diff
+
+
+class CartWatchdog:
+    """Poll the cart at an adaptive interval and report what changed."""
+
+    def __init__(
+        self, hass: HomeAssistant, entry: ConfigEntry, mcp_client: RohlikMCPClient
+    ) -> None:
+        """Initialize the watchdog."""
+        self._hass = hass
+        self._entry = entry
+        self._mcp_client = mcp_client
+        self._snapshot: dict[int, Product] | None = None
+        # Price of each cart line when it was first seen
+        self._added_prices: dict[int, float | None] = {}
+        self.total: float | None = None
+        self._updated_at = 0.0
+        self._last_write = float("-inf")
+        self._next_check = 0.0
+        self._unsub: CALLBACK_TYPE | None = None
+
+    @property
+    def items(self) -> list[Product]:
+        """Return the lines of the last snapshot."""
+        return list(self._snapshot.values()) if self._snapshot else []
+
+    @property
+    def unavailable(self) -> list[Product]:
+        """Return cart lines that are out of stock."""
+        return [product for product in self.items if product.in_stock is False]
+
+    @property
+    def price_changes(self) -> list[tuple[Product, float]]:
+        """Return cart lines whose price changed since added, with the old price."""
+        return [
+            (product, old)
+            for product in self.items
+            if (old := self._added_prices.get(product.id)) is not None
+            and product.price is not None
+            and product.price != old
+        ]
+
+    @callback
+    def async_start(self) -> None:
+        """Start watching."""
+        self._schedule(START_DELAY)
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop watching."""
+        if self._unsub is not None:
+            self._unsub()
+            self._unsub = None
+
+    @callback
+    def _schedule(self, delay: float) -> None:
+        """Schedule the next check, replacing a pending one."""
+        self.async_stop()
+        self._next_check = time.monotonic() + delay
+        self._unsub = async_call_later(self._hass, delay, self._async_check)
+
+    async def _async_check(self, _now: datetime) -> None:
+        """Fetch the cart unless Rohlik is backing off, then reschedule."""
+        self._unsub = None
+        if not self._mcp_client.retry_in:
+            # The result reaches observe like any other get_cart call
+            await self._mcp_client.get_cart()
+        self._schedule(self.interval())
+
+    def interval(self) -> float:
+        """Return the seconds until the next check."""
+        if time.monotonic() - self._last_write < ACTIVE_WINDOW or self._near_cutoff():
+            return ACTIVE_INTERVAL
+        return CART_INTERVAL if self._snapshot else IDLE_INTERVAL
+
+    def _near_cutoff(self) -> bool:
+        """Return True shortly before the configured daily order cutoff."""
+        value = self._entry.options.get(CONF_DELIVERY_CUTOFF)
+        if not value or (cutoff := dt_util.parse_time(value)) is None:
+            return False
+        now = dt_util.now()
+        deadline = now.replace(
+            hour=cutoff.hour, minute=cutoff.minute, second=0, microsecond=0
+        )
+        return timedelta(0) <= deadline - now <= CUTOFF_WINDOW
+
+    def observe(
+        self, tool_name: str, arguments: dict[str, Any], result: dict[str, Any]
+    ) -> None:
+        """Diff cart reads, and check sooner after cart writes."""
+        if tool_name == "get_cart":
+            if (cart := parse_cart(result)) is not None:
+                self._update(cart.items, cart.total)
+        elif tool_name in CART_WRITES and not result.get("isError"):
+            self._last_write = time.monotonic()
+            if self._unsub and self._next_check - self._last_write > ACTIVE_INTERVAL:
+                self._schedule(ACTIVE_INTERVAL)
+
+    def _update(self, items: list[Product], total: float | None) -> None:
+        """Replace the snapshot and announce what changed."""
+        new = {product.id: product for product in items}
+        old, self._snapshot = self._snapshot, new
+        self.total = total
+        self._updated_at = time.monotonic()
+        for product_id in self._added_prices.keys() - new.keys():
+            del self._added_prices[product_id]
+        for product in items:
+            self._added_prices.setdefault(product.id, product.price)
+
+        if old is None:
+            async_dispatcher_send(
+                self._hass, SIGNAL_CART_UPDATED.format(self._entry.entry_id)
+            )
+            return
+        if not (diff := diff_carts(old, new)):
+            return
+        _LOGGER.debug("Cart changed: %s", diff)
+        self._hass.bus.async_fire(
+            EVENT_CART_CHANGED, {"entry_id": self._entry.entry_id, **diff.as_dict()}
+        )
+        async_dispatcher_send(
+            self._hass, SIGNAL_CART_UPDATED.format(self._entry.entry_id)
+        )
+
+    async def async_status(self) -> dict[str, Any]:
+        """Return missing items and price changes, from the snapshot if fresh."""
+        if (
+            self._snapshot is None
+            or time.monotonic() - self._updated_at > MAX_STATUS_AGE
+        ):
+            result = await self._mcp_client.get_cart()
+            if "error" in result:
+                return result
+            if self._snapshot is None:
+                return {"error": "Košík se nepodařilo přečíst"}
+        return {
+            "items": len(self._snapshot),
+            "total": self.total,
+            "unavailable": [product.name for product in self.unavailable],
+            "price_changes": [
+                {"name": product.name, "old": old, "new": product.price}
+                for product, old in self.price_changes
+            ],
+            "checked_seconds_ago": round(time.monotonic() - self._updated_at),
+        }
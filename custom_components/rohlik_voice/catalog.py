@@ -0,0 +1,158 @@
+"""Cached, versioned catalog of Rohlik MCP tools."""
+
+from __future__ import annotations
+
+from collections.abc import Collection, Mapping
+import hashlib
+import json
+import logging
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN, CONF_ENABLED_TOOLS
+from .mcp_client import RohlikMCPClient
+from .tools import ROHLIK_TOOLS, build_system_prompt
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+
+# Built-in tools and the upstream MCP tool each of them wraps
+BUILTIN_TOOLS: dict[str, str] = {
+    "search_products": "search_products",
+    "add_to_cart": "add_items_to_cart",
+    "get_cart": "get_cart",
+    "remove_from_cart": "remove_cart_item",
+    "update_cart_item": "update_cart_item",
+    "clear_cart": "clear_cart",
+    "reorder_usual": "add_items_to_cart",
+    "check_cart": "get_cart",
+}
+
+DEFAULT_ENABLED_TOOLS = list(BUILTIN_TOOLS)
+
+
+def enabled_tools(options: Mapping[str, Any]) -> list[str]:
+    """Return the tool names enabled in the config entry options."""
+    return options.get(CONF_ENABLED_TOOLS, DEFAULT_ENABLED_TOOLS)
+
+
+def schema_hash(tools: list[dict[str, Any]]) -> str:
+    """Return a stable hash of upstream tool schemas."""
+    canonical = json.dumps(tools, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+def translate_tool(mcp_tool: dict[str, Any]) -> dict[str, Any]:
+    """Translate an MCP tool schema to an OpenAI function definition."""
+    parameters = dict(mcp_tool.get("inputSchema") or {})
+    parameters.setdefault("type", "object")
+    parameters.setdefault("properties", {})
+    # OpenAI rejects JSON Schema meta keys in function parameters
+    parameters.pop("$schema", None)
+    return {
+        "type": "function",
+        "name": mcp_tool["name"],
+        "description": mcp_tool.get("description", ""),
+        "parameters": parameters,
+    }
+
+
+class ToolCatalog:
+    """Upstream tool schemas, persisted and keyed by schema hash."""
+
+    def __init__(
+        self, hass: HomeAssistant, entry_id: str, mcp_client: RohlikMCPClient
+    ) -> None:
+        """Initialize the catalog."""
+        self._mcp_client = mcp_client
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.tools"
+        )
+        self.upstream_tools: list[dict[str, Any]] = []
+        self.schema_hash: str | None = None
+        self._extra_tools: dict[str, dict[str, Any]] = {}
+
+    async def async_load(self) -> None:
+        """Load the cached catalog from disk, no network involved."""
+        data = await self._store.async_load()
+        if data:
+            self._set_tools(data["tools"], data["hash"])
+            _LOGGER.debug(
+                "Loaded %d cached tools (%s)", len(self.upstream_tools), self.schema_hash
+            )
+
+    async def async_refresh(self) -> bool:
+        """Fetch tools/list from the server; return True if the schema changed."""
+        result = await self._mcp_client.list_tools()
+        if "error" in result:
+            _LOGGER.debug("Tool catalog refresh failed: %s", result["error"])
+            return False
+        return await self.async_update(result.get("result", {}).get("tools", []))
+
+    async def async_update(self, tools: list[dict[str, Any]]) -> bool:
+        """Store a fetched tool list; return True if the schema changed."""
+        if not tools:
+            return False
+        new_hash = schema_hash(tools)
+        if new_hash == self.schema_hash:
+            return False
+        _LOGGER.info("Rohlik tool schema changed (%s -> %s)", self.schema_hash, new_hash)
+        self._set_tools(tools, new_hash)
+        await self._store.async_save(
+            {
+                "hash": new_hash,
+                "fetched_at": dt_util.utcnow().isoformat(),
+                "tools": tools,
+            }
+        )
+        return True
+
+    def _set_tools(self, tools: list[dict[str, Any]], tools_hash: str) -> None:
+        """Replace the upstream tools and the translated extras."""
+        self.upstream_tools = tools
+        self.schema_hash = tools_hash
+        wrapped = set(BUILTIN_TOOLS.values())
+        self._extra_tools = {
+            tool["name"]: translate_tool(tool)
+            for tool in tools
+            if tool.get("name") and tool["name"] not in wrapped
+        }
+
+    @property
+    def available_tools(self) -> list[str]:
+        """Return names of all tools that can be exposed to the LLM."""
+        upstream = {tool.get("name") for tool in self.upstream_tools}
+        builtin = [
+            name
+            for name, upstream_name in BUILTIN_TOOLS.items()
+            # Before the first fetch assume the built-ins exist
+            if not upstream or upstream_name in upstream
+        ]
+        return builtin + sorted(self._extra_tools)
+
+    def is_upstream_tool(self, name: str) -> bool:
+        """Return True for exposed upstream tools without a built-in wrapper."""
+        return name in self._extra_tools
+
+    def llm_tools(self, enabled: Collection[str]) -> list[dict[str, Any]]:
+        """Return Realtime-style function definitions of the enabled tools."""
+        available = set(self.available_tools)
+        tools = [
+            tool
+            for tool in ROHLIK_TOOLS
+            if tool["name"] in enabled and tool["name"] in available
+        ]
+        tools.extend(
+            tool for name, tool in self._extra_tools.items() if name in enabled
+        )
+        return tools
+
+    def system_prompt(self, enabled: Collection[str]) -> str:
+        """Return the system prompt for the enabled tools."""
+        return build_system_prompt(
+            [tool["name"] for tool in self.llm_tools(enabled)]
+        )
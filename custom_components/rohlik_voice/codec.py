@@ -0,0 +1,101 @@
+"""JSON and base64 codecs for the Realtime and MCP hot paths."""
+
+from __future__ import annotations
+
+import binascii
+from collections.abc import Callable
+import json
+import logging
+from typing import Any
+
+import aiohttp
+
+_LOGGER = logging.getLogger(__name__)
+
+# Fastest available JSON library; Home Assistant ships orjson
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+JSONDecodeError: tuple[type[Exception], ...]
+
+if orjson is not None:
+    JSON_BACKEND = "orjson"
+    JSONDecodeError = (orjson.JSONDecodeError,)
+    json_loads: Callable[[str | bytes], Any] = orjson.loads
+
+    def json_dumps_bytes(obj: Any) -> bytes:
+        """Serialize to UTF-8 JSON bytes."""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+elif msgspec is not None:
+    JSON_BACKEND = "msgspec"
+    JSONDecodeError = (msgspec.DecodeError,)
+    json_loads = msgspec.json.decode
+    json_dumps_bytes = msgspec.json.encode
+
+else:
+    JSON_BACKEND = "json"
+    JSONDecodeError = (json.JSONDecodeError,)
+    json_loads = json.loads
+
+    def json_dumps_bytes(obj: Any) -> bytes:
+        """Serialize to UTF-8 JSON bytes."""
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def json_dumps(obj: Any) -> str:
+    """Serialize to a JSON string."""
+    return json_dumps_bytes(obj).decode()
+
+
+def b64decode(data: str) -> bytes:
+    """Decode base64 without the argument checks of base64.b64decode."""
+    return binascii.a2b_base64(data)
+
+
+def b64encode(data: bytes) -> str:
+    """Encode bytes as a base64 string."""
+    return binascii.b2a_base64(data, newline=False).decode("ascii")
+
+
+async def send_json(ws: aiohttp.ClientWebSocketResponse | Any, obj: Any) -> None:
+    """Send an object as a text frame through the fast serializer."""
+    await ws.send_str(json_dumps(obj))
+
+
+class AudioAppendEncoder:
+    """Build input_audio_buffer.append frames in one reused buffer.
+
+    Not safe for concurrent use; each Realtime session owns one.
+    """
+
+    _PREFIX = b'{"type":"input_audio_buffer.append","audio":"'
+    _SUFFIX = b'"}'
+
+    def __init__(self) -> None:
+        """Initialize the buffer."""
+        self._buffer = bytearray(self._PREFIX)
+
+    def encode(self, audio: bytes) -> bytearray:
+        """Return the frame for a PCM chunk, valid until the next call."""
+        buffer = self._buffer
+        del buffer[len(self._PREFIX) :]
+        buffer += binascii.b2a_base64(audio, newline=False)
+        buffer += self._SUFFIX
+        return buffer
+
+    async def send(self, ws: aiohttp.ClientWebSocketResponse, audio: bytes) -> None:
+        """Send a PCM chunk as an append event."""
+        frame = self.encode(audio)
+        if hasattr(ws, "send_frame"):
+            # aiohttp >= 3.11 sends the UTF-8 bytes without a str round trip
+            await ws.send_frame(frame, aiohttp.WSMsgType.TEXT)
+        else:
+            await ws.send_str(frame.decode("ascii"))
@@ -7,15 +7,36 @@ from typing import Any
 
 import voluptuous as vol
 
-from homeassistant.config_entries import ConfigFlow, ConfigFlowResult
-from homeassistant.core import HomeAssistant
+from homeassistant.config_entries import (
+    ConfigEntry,
+    ConfigFlow,
+    ConfigFlowResult,
+    OptionsFlow,
+)
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.exceptions import HomeAssistantError
+import homeassistant.helpers.config_validation as cv
 
+from .catalog import BUILTIN_TOOLS, enabled_tools
 from .const import (
     DOMAIN,
     CONF_ROHLIK_EMAIL,
     CONF_ROHLIK_PASSWORD,
     CONF_OPENAI_API_KEY,
+    CONF_ENABLED_TOOLS,
+    CONF_PREFERRED_BRANDS,
+    CONF_FAST_MODEL,
+    CONF_STRONG_MODEL,
+    CONF_LATENCY_BUDGET,
+    CONF_STRONG_SHARE,
+    CONF_DELIVERY_CUTOFF,
+    CONF_TRACE_TURNS,
+    CONF_ASSIST_PIPELINE,
+    CONF_DAILY_BUDGET,
+    DEFAULT_FAST_MODEL,
+    DEFAULT_STRONG_MODEL,
+    DEFAULT_LATENCY_BUDGET,
+    DEFAULT_STRONG_SHARE,
 )
 from .mcp_client import RohlikMCPClient
 
@@ -59,6 +80,12 @@ class RohlikVoiceConfigFlow(ConfigFlow, domain=DOMAIN):
 
     VERSION = 1
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: ConfigEntry) -> OptionsFlow:
+        """Return the options flow."""
+        return RohlikVoiceOptionsFlow(config_entry)
+
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> ConfigFlowResult:
@@ -107,6 +134,80 @@ class RohlikVoiceConfigFlow(ConfigFlow, domain=DOMAIN):
         )
 
 
+class RohlikVoiceOptionsFlow(OptionsFlow):
+    """Handle Rohlik Voice options."""
+
+    def __init__(self, config_entry: ConfigEntry) -> None:
+        """Initialize the options flow."""
+        self._config_entry = config_entry
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> ConfigFlowResult:
+        """Manage the options."""
+        if user_input is not None:
+            return self.async_create_entry(data=user_input)
+
+        # Offer the cached upstream catalog when the entry is loaded
+        data = self.hass.data.get(DOMAIN, {}).get(self._config_entry.entry_id)
+        available = data["catalog"].available_tools if data else list(BUILTIN_TOOLS)
+        current = [
+            name
+            for name in enabled_tools(self._config_entry.options)
+            if name in available
+        ]
+        options = self._config_entry.options
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(CONF_ENABLED_TOOLS, default=current): cv.multi_select(
+                        {name: name for name in available}
+                    ),
+                    vol.Optional(
+                        CONF_PREFERRED_BRANDS,
+                        default=options.get(CONF_PREFERRED_BRANDS, ""),
+                    ): str,
+                    vol.Optional(
+                        CONF_FAST_MODEL,
+                        default=options.get(CONF_FAST_MODEL, DEFAULT_FAST_MODEL),
+                    ): str,
+                    vol.Optional(
+                        CONF_STRONG_MODEL,
+                        default=options.get(CONF_STRONG_MODEL, DEFAULT_STRONG_MODEL),
+                    ): str,
+                    vol.Optional(
+                        CONF_LATENCY_BUDGET,
+                        default=options.get(
+                            CONF_LATENCY_BUDGET, DEFAULT_LATENCY_BUDGET
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=500, max=30000)),
+                    vol.Optional(
+                        CONF_STRONG_SHARE,
+                        default=options.get(CONF_STRONG_SHARE, DEFAULT_STRONG_SHARE),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=100)),
+                    vol.Optional(
+                        CONF_DELIVERY_CUTOFF,
+                        default=options.get(CONF_DELIVERY_CUTOFF, ""),
+                    ): vol.Any("", vol.Match(r"^([01]?\d|2[0-3]):[0-5]\d$")),
+                    vol.Optional(
+                        CONF_TRACE_TURNS,
+                        default=options.get(CONF_TRACE_TURNS, False),
+                    ): bool,
+                    vol.Optional(
+                        CONF_ASSIST_PIPELINE,
+                        default=options.get(CONF_ASSIST_PIPELINE, ""),
+                    ): str,
+                    vol.Optional(
+                        CONF_DAILY_BUDGET,
+                        default=options.get(CONF_DAILY_BUDGET, 0),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                }
+            ),
+        )
+
+
 class CannotConnect(HomeAssistantError):
     """Error to indicate we cannot connect."""
 
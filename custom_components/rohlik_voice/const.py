@@ -1,5 +1,7 @@
 """Constants for the Rohlik Voice integration."""
 
+from datetime import timedelta
+
 DOMAIN = "rohlik_voice"
 
 # Configuration keys
@@ -7,6 +9,18 @@ CONF_ROHLIK_EMAIL = "rohlik_email"
 CONF_ROHLIK_PASSWORD = "rohlik_password"
 CONF_OPENAI_API_KEY = "openai_api_key"
 
+# Options
+CONF_ENABLED_TOOLS = "enabled_tools"
+CONF_PREFERRED_BRANDS = "preferred_brands"
+CONF_FAST_MODEL = "fast_model"
+CONF_STRONG_MODEL = "strong_model"
+CONF_LATENCY_BUDGET = "latency_budget"
+CONF_STRONG_SHARE = "strong_share"
+CONF_DELIVERY_CUTOFF = "delivery_cutoff"
+CONF_TRACE_TURNS = "trace_turns"
+CONF_ASSIST_PIPELINE = "assist_pipeline"
+CONF_DAILY_BUDGET = "daily_budget"
+
 # Rohlik MCP Server
 ROHLIK_MCP_URL = "https://mcp.rohlik.cz/mcp"
 
@@ -14,17 +28,37 @@ ROHLIK_MCP_URL = "https://mcp.rohlik.cz/mcp"
 OPENAI_CHAT_URL = "https://api.openai.com/v1/chat/completions"
 OPENAI_CHAT_MODEL = "gpt-4o-mini"
 
+# Model routing: simple turns use the fast model, complex ones the strong one
+DEFAULT_FAST_MODEL = OPENAI_CHAT_MODEL
+DEFAULT_STRONG_MODEL = "gpt-4o"
+# Smoothed request latency a model may have and still be picked (ms)
+DEFAULT_LATENCY_BUDGET = 4000
+# Highest share of recent turns sent to the strong model (%)
+DEFAULT_STRONG_SHARE = 30
+
 # OpenAI Realtime API (kept for future use)
 OPENAI_REALTIME_URL = "wss://api.openai.com/v1/realtime"
 OPENAI_REALTIME_MODEL = "gpt-4o-mini-realtime-preview"
 
-# WebSocket (kept for future use)
+# WebSocket
 WS_PATH = "/api/rohlik_voice/ws"
+# Card mode with local speech through an Assist pipeline instead of Realtime
+CARD_MODE_ASSIST = "assist"
+DATA_VIEWS_REGISTERED = f"{DOMAIN}_views_registered"
 
 # Timeouts
 MCP_TIMEOUT = 30
+MCP_WARM_UP_TIMEOUT = 15
 CHAT_TIMEOUT = 60
 REALTIME_TIMEOUT = 60
 
+# Tool catalog refresh
+CATALOG_REFRESH_INTERVAL = timedelta(hours=12)
+WRITE_QUEUE_REPLAY_INTERVAL = timedelta(minutes=1)
+
+# Backoff while the Rohlik MCP server is unavailable (seconds)
+MCP_RETRY_MIN = 10
+MCP_RETRY_MAX = 300
+
 # Platforms
-PLATFORMS = ["conversation"]
+PLATFORMS = ["conversation", "sensor"]
@@ -2,8 +2,13 @@
 
 from __future__ import annotations
 
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
 import json
 import logging
+import re
+import time
 from typing import Any, Literal
 
 import aiohttp
@@ -12,16 +17,85 @@ from homeassistant.components import conversation
 from homeassistant.components.conversation import ConversationInput, ConversationResult
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers import intent
+from homeassistant.helpers import entity_registry as er, intent
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.util import ulid
 
-from .const import DOMAIN, CONF_OPENAI_API_KEY, OPENAI_CHAT_URL, OPENAI_CHAT_MODEL
-from .mcp_client import RohlikMCPClient
-from .tools import ROHLIK_TOOLS, SYSTEM_PROMPT
+from .catalog import ToolCatalog, enabled_tools
+from .codec import json_dumps, json_loads
+from .const import DOMAIN, CONF_OPENAI_API_KEY, OPENAI_CHAT_URL
+from .executor import RohlikToolExecutor
+from .metrics import STAGE_LLM_FIRST_TOKEN, STAGE_LLM_REQUEST, LatencyMetrics
+from .plan_cache import PlanCache, PlannedCall, is_correction, template_reply
+from .router import ModelRouter
+from .trace import TRACE_AGENT, TraceRecorder, record_event, tracing
+from .usage import BUDGET_OK, UsageTracker, conversation_scope
 
 _LOGGER = logging.getLogger(__name__)
 
+try:
+    from homeassistant.helpers import chat_session
+except ImportError:  # Home Assistant < 2025.3
+    chat_session = None
+
+# Streaming through the chat log lets Assist start TTS on the first sentence
+STREAMING_SUPPORTED = chat_session is not None and hasattr(
+    conversation, "async_get_chat_log"
+)
+
+# History messages kept in the prompt, and when the budget is nearly spent
+MAX_HISTORY = 20
+COMPACT_HISTORY = 4
+
+# Whitespace after sentence punctuation, or line breaks
+_SENTENCE_BREAK_RE = re.compile(r"(?<=[.!?…])\s+|\n+")
+
+# Receives reply sentences as they stream, for callers outside Assist
+_sentence_listener: ContextVar[Callable[[str], Awaitable[None]] | None] = ContextVar(
+    f"{DOMAIN}_sentence_listener", default=None
+)
+
+
+@contextmanager
+def stream_sentences(listener: Callable[[str], Awaitable[None]]) -> Iterator[None]:
+    """Pass the sentences of replies streamed in this context to a listener."""
+    token = _sentence_listener.set(listener)
+    try:
+        yield
+    finally:
+        _sentence_listener.reset(token)
+
+
+def agent_entity_id(hass: HomeAssistant, entry_id: str) -> str | None:
+    """Return the entity id of an entry's conversation agent."""
+    return er.async_get(hass).async_get_entity_id(
+        conversation.DOMAIN, DOMAIN, f"{entry_id}_conversation"
+    )
+
+
+async def iter_sentences(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Regroup streamed text chunks into whole sentences."""
+    buffer = ""
+    async for chunk in chunks:
+        buffer += chunk
+        *sentences, buffer = _SENTENCE_BREAK_RE.split(buffer)
+        for sentence in sentences:
+            if sentence:
+                yield sentence + " "
+    if buffer.strip():
+        yield buffer
+
+
+def _trace_request(payload: dict[str, Any]) -> dict[str, Any]:
+    """Return a chat request for the trace, with tool schemas reduced to names.
+
+    The messages are copied, the turn keeps appending to the payload's list.
+    """
+    request = {**payload, "messages": list(payload["messages"])}
+    if "tools" in payload:
+        request["tools"] = [tool["function"]["name"] for tool in payload["tools"]]
+    return request
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -38,6 +112,7 @@ class RohlikConversationAgent(conversation.ConversationEntity):
 
     _attr_has_entity_name = True
     _attr_name = None
+    _attr_supports_streaming = STREAMING_SUPPORTED
 
     def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry) -> None:
         """Initialize the agent."""
@@ -51,6 +126,30 @@ class RohlikConversationAgent(conversation.ConversationEntity):
             "model": "Voice Shopping Assistant",
         }
         self._conversation_history: dict[str, list[dict]] = {}
+        data = hass.data[DOMAIN][config_entry.entry_id]
+        self._metrics: LatencyMetrics = data["metrics"]
+        self._router: ModelRouter = data["router"]
+        self._usage: UsageTracker = data["usage"]
+        # Plan cache key of the last turn per conversation, to undo on correction
+        self._plan_keys: dict[str, str] = {}
+        # Kept open so chat requests reuse connections to OpenAI
+        self._session: aiohttp.ClientSession | None = None
+
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        """Return the pooled HTTP session, creating it on first use."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(json_serialize=json_dumps)
+        return self._session
+
+    async def close(self) -> None:
+        """Close the HTTP session."""
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Close the HTTP session when the agent is removed."""
+        await self.close()
+        await super().async_will_remove_from_hass()
 
     @property
     def supported_languages(self) -> list[str] | Literal["*"]:
@@ -61,38 +160,112 @@ class RohlikConversationAgent(conversation.ConversationEntity):
         self, user_input: ConversationInput
     ) -> ConversationResult:
         """Process a conversation turn."""
+        if not STREAMING_SUPPORTED:
+            return await self._async_process(
+                user_input, None, user_input.conversation_id or ulid.ulid()
+            )
+        # One id for the history, the chat log and the returned result
+        with chat_session.async_get_chat_session(
+            self.hass, user_input.conversation_id
+        ) as session:
+            return await self._async_process(
+                user_input, session, session.conversation_id
+            )
+
+    async def _async_process(
+        self, user_input: ConversationInput, session: Any, conversation_id: str
+    ) -> ConversationResult:
+        """Process a conversation turn within its chat session, if any."""
         _LOGGER.debug("Processing input: %s", user_input.text)
 
-        # Get MCP client and API key from hass.data
+        # Get tool catalog, executor and API key from hass.data
         data = self.hass.data[DOMAIN][self.config_entry.entry_id]
-        mcp_client: RohlikMCPClient = data["mcp_client"]
+        catalog: ToolCatalog = data["catalog"]
+        executor: RohlikToolExecutor = data["executor"]
         api_key: str = data["openai_api_key"]
+        enabled = enabled_tools(self.config_entry.options)
 
         # Get or create conversation history
-        conversation_id = user_input.conversation_id or ulid.ulid()
         if conversation_id not in self._conversation_history:
             self._conversation_history[conversation_id] = []
 
         history = self._conversation_history[conversation_id]
 
         # Build messages for OpenAI
-        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-        messages.extend(history)
+        messages = [{"role": "system", "content": catalog.system_prompt(enabled)}]
+        if self._usage.level == BUDGET_OK:
+            messages.extend(history)
+        else:
+            # Shorter prompts while the daily budget is nearly spent
+            messages.extend(history[-COMPACT_HISTORY:])
         messages.append({"role": "user", "content": user_input.text})
 
+        # A rejected answer must not be replayed from the plan cache
+        plan_cache: PlanCache = data["plan_cache"]
+        previous_key = self._plan_keys.pop(conversation_id, None)
+        if previous_key is not None and is_correction(user_input.text):
+            plan_cache.forget(previous_key)
+
+        # An answer to a question means something only with that question
+        last_reply = (history[-1].get("content") or "") if history else ""
+        follow_up = last_reply.rstrip().endswith("?")
+
+        # Opt-in capture of the turn for offline replay
+        recorder: TraceRecorder = data["trace_recorder"]
+
         try:
-            # Call OpenAI with function calling
-            response_text = await self._call_openai(
-                api_key, messages, mcp_client
-            )
+            with (
+                recorder.turn(TRACE_AGENT, text=user_input.text) as trace,
+                conversation_scope(conversation_id),
+            ):
+                if not follow_up and (
+                    hit := plan_cache.lookup(user_input.text, enabled)
+                ):
+                    # Repeated phrasing, run the learned plan without the model
+                    key, plan = hit
+                    response_text = await self._async_run_plan(
+                        api_key, messages, plan, executor, enabled
+                    )
+                    self._plan_keys[conversation_id] = key
+                else:
+                    # Simple dispatch turns go to the fast model
+                    model = self._router.choose(user_input.text)
+                    if STREAMING_SUPPORTED:
+                        response_text, plan = await self._call_openai_streaming(
+                            api_key,
+                            model,
+                            messages,
+                            catalog.llm_tools(enabled),
+                            executor,
+                            enabled,
+                            user_input,
+                            session,
+                        )
+                    else:
+                        response_text, plan = await self._call_openai(
+                            api_key,
+                            model,
+                            messages,
+                            catalog.llm_tools(enabled),
+                            executor,
+                            enabled,
+                        )
+                    if (
+                        plan
+                        and not follow_up
+                        and (key := plan_cache.learn(user_input.text, plan))
+                    ):
+                        self._plan_keys[conversation_id] = key
+                if trace is not None:
+                    trace.finish(response_text)
 
             # Update history
             history.append({"role": "user", "content": user_input.text})
             history.append({"role": "assistant", "content": response_text})
 
             # Keep history limited to last 10 exchanges
-            if len(history) > 20:
-                history[:] = history[-20:]
+            if len(history) > MAX_HISTORY:
+                history[:] = history[-MAX_HISTORY:]
 
             # Return result
             intent_response = intent.IntentResponse(language=user_input.language)
@@ -115,17 +288,269 @@ class RohlikConversationAgent(conversation.ConversationEntity):
                 conversation_id=conversation_id,
             )
 
-    async def _call_openai(
+    async def _async_run_plan(
+        self,
+        api_key: str,
+        messages: list[dict],
+        plan: list[PlannedCall],
+        executor: RohlikToolExecutor,
+        enabled: list[str],
+    ) -> str:
+        """Execute a cached plan and reply from a template, or ask the model."""
+        results = [
+            await executor.async_execute(name, arguments, enabled)
+            for name, arguments in plan
+        ]
+        if (reply := template_reply(plan, results)) is not None:
+            return reply
+
+        # No template fits the results, let the fast model phrase them
+        tool_calls = [
+            {
+                "id": f"call_{index}",
+                "type": "function",
+                "function": {
+                    "name": name,
+                    "arguments": json.dumps(arguments, ensure_ascii=False),
+                },
+            }
+            for index, (name, arguments) in enumerate(plan)
+        ]
+        messages.append(
+            {"role": "assistant", "content": None, "tool_calls": tool_calls}
+        )
+        messages.extend(
+            {
+                "tool_call_id": tool_call["id"],
+                "role": "tool",
+                "content": json.dumps(result, ensure_ascii=False),
+            }
+            for tool_call, result in zip(tool_calls, results)
+        )
+        fast, _ = self._router.models
+        result = await self._post_chat(
+            {
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+            },
+            {"model": fast, "messages": messages},
+        )
+        return result["choices"][0]["message"]["content"]
+
+    async def _call_openai_streaming(
         self,
         api_key: str,
+        model: str,
         messages: list[dict],
-        mcp_client: RohlikMCPClient,
+        llm_tools: list[dict[str, Any]],
+        executor: RohlikToolExecutor,
+        enabled: list[str],
+        user_input: ConversationInput,
+        session: Any,
+    ) -> tuple[str, list[PlannedCall] | None]:
+        """Call OpenAI with streaming, feeding sentences to the HA chat log.
+
+        Also returns the tool calls made, or None if one of them failed.
+        """
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        }
+        payload: dict[str, Any] = {
+            "model": model,
+            "messages": messages,
+        }
+        if llm_tools:
+            payload["tools"] = [
+                {
+                    "type": "function",
+                    "function": {
+                        "name": tool["name"],
+                        "description": tool["description"],
+                        "parameters": tool["parameters"],
+                    },
+                }
+                for tool in llm_tools
+            ]
+            payload["tool_choice"] = "auto"
+
+        # Joins the chat log of the Assist pipeline when there is one
+        with conversation.async_get_chat_log(
+            self.hass, session, user_input
+        ) as chat_log:
+            spoken: list[str] = []
+            plan: list[PlannedCall] | None = []
+            tool_calls: dict[int, dict[str, Any]] = {}
+            spoken.append(
+                await self._stream_to_chat_log(chat_log, headers, payload, tool_calls)
+            )
+            if tool_calls:
+                message = {
+                    "role": "assistant",
+                    "content": spoken[0] or None,
+                    "tool_calls": [tool_calls[index] for index in sorted(tool_calls)],
+                }
+                messages.append(message)
+                for tool_call in message["tool_calls"]:
+                    function_name = tool_call["function"]["name"]
+                    arguments = tool_call["function"]["arguments"] or "{}"
+                    function_args = json_loads(arguments)
+                    _LOGGER.info(
+                        "Executing tool: %s with args: %s", function_name, function_args
+                    )
+                    tool_result = await executor.async_execute(
+                        function_name, function_args, enabled
+                    )
+                    if plan is not None:
+                        plan.append((function_name, function_args))
+                    if "error" in tool_result:
+                        plan = None
+                    messages.append(
+                        {
+                            "tool_call_id": tool_call["id"],
+                            "role": "tool",
+                            "content": json.dumps(tool_result, ensure_ascii=False),
+                        }
+                    )
+
+                # Stream the final answer
+                payload["messages"] = messages
+                payload.pop("tools", None)
+                payload.pop("tool_choice", None)
+                spoken.append(
+                    await self._stream_to_chat_log(chat_log, headers, payload, {})
+                )
+
+        text = " ".join(text.strip() for text in spoken if text.strip())
+        return text or "Omlouvám se, nemám odpověď.", plan
+
+    async def _stream_to_chat_log(
+        self,
+        chat_log: Any,
+        headers: dict[str, str],
+        payload: dict[str, Any],
+        tool_calls: dict[int, dict[str, Any]],
     ) -> str:
-        """Call OpenAI Chat API with function calling."""
+        """Stream one completion into the chat log sentence by sentence."""
+
+        async def content_chunks() -> AsyncIterator[str]:
+            """Yield content deltas, collecting tool call fragments."""
+            async for delta in self._stream_chat(headers, payload):
+                for fragment in delta.get("tool_calls") or ():
+                    call = tool_calls.setdefault(
+                        fragment["index"],
+                        {
+                            "id": "",
+                            "type": "function",
+                            "function": {"name": "", "arguments": ""},
+                        },
+                    )
+                    call["id"] = fragment.get("id") or call["id"]
+                    function = fragment.get("function", {})
+                    call["function"]["name"] += function.get("name") or ""
+                    call["function"]["arguments"] += function.get("arguments") or ""
+                if content := delta.get("content"):
+                    yield content
+
+        listener = _sentence_listener.get()
+
+        async def deltas() -> AsyncIterator[dict[str, Any]]:
+            """Yield chat log deltas, one sentence at a time."""
+            yield {"role": "assistant"}
+            async for sentence in iter_sentences(content_chunks()):
+                if listener is not None:
+                    await listener(sentence)
+                yield {"content": sentence}
+
+        text = ""
+        async for content in chat_log.async_add_delta_content_stream(
+            self.entity_id, deltas()
+        ):
+            text += getattr(content, "content", None) or ""
+        return text
+
+    async def _stream_chat(
+        self, headers: dict[str, str], payload: dict[str, Any]
+    ) -> AsyncIterator[dict[str, Any]]:
+        """POST a streaming chat completion and yield its deltas."""
+        start = time.monotonic()
+        first_token = True
+        first_token_ms: float | None = None
+        # Deltas are only kept for the turn trace
+        deltas: list[dict[str, Any]] | None = [] if tracing() else None
+        usage: dict[str, Any] | None = None
+        session = self._ensure_session()
+        async with session.post(
+            OPENAI_CHAT_URL,
+            headers=headers,
+            json={
+                **payload,
+                "stream": True,
+                # Usage arrives in a last chunk without choices
+                "stream_options": {"include_usage": True},
+            },
+            timeout=aiohttp.ClientTimeout(total=60),
+        ) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise Exception(f"OpenAI API error: {response.status} - {error_text}")
+
+            async for line in response.content:
+                if not line.startswith(b"data: "):
+                    continue
+                data = line[6:].strip()
+                if data == b"[DONE]":
+                    break
+                chunk = json_loads(data)
+                usage = chunk.get("usage") or usage
+                for choice in chunk.get("choices") or ():
+                    delta = choice.get("delta") or {}
+                    if first_token and (
+                        delta.get("content") or delta.get("tool_calls")
+                    ):
+                        first_token = False
+                        first_token_ms = (time.monotonic() - start) * 1000
+                        self._metrics.record(STAGE_LLM_FIRST_TOKEN, first_token_ms)
+                    if deltas is not None:
+                        deltas.append(delta)
+                    yield delta
+
+        duration_ms = self._record_request(payload["model"], start)
+        self._usage.record(payload["model"], usage)
+        if deltas is not None:
+            record_event(
+                "openai",
+                request=_trace_request(payload),
+                stream=deltas,
+                first_token_ms=first_token_ms and round(first_token_ms, 1),
+                duration_ms=round(duration_ms, 1),
+            )
+
+    def _record_request(self, model: str, start: float) -> float:
+        """Record the latency of a chat request, also per model for routing."""
+        duration_ms = (time.monotonic() - start) * 1000
+        self._metrics.record(STAGE_LLM_REQUEST, duration_ms)
+        self._metrics.record(f"{STAGE_LLM_REQUEST}.{model}", duration_ms)
+        self._router.observe(model, duration_ms)
+        return duration_ms
+
+    async def _call_openai(
+        self,
+        api_key: str,
+        model: str,
+        messages: list[dict],
+        llm_tools: list[dict[str, Any]],
+        executor: RohlikToolExecutor,
+        enabled: list[str],
+    ) -> tuple[str, list[PlannedCall] | None]:
+        """Call OpenAI Chat API with function calling.
+
+        Also returns the tool calls made, or None if one of them failed.
+        """
         
         # Convert tools to OpenAI format
         tools = []
-        for tool in ROHLIK_TOOLS:
+        for tool in llm_tools:
             tools.append({
                 "type": "function",
                 "function": {
@@ -141,24 +566,14 @@ class RohlikConversationAgent(conversation.ConversationEntity):
         }
 
         payload = {
-            "model": OPENAI_CHAT_MODEL,
+            "model": model,
             "messages": messages,
-            "tools": tools,
-            "tool_choice": "auto",
         }
+        if tools:
+            payload["tools"] = tools
+            payload["tool_choice"] = "auto"
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                OPENAI_CHAT_URL,
-                headers=headers,
-                json=payload,
-                timeout=aiohttp.ClientTimeout(total=60),
-            ) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise Exception(f"OpenAI API error: {response.status} - {error_text}")
-
-                result = await response.json()
+        result = await self._post_chat(headers, payload)
 
         # Process response
         choice = result["choices"][0]
@@ -168,6 +583,7 @@ class RohlikConversationAgent(conversation.ConversationEntity):
         if "tool_calls" in message and message["tool_calls"]:
             # Execute tool calls
             tool_results = []
+            plan: list[PlannedCall] | None = []
             for tool_call in message["tool_calls"]:
                 function_name = tool_call["function"]["name"]
                 function_args = json.loads(tool_call["function"]["arguments"])
@@ -175,9 +591,13 @@ class RohlikConversationAgent(conversation.ConversationEntity):
                 _LOGGER.info("Executing tool: %s with args: %s", function_name, function_args)
 
                 # Execute the function
-                tool_result = await self._execute_function(
-                    mcp_client, function_name, function_args
+                tool_result = await executor.async_execute(
+                    function_name, function_args, enabled
                 )
+                if plan is not None:
+                    plan.append((function_name, function_args))
+                if "error" in tool_result:
+                    plan = None
 
                 tool_results.append({
                     "tool_call_id": tool_call["id"],
@@ -191,59 +611,44 @@ class RohlikConversationAgent(conversation.ConversationEntity):
 
             # Call OpenAI again to get final response
             payload["messages"] = messages
-            del payload["tools"]
-            del payload["tool_choice"]
-
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    OPENAI_CHAT_URL,
-                    headers=headers,
-                    json=payload,
-                    timeout=aiohttp.ClientTimeout(total=60),
-                ) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        raise Exception(f"OpenAI API error: {response.status} - {error_text}")
+            payload.pop("tools", None)
+            payload.pop("tool_choice", None)
 
-                    result = await response.json()
+            result = await self._post_chat(headers, payload)
 
-            return result["choices"][0]["message"]["content"]
+            return result["choices"][0]["message"]["content"], plan
 
         # No tool calls, return direct response
-        return message.get("content", "Omlouvám se, nemám odpověď.")
+        return message.get("content", "Omlouvám se, nemám odpověď."), []
 
-    async def _execute_function(
-        self,
-        mcp_client: RohlikMCPClient,
-        name: str,
-        arguments: dict[str, Any],
+    async def _post_chat(
+        self, headers: dict[str, str], payload: dict[str, Any]
     ) -> dict[str, Any]:
-        """Execute a function and return the result."""
-        try:
-            if name == "search_products":
-                return await mcp_client.search_products(
-                    keyword=arguments.get("keyword", ""),
-                )
-            elif name == "add_to_cart":
-                return await mcp_client.add_to_cart(
-                    product_id=int(arguments.get("product_id", 0)),
-                    quantity=int(arguments.get("quantity", 1)),
-                )
-            elif name == "get_cart":
-                return await mcp_client.get_cart()
-            elif name == "remove_from_cart":
-                return await mcp_client.remove_from_cart(
-                    product_id=int(arguments.get("product_id", 0)),
-                )
-            elif name == "update_cart_item":
-                return await mcp_client.update_cart_item(
-                    product_id=int(arguments.get("product_id", 0)),
-                    quantity=int(arguments.get("quantity", 0)),
-                )
-            elif name == "clear_cart":
-                return await mcp_client.clear_cart()
-            else:
-                return {"error": f"Neznámá funkce: {name}"}
-        except Exception as err:
-            _LOGGER.error("Error executing function %s: %s", name, err)
-            return {"error": str(err)}
+        """POST a chat completion request and record its latency."""
+        start = time.monotonic()
+        session = self._ensure_session()
+        async with session.post(
+            OPENAI_CHAT_URL,
+            headers=headers,
+            json=payload,
+            timeout=aiohttp.ClientTimeout(total=60),
+        ) as response:
+            # Without streaming the first token arrives with the headers
+            self._metrics.record(
+                STAGE_LLM_FIRST_TOKEN, (time.monotonic() - start) * 1000
+            )
+            if response.status != 200:
+                error_text = await response.text()
+                raise Exception(f"OpenAI API error: {response.status} - {error_text}")
+
+            result = await response.json()
+
+        duration_ms = self._record_request(payload["model"], start)
+        self._usage.record(payload["model"], result.get("usage"))
+        record_event(
+            "openai",
+            request=_trace_request(payload),
+            response=result,
+            duration_ms=round(duration_ms, 1),
+        )
+        return result
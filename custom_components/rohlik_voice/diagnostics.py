@@ -0,0 +1,43 @@
+"""Diagnostics support for Rohlik Voice Assistant."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, CONF_ROHLIK_EMAIL, CONF_ROHLIK_PASSWORD, CONF_OPENAI_API_KEY
+
+# Title and unique_id contain the Rohlik e-mail
+TO_REDACT = {
+    CONF_ROHLIK_EMAIL,
+    CONF_ROHLIK_PASSWORD,
+    CONF_OPENAI_API_KEY,
+    "title",
+    "unique_id",
+}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    data = hass.data[DOMAIN][entry.entry_id]
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "latency": data["metrics"].as_dict(),
+        "indexed_products": len(data["product_index"]),
+        "search_cache": data["search_cache"].stats,
+        "queued_cart_writes": len(data["write_queue"]),
+        "models": data["router"].stats,
+        "plan_cache": data["plan_cache"].stats,
+        "phrase_audio": data["phrase_audio"].stats,
+        "usage": data["usage"].stats,
+        "cart_watch": {
+            "items": len(data["cart_watch"].items),
+            "unavailable": len(data["cart_watch"].unavailable),
+            "interval": data["cart_watch"].interval(),
+        },
+    }
@@ -0,0 +1,199 @@
+"""Execution of LLM tool calls against the Rohlik MCP server."""
+
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable, Collection
+import logging
+from typing import Any
+
+from .cart_watch import CartWatchdog
+from .catalog import ToolCatalog
+from .history import DEFAULT_REORDER_LIMIT, PurchaseHistory
+from .mcp_client import RohlikMCPClient
+from .prefetch import SearchCache
+from .parsers import Product, compact_result, parse_products
+from .product_index import ProductIndex
+from .ranker import ProductRanker
+from .usage import UsageTracker
+from .write_queue import WriteQueue
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class RohlikToolExecutor:
+    """Dispatch tool calls from the chat agent and the Realtime session."""
+
+    def __init__(
+        self,
+        mcp_client: RohlikMCPClient,
+        catalog: ToolCatalog,
+        product_index: ProductIndex,
+        search_cache: SearchCache,
+        ranker: ProductRanker,
+        history: PurchaseHistory,
+        write_queue: WriteQueue,
+        cart_watch: CartWatchdog,
+        usage: UsageTracker,
+    ) -> None:
+        """Initialize the executor."""
+        self._mcp_client = mcp_client
+        self._catalog = catalog
+        self._product_index = product_index
+        self._search_cache = search_cache
+        self.ranker = ranker
+        self._history = history
+        self._write_queue = write_queue
+        self._cart_watch = cart_watch
+        self._usage = usage
+
+    async def async_search(self, keyword: str) -> list[Product] | dict[str, Any]:
+        """Return products for a keyword, or the server result if none parsed."""
+        # Known products resolve locally, the server is the fallback
+        if products := self._product_index.lookup(keyword):
+            _LOGGER.debug("Resolved '%s' from the product index", keyword)
+            if not self._product_index.is_fresh(products):
+                # Answered now, current stock and prices are indexed for next time
+                self._search_cache.refresh(keyword)
+            return products
+        # Often already in flight, prefetched from the user transcript
+        result = await self._search_cache.async_search(keyword)
+        if "error" in result or not (products := parse_products(result)):
+            return result
+        return products
+
+    async def async_reorder_usual(
+        self, limit: int = DEFAULT_REORDER_LIMIT
+    ) -> dict[str, Any]:
+        """Add the household's usual products to the cart in one call."""
+        items = []
+        for purchase in self._history.favorites(limit):
+            product = self._product_index.get(purchase.product_id)
+            if product is not None and product.in_stock is False:
+                continue
+            items.append((purchase, product))
+        if not items:
+            return {"error": "Zatím neznám žádný obvyklý nákup"}
+
+        result = await self.async_add_items(
+            [(purchase.product_id, purchase.usual_quantity) for purchase, _ in items]
+        )
+        if "error" in result or result.get("queued"):
+            return result
+        return {
+            "added": [
+                {
+                    "id": purchase.product_id,
+                    "name": product.name if product else None,
+                    "quantity": purchase.usual_quantity,
+                }
+                for purchase, product in items
+            ]
+        }
+
+    async def async_add_items(self, items: list[tuple[int, int]]) -> dict[str, Any]:
+        """Add (product id, quantity) pairs to the cart in one queued write."""
+        return await self._async_write(
+            "add_items_to_cart",
+            {
+                "items": [
+                    {"productId": product_id, "quantity": quantity}
+                    for product_id, quantity in items
+                ]
+            },
+            lambda: self._mcp_client.add_items_to_cart(items),
+        )
+
+    async def _async_write(
+        self,
+        tool_name: str,
+        arguments: dict[str, Any],
+        call: Callable[[], Awaitable[dict[str, Any]]],
+    ) -> dict[str, Any]:
+        """Run a cart write, queueing it while Rohlik is unreachable."""
+        queue = self._write_queue
+        # Earlier queued writes must be applied first
+        if queue or self._mcp_client.retry_in:
+            return await queue.async_enqueue(tool_name, arguments)
+        result = await call()
+        if result.get("unavailable"):
+            return await queue.async_enqueue(
+                tool_name, arguments, uncertain=result.get("uncertain", False)
+            )
+        if "error" not in result and not result.get("isError"):
+            # Cached searches may report stock the write just changed
+            self._search_cache.invalidate()
+        return result
+
+    async def async_execute(
+        self,
+        name: str,
+        arguments: dict[str, Any],
+        enabled: Collection[str],
+    ) -> dict[str, Any]:
+        """Execute a tool call and return the result."""
+        result = await self._async_execute(name, arguments, enabled)
+        # The result goes into the prompt, count what it costs there
+        self._usage.record_tool(name, result)
+        return result
+
+    async def _async_execute(
+        self,
+        name: str,
+        arguments: dict[str, Any],
+        enabled: Collection[str],
+    ) -> dict[str, Any]:
+        """Dispatch a tool call to the MCP client or a local implementation."""
+        if name not in enabled:
+            return {"error": f"Funkce {name} není povolena"}
+
+        mcp_client = self._mcp_client
+        try:
+            if name == "search_products":
+                keyword = arguments.get("keyword", "")
+                found = await self.async_search(keyword)
+                if isinstance(found, dict):
+                    return found
+                # Pick the usual product so the model need not ask
+                return self.ranker.rank(keyword, found)
+            elif name == "add_to_cart":
+                product_id = int(arguments.get("product_id", 0))
+                quantity = int(arguments.get("quantity", 1))
+                return await self._async_write(
+                    "add_items_to_cart",
+                    {"items": [{"productId": product_id, "quantity": quantity}]},
+                    lambda: mcp_client.add_to_cart(product_id, quantity),
+                )
+            elif name == "get_cart":
+                return compact_result(name, await mcp_client.get_cart())
+            elif name == "remove_from_cart":
+                product_id = int(arguments.get("product_id", 0))
+                return await self._async_write(
+                    "remove_cart_item",
+                    {"product_id": product_id},
+                    lambda: mcp_client.remove_from_cart(product_id),
+                )
+            elif name == "update_cart_item":
+                product_id = int(arguments.get("product_id", 0))
+                quantity = int(arguments.get("quantity", 0))
+                return await self._async_write(
+                    "update_cart_item",
+                    {"product_id": product_id, "quantity": quantity},
+                    lambda: mcp_client.update_cart_item(product_id, quantity),
+                )
+            elif name == "clear_cart":
+                return await self._async_write("clear_cart", {}, mcp_client.clear_cart)
+            elif name == "check_cart":
+                # Answered from the watchdog snapshot when it is fresh
+                return await self._cart_watch.async_status()
+            elif name == "reorder_usual":
+                return await self.async_reorder_usual(
+                    int(arguments.get("limit", DEFAULT_REORDER_LIMIT))
+                )
+            elif self._catalog.is_upstream_tool(name):
+                # Exposed upstream tool, arguments follow its own schema
+                return await mcp_client.call_tool(name, arguments)
+            else:
+                return {"error": f"Neznámá funkce: {name}"}
+        except Exception as err:
+            _LOGGER.error("Error executing function %s: %s", name, err)
+            return {"error": str(err)}
@@ -0,0 +1,185 @@
+"""Purchase history with decayed frequency scores."""
+
+from __future__ import annotations
+
+import bisect
+from dataclasses import dataclass
+import logging
+import math
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 30
+
+# A purchase counts half as much after this many seconds
+HALF_LIFE = 30 * 24 * 3600
+# Favorites need repeated, reasonably recent purchases
+MIN_PURCHASES = 2
+MIN_SCORE = 0.5
+# Cart writes this close together belong to the same shop
+SHOP_WINDOW = 6 * 3600
+DEFAULT_REORDER_LIMIT = 15
+
+
+def _log2_add(a: float, b: float) -> float:
+    """Return log2(2**a + 2**b) without overflow."""
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+@dataclass(slots=True)
+class Purchase:
+    """Aggregated purchases of one product."""
+
+    product_id: int
+    # log2 of the sum of 2**(t / HALF_LIFE) over purchase times, so the
+    # order of products does not change as time passes
+    weight: float
+    count: int
+    quantity: int
+    last_at: float
+    last_quantity: int
+
+    def score(self, now: float) -> float:
+        """Return the decayed number of purchases at a time."""
+        return 2 ** (self.weight - now / HALF_LIFE)
+
+    @property
+    def usual_quantity(self) -> int:
+        """Return the average quantity per purchase."""
+        return max(1, round(self.quantity / self.count))
+
+
+class PurchaseHistory:
+    """Successful cart adds, scored by frequency and recency."""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the history."""
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.history"
+        )
+        self._purchases: dict[int, Purchase] = {}
+        # (-weight, product id), kept sorted on every purchase
+        self._favorites: list[tuple[float, int]] = []
+
+    def __len__(self) -> int:
+        """Return the number of products ever bought."""
+        return len(self._purchases)
+
+    async def async_load(self) -> None:
+        """Load the history from disk."""
+        data = await self._store.async_load()
+        if not data:
+            return
+        for values in data["purchases"]:
+            purchase = Purchase(*values)
+            self._purchases[purchase.product_id] = purchase
+        self._favorites = sorted(
+            (-purchase.weight, purchase.product_id)
+            for purchase in self._purchases.values()
+        )
+
+    async def async_save(self) -> None:
+        """Write the history to disk now, e.g. on unload."""
+        await self._store.async_save(self._data_to_save())
+
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return data for the store."""
+        return {
+            "purchases": [
+                [
+                    p.product_id,
+                    p.weight,
+                    p.count,
+                    p.quantity,
+                    p.last_at,
+                    p.last_quantity,
+                ]
+                for p in self._purchases.values()
+            ]
+        }
+
+    def observe(
+        self, tool_name: str, arguments: dict[str, Any], result: dict[str, Any]
+    ) -> None:
+        """Record purchases from successful cart writes."""
+        if tool_name == "add_items_to_cart":
+            items = [
+                (item.get("productId"), item.get("quantity", 1))
+                for item in arguments.get("items", [])
+            ]
+        elif tool_name == "update_cart_item":
+            items = [(arguments.get("product_id"), arguments.get("quantity", 0))]
+        else:
+            return
+        if result.get("isError"):
+            return
+        # update_cart_item sets the quantity, adds accumulate
+        replace = tool_name == "update_cart_item"
+        now = time.time()
+        for product_id, quantity in items:
+            try:
+                product_id, quantity = int(product_id), int(quantity)
+            except (TypeError, ValueError):
+                continue
+            if quantity > 0:
+                self.record(product_id, quantity, now, replace)
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def record(
+        self, product_id: int, quantity: int, now: float, replace: bool = False
+    ) -> None:
+        """Add one purchase, updating the favorites order in place."""
+        purchase = self._purchases.get(product_id)
+        if purchase is not None and now - purchase.last_at < SHOP_WINDOW:
+            # Same shop, only the quantity changes
+            last_quantity = quantity if replace else purchase.last_quantity + quantity
+            purchase.quantity += last_quantity - purchase.last_quantity
+            purchase.last_quantity = last_quantity
+            purchase.last_at = now
+            return
+
+        point = now / HALF_LIFE
+        if purchase is None:
+            purchase = self._purchases[product_id] = Purchase(
+                product_id, point, 1, quantity, now, quantity
+            )
+        else:
+            index = bisect.bisect_left(
+                self._favorites, (-purchase.weight, product_id)
+            )
+            del self._favorites[index]
+            purchase.weight = _log2_add(purchase.weight, point)
+            purchase.count += 1
+            purchase.quantity += quantity
+            purchase.last_at = now
+            purchase.last_quantity = quantity
+        bisect.insort(self._favorites, (-purchase.weight, product_id))
+
+    def score(self, product_id: int) -> float:
+        """Return the current decayed purchase count of a product."""
+        purchase = self._purchases.get(product_id)
+        return purchase.score(time.time()) if purchase else 0.0
+
+    def favorites(self, limit: int = DEFAULT_REORDER_LIMIT) -> list[Purchase]:
+        """Return the household's usual products, most bought first."""
+        now = time.time()
+        result = []
+        for _, product_id in self._favorites:
+            purchase = self._purchases[product_id]
+            if purchase.score(now) < MIN_SCORE:
+                # Everything further down scores even lower
+                break
+            if purchase.count >= MIN_PURCHASES:
+                result.append(purchase)
+                if len(result) >= limit:
+                    break
+        return result
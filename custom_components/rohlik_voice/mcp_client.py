@@ -1,24 +1,43 @@
 """Rohlik MCP Client for communicating with Rohlik.cz MCP server."""
 
 import asyncio
-import json
+from collections.abc import Callable
 import logging
+import time
 from typing import Any
 
 import aiohttp
 
-from .const import ROHLIK_MCP_URL, MCP_TIMEOUT
+from .codec import JSONDecodeError, json_dumps, json_loads
+from .const import (
+    ROHLIK_MCP_URL,
+    MCP_TIMEOUT,
+    MCP_WARM_UP_TIMEOUT,
+    MCP_RETRY_MIN,
+    MCP_RETRY_MAX,
+)
+from .metrics import STAGE_MCP_TOOL_CALL, STAGE_SSE_PARSE, LatencyMetrics
+from .trace import record_event
 
 _LOGGER = logging.getLogger(__name__)
 
+# Called with (tool name, arguments, result) after each successful tool call
+ResultListener = Callable[[str, dict[str, Any], dict[str, Any]], None]
+
 
 class RohlikMCPClient:
     """Client for Rohlik MCP Server."""
 
-    def __init__(self, email: str, password: str) -> None:
+    def __init__(
+        self,
+        email: str,
+        password: str,
+        metrics: LatencyMetrics | None = None,
+    ) -> None:
         """Initialize the MCP client."""
         self._email = email
         self._password = password
+        self._metrics = metrics or LatencyMetrics()
         self._session: aiohttp.ClientSession | None = None
         self._headers = {
             "Content-Type": "application/json",
@@ -26,12 +45,46 @@ class RohlikMCPClient:
             "rhl-email": email,
             "rhl-pass": password,
         }
+        # None until the first check; tool calls fail fast while False
+        self.available: bool | None = None
+        self.tools: list[dict[str, Any]] = []
+        self._retry_delay = MCP_RETRY_MIN
+        self._retry_at = 0.0
+        self._result_listeners: list[ResultListener] = []
+
+    def add_result_listener(self, listener: ResultListener) -> Callable[[], None]:
+        """Call listener with every successful tool result; return a remover."""
+        self._result_listeners.append(listener)
+        return lambda: self._result_listeners.remove(listener)
+
+    def _mark_available(self) -> None:
+        """Record a successful round trip."""
+        if self.available is not True:
+            _LOGGER.info("Rohlik MCP server is available")
+        self.available = True
+        self._retry_delay = MCP_RETRY_MIN
+
+    def _mark_unavailable(self) -> None:
+        """Record a failed round trip and back off further attempts."""
+        if self.available is not False:
+            _LOGGER.warning("Rohlik MCP server is unavailable")
+        self.available = False
+        self._retry_at = time.monotonic() + self._retry_delay
+        self._retry_delay = min(self._retry_delay * 2, MCP_RETRY_MAX)
+
+    @property
+    def retry_in(self) -> float:
+        """Return seconds until calls are attempted again, 0 if allowed now."""
+        if self.available is not False:
+            return 0.0
+        return max(0.0, self._retry_at - time.monotonic())
 
     async def _ensure_session(self) -> aiohttp.ClientSession:
         """Ensure we have an active session."""
         if self._session is None or self._session.closed:
             self._session = aiohttp.ClientSession(
-                timeout=aiohttp.ClientTimeout(total=MCP_TIMEOUT)
+                timeout=aiohttp.ClientTimeout(total=MCP_TIMEOUT),
+                json_serialize=json_dumps,
             )
         return self._session
 
@@ -43,17 +96,39 @@ class RohlikMCPClient:
     def _parse_sse_response(self, text: str) -> dict[str, Any]:
         """Parse Server-Sent Events (SSE) response format."""
         result = {}
-        for line in text.strip().split("\n"):
-            if line.startswith("data: "):
-                data_str = line[6:]  # Remove "data: " prefix
-                try:
-                    result = json.loads(data_str)
-                except json.JSONDecodeError as err:
-                    _LOGGER.error("Failed to parse SSE data: %s", err)
+        with self._metrics.span(STAGE_SSE_PARSE):
+            for line in text.strip().split("\n"):
+                if line.startswith("data: "):
+                    data_str = line[6:]  # Remove "data: " prefix
+                    try:
+                        result = json_loads(data_str)
+                    except JSONDecodeError as err:
+                        _LOGGER.error("Failed to parse SSE data: %s", err)
         return result
 
     async def _call_tool(self, tool_name: str, arguments: dict[str, Any]) -> dict[str, Any]:
+        """Call a tool on the MCP server, recording it in the turn trace."""
+        start = time.monotonic()
+        result = await self._send_tool_call(tool_name, arguments)
+        record_event(
+            "mcp",
+            tool=tool_name,
+            arguments=arguments,
+            result=result,
+            duration_ms=round((time.monotonic() - start) * 1000, 1),
+        )
+        return result
+
+    async def _send_tool_call(
+        self, tool_name: str, arguments: dict[str, Any]
+    ) -> dict[str, Any]:
         """Call a tool on the MCP server."""
+        if self.retry_in:
+            return {
+                "error": "Rohlík je momentálně nedostupný, zkuste to prosím později",
+                "unavailable": True,
+            }
+
         session = await self._ensure_session()
         
         payload = {
@@ -67,36 +142,63 @@ class RohlikMCPClient:
         }
 
         try:
-            async with session.post(
-                ROHLIK_MCP_URL,
-                json=payload,
-                headers=self._headers,
-            ) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    _LOGGER.error(
-                        "MCP call failed: %s - %s", response.status, error_text
-                    )
-                    return {"error": f"HTTP {response.status}: {error_text}"}
-                
-                # Parse SSE response format
-                text = await response.text()
-                result = self._parse_sse_response(text)
+            with self._metrics.span(
+                STAGE_MCP_TOOL_CALL, f"{STAGE_MCP_TOOL_CALL}.{tool_name}"
+            ):
+                async with session.post(
+                    ROHLIK_MCP_URL,
+                    json=payload,
+                    headers=self._headers,
+                ) as response:
+                    if response.status != 200:
+                        error_text = await response.text()
+                        _LOGGER.error(
+                            "MCP call failed: %s - %s", response.status, error_text
+                        )
+                        error = {"error": f"HTTP {response.status}: {error_text}"}
+                        if response.status >= 500:
+                            self._mark_unavailable()
+                            error["unavailable"] = True
+                        return error
+                    
+                    # Parse SSE response format
+                    text = await response.text()
+                    result = self._parse_sse_response(text)
+                    self._mark_available()
                 
                 if "error" in result:
                     _LOGGER.error("MCP error: %s", result["error"])
                     return {"error": result["error"]}
-                
-                return result.get("result", {})
+
+                tool_result = result.get("result", {})
+                for listener in self._result_listeners:
+                    try:
+                        listener(tool_name, arguments, tool_result)
+                    except Exception:  # noqa: BLE001
+                        _LOGGER.exception("Error in MCP result listener")
+                return tool_result
                 
         except asyncio.TimeoutError:
             _LOGGER.error("MCP call timed out")
-            return {"error": "Request timed out"}
+            self._mark_unavailable()
+            # The server may still have applied the call
+            return {
+                "error": "Request timed out",
+                "unavailable": True,
+                "uncertain": True,
+            }
         except aiohttp.ClientError as err:
             _LOGGER.error("MCP client error: %s", err)
-            return {"error": str(err)}
+            self._mark_unavailable()
+            return {"error": str(err), "unavailable": True}
 
-    async def list_tools(self) -> dict[str, Any]:
+    async def call_tool(
+        self, tool_name: str, arguments: dict[str, Any]
+    ) -> dict[str, Any]:
+        """Call any upstream tool by its MCP name."""
+        return await self._call_tool(tool_name, arguments)
+
+    async def list_tools(self, timeout: float | None = None) -> dict[str, Any]:
         """List available tools from the MCP server."""
         session = await self._ensure_session()
         
@@ -106,11 +208,15 @@ class RohlikMCPClient:
             "method": "tools/list",
         }
 
+        # Fall back to the session timeout unless overridden
+        kwargs = {"timeout": aiohttp.ClientTimeout(total=timeout)} if timeout else {}
+
         try:
             async with session.post(
                 ROHLIK_MCP_URL,
                 json=payload,
                 headers=self._headers,
+                **kwargs,
             ) as response:
                 if response.status != 200:
                     return {"error": f"HTTP {response.status}"}
@@ -137,9 +243,20 @@ class RohlikMCPClient:
         quantity: int = 1,
     ) -> dict[str, Any]:
         """Add a product to the cart."""
+        return await self.add_items_to_cart([(product_id, quantity)])
+
+    async def add_items_to_cart(
+        self, items: list[tuple[int, int]]
+    ) -> dict[str, Any]:
+        """Add (product id, quantity) pairs to the cart in one call."""
         return await self._call_tool(
             "add_items_to_cart",
-            {"items": [{"productId": product_id, "quantity": quantity}]},
+            {
+                "items": [
+                    {"productId": product_id, "quantity": quantity}
+                    for product_id, quantity in items
+                ]
+            },
         )
 
     async def get_cart(self) -> dict[str, Any]:
@@ -168,6 +285,18 @@ class RohlikMCPClient:
         """Get user information."""
         return await self._call_tool("get_user_info", {})
 
+    async def async_warm_up(self) -> bool:
+        """Check the connection, fetch tool schemas and open the HTTP session."""
+        result = await self.list_tools(timeout=MCP_WARM_UP_TIMEOUT)
+        if "error" in result:
+            _LOGGER.warning("Rohlik MCP warm-up failed: %s", result["error"])
+            self._mark_unavailable()
+            return False
+        self.tools = result.get("result", {}).get("tools", [])
+        self._mark_available()
+        _LOGGER.debug("Rohlik MCP offers %d tools", len(self.tools))
+        return True
+
     async def test_connection(self) -> bool:
         """Test if the connection to Rohlik MCP server works."""
         try:
@@ -0,0 +1,77 @@
+"""Per-stage latency metrics for Rohlik Voice Assistant."""
+
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+import time
+from typing import Any
+
+# Stages of a conversation turn
+STAGE_LLM_REQUEST = "llm_request"
+STAGE_LLM_FIRST_TOKEN = "llm_first_token"
+STAGE_MCP_TOOL_CALL = "mcp_tool_call"
+STAGE_SSE_PARSE = "sse_parse"
+STAGE_AUDIO_FIRST_BYTE = "audio_first_byte"
+
+STAGES = (
+    STAGE_LLM_REQUEST,
+    STAGE_LLM_FIRST_TOKEN,
+    STAGE_MCP_TOOL_CALL,
+    STAGE_SSE_PARSE,
+    STAGE_AUDIO_FIRST_BYTE,
+)
+
+PERCENTILES = (50, 95, 99)
+
+# Number of most recent samples kept per stage
+WINDOW_SIZE = 200
+
+
+class LatencyMetrics:
+    """Rolling latency samples with percentile summaries."""
+
+    def __init__(self, window_size: int = WINDOW_SIZE) -> None:
+        """Initialize the metrics."""
+        self._window_size = window_size
+        self._samples: dict[str, deque[float]] = {}
+        self._counts: dict[str, int] = {}
+
+    def record(self, stage: str, duration_ms: float) -> None:
+        """Record a duration in milliseconds for a stage."""
+        samples = self._samples.get(stage)
+        if samples is None:
+            samples = self._samples[stage] = deque(maxlen=self._window_size)
+        samples.append(duration_ms)
+        self._counts[stage] = self._counts.get(stage, 0) + 1
+
+    @contextmanager
+    def span(self, *stages: str) -> Iterator[None]:
+        """Time a block of code and record it under one or more stages."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            duration_ms = (time.monotonic() - start) * 1000
+            for stage in stages:
+                self.record(stage, duration_ms)
+
+    def percentile(self, stage: str, percentile: float) -> float | None:
+        """Return a nearest-rank percentile for a stage, if sampled."""
+        samples = self._samples.get(stage)
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        rank = max(0, min(len(ordered) - 1, round(percentile / 100 * len(ordered)) - 1))
+        return round(ordered[rank], 1)
+
+    def as_dict(self) -> dict[str, dict[str, Any]]:
+        """Return a summary of all stages, including per-tool stages."""
+        return {
+            stage: {
+                "count": self._counts[stage],
+                **{f"p{pct}": self.percentile(stage, pct) for pct in PERCENTILES},
+            }
+            for stage in sorted(self._samples)
+        }
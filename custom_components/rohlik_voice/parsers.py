@@ -0,0 +1,187 @@
+"""Parsing of Rohlik MCP text content into compact product records."""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from dataclasses import dataclass
+import re
+from typing import Any
+
+from .codec import JSONDecodeError, json_loads
+
+# Key aliases seen in Rohlik MCP responses
+_ID_KEYS = ("productId", "product_id", "id")
+_NAME_KEYS = ("productName", "name", "title")
+_UNIT_PRICE_KEYS = ("pricePerUnit", "unitPrice", "price_per_unit")
+_STOCK_KEYS = ("inStock", "in_stock", "available")
+_TOTAL_KEYS = ("totalPrice", "total_price", "total")
+_CART_ITEMS_KEYS = ("items", "cartItems", "cart_items")
+
+_NUMBER_RE = re.compile(r"-?\d+(?:[.,]\d+)?")
+
+
+@dataclass(slots=True)
+class Product:
+    """A product from a search or cart response."""
+
+    id: int
+    name: str
+    brand: str | None = None
+    price: float | None = None
+    unit_price: float | None = None
+    unit: str | None = None
+    in_stock: bool | None = None
+    # Only set for cart items
+    quantity: int | None = None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the set fields, as sent to the LLM."""
+        return {
+            field: value
+            for field in self.__slots__
+            if (value := getattr(self, field)) is not None
+        }
+
+
+@dataclass(slots=True)
+class Cart:
+    """Cart contents."""
+
+    items: list[Product]
+    total: float | None = None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the cart as sent to the LLM."""
+        return {
+            "items": [item.as_dict() for item in self.items],
+            "total": self.total,
+        }
+
+
+def _first(node: dict[str, Any], keys: tuple[str, ...]) -> Any:
+    """Return the value of the first present key."""
+    for key in keys:
+        if key in node:
+            return node[key]
+    return None
+
+
+def parse_amount(value: Any) -> float | None:
+    """Parse a price given as a number, a string or an amount dict."""
+    if isinstance(value, dict):
+        value = value.get("amount", value.get("value"))
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str) and (match := _NUMBER_RE.search(value)):
+        return float(match.group().replace(",", "."))
+    return None
+
+
+def iter_json_content(result: dict[str, Any]) -> Iterator[Any]:
+    """Yield the JSON documents in the text content of an MCP result."""
+    for content in result.get("content") or []:
+        text = content.get("text") if isinstance(content, dict) else None
+        if not text:
+            continue
+        try:
+            yield json_loads(text)
+        except JSONDecodeError:
+            continue
+
+
+def _iter_product_dicts(data: Any) -> Iterator[dict[str, Any]]:
+    """Yield product-like dicts nested anywhere in a JSON document."""
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, dict):
+            if any(key in node for key in _ID_KEYS) and any(
+                key in node for key in _NAME_KEYS
+            ):
+                yield node
+                continue
+            stack.extend(
+                value
+                for value in reversed(node.values())
+                if isinstance(value, (list, dict))
+            )
+
+
+def parse_product(node: dict[str, Any]) -> Product | None:
+    """Parse one product dict."""
+    try:
+        product_id = int(_first(node, _ID_KEYS))
+    except (TypeError, ValueError):
+        return None
+    name = _first(node, _NAME_KEYS)
+    if not isinstance(name, str) or not name:
+        return None
+
+    unit_price = _first(node, _UNIT_PRICE_KEYS)
+    unit = unit_price.get("unit") if isinstance(unit_price, dict) else None
+    in_stock = _first(node, _STOCK_KEYS)
+    quantity = node.get("quantity")
+    brand = node.get("brand")
+    return Product(
+        id=product_id,
+        name=name,
+        brand=brand if isinstance(brand, str) and brand else None,
+        price=parse_amount(node.get("price")),
+        unit_price=parse_amount(unit_price),
+        unit=unit if isinstance(unit, str) else None,
+        in_stock=in_stock if isinstance(in_stock, bool) else None,
+        quantity=int(quantity) if isinstance(quantity, (int, float)) else None,
+    )
+
+
+def parse_products(result: dict[str, Any]) -> list[Product]:
+    """Parse all products in an MCP result."""
+    products = []
+    for data in iter_json_content(result):
+        for node in _iter_product_dicts(data):
+            if (product := parse_product(node)) is not None:
+                products.append(product)
+    return products
+
+
+def parse_cart(result: dict[str, Any]) -> Cart | None:
+    """Parse a get_cart result, None for errors and unrecognizable content."""
+    if "error" in result or result.get("isError"):
+        return None
+    for data in iter_json_content(result):
+        items = [
+            product
+            for node in _iter_product_dicts(data)
+            if (product := parse_product(node)) is not None
+        ]
+        # An error message must not read as an empty cart
+        known = isinstance(data, dict) and (
+            any(key in data for key in _TOTAL_KEYS)
+            or any(isinstance(data.get(key), list) for key in _CART_ITEMS_KEYS)
+        )
+        if items or known:
+            total = parse_amount(_first(data, _TOTAL_KEYS)) if known else None
+            return Cart(items, total)
+    return None
+
+
+def search_result(products: list[Product]) -> dict[str, Any]:
+    """Return compact search results for the LLM."""
+    return {"products": [product.as_dict() for product in products]}
+
+
+def compact_result(tool_name: str, result: dict[str, Any]) -> dict[str, Any]:
+    """Replace MCP text content with compact records where it parses."""
+    if "error" in result:
+        return result
+    if tool_name == "search_products":
+        if products := parse_products(result):
+            return search_result(products)
+    elif tool_name == "get_cart":
+        if (cart := parse_cart(result)) is not None:
+            return cart.as_dict()
+    return result
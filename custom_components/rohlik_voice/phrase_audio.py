@@ -0,0 +1,152 @@
+"""Synthesized audio of fixed and short templated replies, cached on disk."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+import hashlib
+import logging
+import os
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+
+from .codec import json_dumps_bytes
+from .const import DOMAIN
+from .tools import CART_CLEARED, CART_EMPTY, CART_OK
+from .write_queue import QUEUED_MESSAGE
+
+_LOGGER = logging.getLogger(__name__)
+
+PHRASE_DIR = f"{DOMAIN}_phrases"
+# Total size of cached audio before the least recently played is evicted
+MAX_CACHE_BYTES = 50 * 1024 * 1024
+# Longer replies rarely repeat word for word
+MAX_PHRASE_CHARS = 120
+
+# Synthesized ahead of time for every voice the card speaks with
+FIXED_PHRASES = (
+    CART_EMPTY,
+    CART_CLEARED,
+    CART_OK,
+    QUEUED_MESSAGE,
+)
+
+
+def voice_key(engine: str, language: str | None, options: dict[str, Any]) -> str:
+    """Return a stable id of a TTS voice and output format."""
+    return hashlib.sha1(
+        json_dumps_bytes([engine, language, sorted(options.items())])
+    ).hexdigest()[:16]
+
+
+def is_cacheable(text: str) -> bool:
+    """Return True if a reply is likely to be spoken again."""
+    return text in FIXED_PHRASES or len(text) <= MAX_PHRASE_CHARS
+
+
+class PhraseAudioCache:
+    """Keep PCM of repeated replies per voice in files with LRU eviction."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the cache."""
+        self._hass = hass
+        self._dir = hass.config.path(PHRASE_DIR)
+        # File name to size, least recently played first
+        self._files: OrderedDict[str, int] | None = None
+        self._bytes = 0
+        self._load_lock = asyncio.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def _name(voice: str, text: str) -> str:
+        """Return the file name of a phrase in a voice."""
+        digest = hashlib.sha1(text.encode()).hexdigest()[:24]
+        return f"{voice}_{digest}.pcm"
+
+    async def _async_index(self) -> OrderedDict[str, int]:
+        """Return the file index, scanning the directory on first use."""
+        async with self._load_lock:
+            if self._files is None:
+                files = await self._hass.async_add_executor_job(self._scan)
+                self._files = OrderedDict(files)
+                self._bytes = sum(self._files.values())
+        return self._files
+
+    def _scan(self) -> list[tuple[str, int]]:
+        """Return cached files and sizes, oldest played first."""
+        os.makedirs(self._dir, exist_ok=True)
+        entries = [
+            (entry.name, entry.stat())
+            for entry in os.scandir(self._dir)
+            if entry.name.endswith(".pcm")
+        ]
+        entries.sort(key=lambda entry: entry[1].st_mtime)
+        return [(name, stat.st_size) for name, stat in entries]
+
+    async def async_get(self, voice: str, text: str) -> bytes | None:
+        """Return the cached audio of a phrase, if any."""
+        files = await self._async_index()
+        name = self._name(voice, text)
+        if name not in files:
+            self._misses += 1
+            return None
+        files.move_to_end(name)
+        pcm = await self._hass.async_add_executor_job(self._read, name)
+        if pcm is None:
+            self._bytes -= files.pop(name, 0)
+            self._misses += 1
+            return None
+        self._hits += 1
+        return pcm
+
+    def _read(self, name: str) -> bytes | None:
+        """Read a phrase and mark it as recently played."""
+        path = os.path.join(self._dir, name)
+        try:
+            with open(path, "rb") as file:
+                pcm = file.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return pcm
+
+    async def async_contains(self, voice: str, text: str) -> bool:
+        """Return True if a phrase is cached, without counting a lookup."""
+        return self._name(voice, text) in await self._async_index()
+
+    async def async_put(self, voice: str, text: str, pcm: bytes) -> None:
+        """Store the audio of a phrase, evicting the least recently played."""
+        files = await self._async_index()
+        name = self._name(voice, text)
+        self._bytes += len(pcm) - files.pop(name, 0)
+        files[name] = len(pcm)
+        evicted = []
+        while self._bytes > MAX_CACHE_BYTES and len(files) > 1:
+            old, size = files.popitem(last=False)
+            self._bytes -= size
+            evicted.append(old)
+        if evicted:
+            _LOGGER.debug("Evicting %d cached phrases", len(evicted))
+        await self._hass.async_add_executor_job(self._write, name, pcm, evicted)
+
+    def _write(self, name: str, pcm: bytes, evicted: list[str]) -> None:
+        """Write a phrase and delete evicted ones."""
+        with open(os.path.join(self._dir, name), "wb") as file:
+            file.write(pcm)
+        for old in evicted:
+            try:
+                os.remove(os.path.join(self._dir, old))
+            except FileNotFoundError:
+                pass
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Return cache size and hit statistics."""
+        return {
+            "phrases": len(self._files or ()),
+            "bytes": self._bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+        }
@@ -0,0 +1,366 @@
+"""Learned tool-call plans for repeated phrasings."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Collection
+from dataclasses import dataclass
+import logging
+import re
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+from .product_index import fold, stem
+from .tools import CART_CLEARED, CART_EMPTY, CART_OK, _format_price
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 30
+# Bump when prompt or tool changes alter what a phrasing should do
+PLAN_CACHE_VERSION = 3
+
+MAX_PLANS = 500
+# Times the model must produce a plan, uncorrected, before it is served
+MIN_CONFIRMATIONS = 2
+
+QUANTITY_SLOT = "{quantity}"
+PRODUCT_SLOT = "{product}"
+
+# Arguments that point at earlier results, so the plan depends on context
+CONTEXT_ARGS = frozenset({"product_id", "productId"})
+# Tools too destructive to run without the model reading the request
+UNCACHEABLE_TOOLS = frozenset({"clear_cart", "remove_from_cart"})
+# Replies that only mean something as an answer to the previous question
+CONFIRMATION_WORDS = frozenset(
+    {"ano", "jo", "jj", "jasne", "ok", "okej", "dobre", "dobra", "urcite", "klidne"}
+    | {"prosim", "ne", "nee", "yes", "no", "sure", "yeah"}
+)
+
+NUMBER_WORDS = {
+    "jeden": 1,
+    "jedna": 1,
+    "jedno": 1,
+    "jednu": 1,
+    "dva": 2,
+    "dve": 2,
+    "tri": 3,
+    "ctyri": 4,
+    "pet": 5,
+    "sest": 6,
+    "sedm": 7,
+    "osm": 8,
+    "devet": 9,
+    "deset": 10,
+    "one": 1,
+    "two": 2,
+    "three": 3,
+    "four": 4,
+    "five": 5,
+}
+# First words of a turn that take back the previous answer
+CORRECTION_WORDS = frozenset({"ne", "spatne", "nechci", "jiny", "jinou", "jine"})
+
+_WORD_RE = re.compile(r"\w+")
+
+PlannedCall = tuple[str, dict[str, Any]]
+
+
+@dataclass(slots=True)
+class PlanEntry:
+    """A learned plan and how often it was confirmed and served."""
+
+    plan: list[PlannedCall]
+    confirmations: int = 1
+    hits: int = 0
+
+
+def _words(text: str) -> tuple[list[str], list[str]]:
+    """Return the lowercase and the folded words of an utterance."""
+    original = _WORD_RE.findall(text.lower())
+    return original, [fold(word) for word in original]
+
+
+def parse_quantity(word: str) -> int | None:
+    """Return the number a folded word stands for."""
+    if word.isdigit():
+        return int(word)
+    return NUMBER_WORDS.get(word)
+
+
+def is_correction(text: str) -> bool:
+    """Return True if a turn starts by rejecting the previous answer."""
+    _, words = _words(text)
+    return bool(words) and words[0] in CORRECTION_WORDS
+
+
+def _find_span(words: list[str], value: str) -> tuple[int, int] | None:
+    """Return the word span of an utterance that a product keyword came from."""
+    stems = [stem(fold(word)) for word in _WORD_RE.findall(value)]
+    if not stems:
+        return None
+    for start in range(len(words) - len(stems) + 1):
+        if all(
+            stem(words[start + offset]) == token for offset, token in enumerate(stems)
+        ):
+            return start, start + len(stems)
+    return None
+
+
+def _fill(value: Any, slots: dict[str, Any]) -> Any:
+    """Replace a slot marker with its value."""
+    return slots.get(value, value) if isinstance(value, str) else value
+
+
+class PlanCache:
+    """Map normalized utterances with slots to confirmed tool-call plans."""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the cache."""
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.plans"
+        )
+        # Templates in least recently used order
+        self._plans: OrderedDict[str, PlanEntry] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def __len__(self) -> int:
+        """Return the number of learned plans."""
+        return len(self._plans)
+
+    async def async_load(self) -> None:
+        """Load learned plans, dropping those of another cache version."""
+        data = await self._store.async_load()
+        if not data or data.get("version") != PLAN_CACHE_VERSION:
+            return
+        for key, (plan, confirmations, hits) in data["plans"].items():
+            self._plans[key] = PlanEntry(
+                [(name, args) for name, args in plan], confirmations, hits
+            )
+
+    async def async_save(self) -> None:
+        """Write the plans to disk now, e.g. on unload."""
+        await self._store.async_save(self._data_to_save())
+
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return data for the store."""
+        return {
+            "version": PLAN_CACHE_VERSION,
+            "plans": {
+                key: [entry.plan, entry.confirmations, entry.hits]
+                for key, entry in self._plans.items()
+            },
+        }
+
+    def _async_schedule_save(self) -> None:
+        """Save soon, coalescing bursts of changes."""
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @staticmethod
+    def template(
+        text: str, plan: list[PlannedCall]
+    ) -> tuple[str, list[PlannedCall]] | None:
+        """Return the template key and slotted plan, or None if not cacheable."""
+        _, words = _words(text)
+        if not words or not plan:
+            return None
+        key_words: list[str | None] = list(words)
+        slots: dict[str, Any] = {}
+
+        def bind(slot: str, value: Any) -> bool:
+            """Bind a slot to one value per utterance."""
+            return slots.setdefault(slot, value) == value
+
+        if all(word in CONFIRMATION_WORDS for word in words):
+            return None
+        slotted: list[PlannedCall] = []
+        for name, arguments in plan:
+            if name in UNCACHEABLE_TOOLS:
+                return None
+            args: dict[str, Any] = {}
+            for arg, value in arguments.items():
+                if arg in CONTEXT_ARGS:
+                    return None
+                if isinstance(value, int) and not isinstance(value, bool):
+                    index = next(
+                        (
+                            i
+                            for i, word in enumerate(words)
+                            if parse_quantity(word) == value
+                        ),
+                        None,
+                    )
+                    if index is not None:
+                        if not bind(QUANTITY_SLOT, value):
+                            return None
+                        key_words[index] = QUANTITY_SLOT
+                        value = QUANTITY_SLOT
+                elif isinstance(value, str) and (span := _find_span(words, value)):
+                    if not bind(PRODUCT_SLOT, value):
+                        return None
+                    start, end = span
+                    key_words[start] = PRODUCT_SLOT
+                    key_words[start + 1 : end] = [None] * (end - start - 1)
+                    value = PRODUCT_SLOT
+                args[arg] = value
+            slotted.append((name, args))
+        if all(word in (None, QUANTITY_SLOT, PRODUCT_SLOT) for word in key_words):
+            # Only slots left, the template would match any utterance
+            return None
+        key = " ".join(word for word in key_words if word is not None)
+        return key, slotted
+
+    def learn(self, text: str, plan: list[PlannedCall]) -> str | None:
+        """Record the plan the model made for an utterance, returning its key."""
+        templated = self.template(text, plan)
+        if templated is None:
+            return None
+        key, slotted = templated
+        entry = self._plans.get(key)
+        if entry is not None and entry.plan == slotted:
+            entry.confirmations += 1
+            self._plans.move_to_end(key)
+        else:
+            # New phrasing, or the model changed its mind
+            self._plans[key] = PlanEntry(slotted)
+            if len(self._plans) > MAX_PLANS:
+                self._plans.popitem(last=False)
+        self._async_schedule_save()
+        return key
+
+    def forget(self, key: str) -> None:
+        """Drop a plan the user corrected."""
+        if self._plans.pop(key, None) is not None:
+            _LOGGER.debug("Forgot plan for '%s'", key)
+            self._async_schedule_save()
+
+    def _candidates(self, text: str) -> list[tuple[str, dict[str, Any]]]:
+        """Return every template key an utterance can match, with slot values."""
+        original, words = _words(text)
+        quantities: list[tuple[int | None, Any]] = [(None, None)]
+        quantities += [
+            (index, number)
+            for index, word in enumerate(words)
+            if (number := parse_quantity(word)) is not None
+        ]
+        # (words taken by slots, key, slot values)
+        candidates: list[tuple[int, str, dict[str, Any]]] = []
+        for q_index, number in quantities:
+            spans: list[tuple[int, int] | None] = [None]
+            spans += [
+                (start, end)
+                for start in range(len(words))
+                for end in range(start + 1, len(words) + 1)
+                if q_index is None or not start <= q_index < end
+            ]
+            for span in spans:
+                key_words: list[str | None] = list(words)
+                slots: dict[str, Any] = {}
+                taken = 0
+                if q_index is not None:
+                    key_words[q_index] = QUANTITY_SLOT
+                    slots[QUANTITY_SLOT] = number
+                    taken += 1
+                if span is not None:
+                    start, end = span
+                    key_words[start] = PRODUCT_SLOT
+                    key_words[start + 1 : end] = [None] * (end - start - 1)
+                    slots[PRODUCT_SLOT] = " ".join(original[start:end])
+                    taken += end - start
+                if taken >= len(words):
+                    # A template keeps at least one literal word
+                    continue
+                key = " ".join(word for word in key_words if word is not None)
+                candidates.append((taken, key, slots))
+        # The most literal template wins
+        candidates.sort(key=lambda candidate: candidate[0])
+        return [(key, slots) for _, key, slots in candidates]
+
+    def lookup(
+        self, text: str, enabled: Collection[str]
+    ) -> tuple[str, list[PlannedCall]] | None:
+        """Return the key and filled-in plan of a confirmed template."""
+        for key, slots in self._candidates(text):
+            entry = self._plans.get(key)
+            if entry is None or entry.confirmations < MIN_CONFIRMATIONS:
+                continue
+            if not all(name in enabled for name, _ in entry.plan):
+                continue
+            entry.hits += 1
+            self._hits += 1
+            self._plans.move_to_end(key)
+            self._async_schedule_save()
+            return key, [
+                (name, {arg: _fill(value, slots) for arg, value in args.items()})
+                for name, args in entry.plan
+            ]
+        self._misses += 1
+        return None
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Return plan counts and lookup statistics."""
+        return {
+            "plans": len(self._plans),
+            "confirmed": sum(
+                entry.confirmations >= MIN_CONFIRMATIONS
+                for entry in self._plans.values()
+            ),
+            "hits": self._hits,
+            "misses": self._misses,
+        }
+
+
+def template_reply(
+    plan: list[PlannedCall], results: list[dict[str, Any]]
+) -> str | None:
+    """Return a spoken reply built from tool results, or None to ask the model."""
+    sentences = []
+    for (name, _), result in zip(plan, results):
+        if "error" in result:
+            return None
+        if result.get("queued"):
+            sentences.append(result["message"])
+        elif name == "search_products" and "top_pick" in result:
+            top = result["top_pick"]
+            if result["confident"]:
+                sentences.append(
+                    f"Vybral jsem {top['name']}{_format_price(top.get('price'))}. "
+                    "Mám ho přidat do košíku?"
+                )
+            else:
+                names = [top["name"], *(p["name"] for p in result["alternatives"][:2])]
+                sentences.append(f"Našel jsem {', '.join(names)}. Který chcete?")
+        elif name == "get_cart" and "items" in result:
+            if not result["items"]:
+                sentences.append(CART_EMPTY)
+                continue
+            lines = "; ".join(
+                f"{item.get('quantity') or 1}× {item['name']}"
+                for item in result["items"]
+            )
+            total = _format_price(result.get("total")).replace(" za", ", celkem")
+            sentences.append(f"V košíku máte {lines}{total}.")
+        elif name == "check_cart" and "unavailable" in result:
+            if missing := result["unavailable"]:
+                sentences.append(f"Vyprodané je: {', '.join(missing)}.")
+            for change in result["price_changes"]:
+                new = _format_price(change["new"]).replace(" za", "")
+                old = _format_price(change["old"]).replace(" za", "")
+                sentences.append(f"{change['name']} stojí teď{new} místo{old}.")
+            if not missing and not result["price_changes"]:
+                sentences.append(CART_OK)
+        elif name == "clear_cart":
+            sentences.append(CART_CLEARED)
+        elif name == "reorder_usual" and "added" in result:
+            names = ", ".join(
+                item["name"] or str(item["id"]) for item in result["added"]
+            )
+            sentences.append(f"Přidal jsem obvyklý nákup: {names}.")
+        else:
+            return None
+    return " ".join(sentences)
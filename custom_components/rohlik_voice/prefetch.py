@@ -0,0 +1,145 @@
+"""Speculative product search prefetch from user transcripts."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+
+from .mcp_client import RohlikMCPClient
+from .product_index import STOPWORDS, ProductIndex, fold, tokenize
+
+_LOGGER = logging.getLogger(__name__)
+
+# Search results are reused for this long
+CACHE_TTL = 120
+MAX_CACHE_ENTRIES = 64
+# Speculative searches started per user utterance
+MAX_PREFETCH_TERMS = 3
+MIN_TERM_LENGTH = 3
+
+
+def cache_key(keyword: str) -> str:
+    """Return a key shared by inflected forms of the same search."""
+    return " ".join(sorted(tokenize(keyword, query=True)))
+
+
+def extract_product_terms(transcript: str, final: bool = True) -> list[str]:
+    """Return phrases of a transcript that likely name a product.
+
+    Neighbouring product words stay together, the model searches for
+    "polotučné mléko" rather than for each word on its own.
+    """
+    words = transcript.split()
+    if not final and words and not transcript[-1:].isspace():
+        # The last word of a partial transcript may still change
+        words = words[:-1]
+    terms: list[str] = []
+    phrase: list[str] = []
+    for raw in [*words, ""]:
+        word = raw.strip(".,!?;:\"'()")
+        folded = fold(word)
+        if (
+            len(word) >= MIN_TERM_LENGTH
+            and folded not in STOPWORDS
+            and folded.isalpha()
+        ):
+            phrase.append(word)
+            if not raw.endswith((",", ".", ";", "!", "?")):
+                continue
+        if not (raw or final):
+            # A phrase at the end of a partial transcript may still grow
+            break
+        if phrase and (term := " ".join(phrase)) not in terms:
+            terms.append(term)
+        phrase = []
+    return terms[:MAX_PREFETCH_TERMS]
+
+
+class SearchCache:
+    """Short-lived search_products cache shared with speculative prefetches."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        mcp_client: RohlikMCPClient,
+        product_index: ProductIndex,
+    ) -> None:
+        """Initialize the cache."""
+        self._hass = hass
+        self._mcp_client = mcp_client
+        self._product_index = product_index
+        # key -> (expires at, in-flight or finished search)
+        self._entries: dict[str, tuple[float, asyncio.Future[dict[str, Any]]]] = {}
+        self.stats = {"hits": 0, "misses": 0, "prefetched": 0}
+
+    def _get(self, key: str) -> asyncio.Future[dict[str, Any]] | None:
+        """Return a fresh cached search."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+        return entry[1]
+
+    def _start(self, keyword: str, key: str) -> asyncio.Future[dict[str, Any]]:
+        """Start a server search and cache it."""
+        task = self._hass.async_create_background_task(
+            self._mcp_client.search_products(keyword=keyword),
+            f"rohlik_voice_search_{key}",
+        )
+        task.add_done_callback(lambda done: self._on_done(key, done))
+        if len(self._entries) >= MAX_CACHE_ENTRIES:
+            # Drop the entry closest to expiry
+            oldest = min(self._entries, key=lambda k: self._entries[k][0])
+            del self._entries[oldest]
+        self._entries[key] = (time.monotonic() + CACHE_TTL, task)
+        return task
+
+    def _on_done(self, key: str, task: asyncio.Future[dict[str, Any]]) -> None:
+        """Forget failed searches so the next call retries."""
+        if task.cancelled() or task.exception() or "error" in task.result():
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is task:
+                del self._entries[key]
+
+    async def async_search(self, keyword: str) -> dict[str, Any]:
+        """Return search results, reusing a cached or in-flight search."""
+        key = cache_key(keyword)
+        if not key:
+            return await self._mcp_client.search_products(keyword=keyword)
+        if (future := self._get(key)) is not None:
+            self.stats["hits"] += 1
+            _LOGGER.debug("Search for '%s' served from cache", keyword)
+        else:
+            self.stats["misses"] += 1
+            future = self._start(keyword, key)
+        # A cancelled caller must not cancel the shared search
+        return await asyncio.shield(future)
+
+    def refresh(self, keyword: str) -> None:
+        """Search the server in the background, updating indexed products."""
+        key = cache_key(keyword)
+        if key and self._get(key) is None:
+            self._start(keyword, key)
+
+    def prefetch_transcript(self, transcript: str, final: bool = True) -> None:
+        """Start searches for products mentioned in a user transcript."""
+        for term in extract_product_terms(transcript, final):
+            key = cache_key(term)
+            if not key or self._get(key) is not None:
+                continue
+            if self._product_index.lookup(term):
+                # Already answered locally
+                continue
+            _LOGGER.debug("Prefetching search for '%s'", term)
+            self.stats["prefetched"] += 1
+            self._start(term, key)
+
+    def invalidate(self) -> None:
+        """Drop all cached searches."""
+        self._entries.clear()
@@ -0,0 +1,352 @@
+"""Local product index with Czech-aware fuzzy search."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import replace
+import logging
+import re
+import time
+import unicodedata
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+from .parsers import Product, parse_cart, parse_products
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 60
+
+MAX_PRODUCTS = 5000
+# Records older than this are only used as hints, never served as results
+MAX_RESULT_AGE = 3 * 24 * 3600
+# Stock and prices change faster than names, older values are not served
+STOCK_MAX_AGE = 3600
+PRICE_MAX_AGE = 24 * 3600
+# Records not seen for this long are dropped when the index is loaded
+RETENTION = 90 * 24 * 3600
+# Minimum trigram similarity for a fuzzy token match
+FUZZY_THRESHOLD = 0.4
+# Minimum score for a local search to replace the server search
+CONFIDENT_SCORE = 0.85
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_WORD_RE = re.compile(r"\w+")
+
+# Czech case and number endings, longest first (applied to folded text)
+_SUFFIXES = (
+    "atech", "etech", "ovych", "ovou",
+    "ami", "emi", "ech", "ich", "ych", "ymi", "eho", "emu", "ove", "ovi", "ovy",
+    "ou", "um", "em", "om", "es",
+    "a", "e", "i", "o", "u", "y",
+)
+
+# Words of shopping commands that never name a product
+STOPWORDS = frozenset(
+    (
+        "pridej pridat pridejte dej dejte kup kupit koupit koupi chci chtel chtela "
+        "bych potrebuju potrebuji prosim mi me nam do kosiku kosik nejake nejaky "
+        "nejakou a i k s se na za od pro jeden jedna jedno dva dve tri ctyri "
+        "pet kus kusy kusu baleni ks jeste taky take objednej objednat vloz "
+        "prihod hod mam mame ale jak co je v ve z ze o u "
+        # Questions and other cart commands
+        "kolik stoji cena ceny kde jaky jaka jake ktery ktera ktere mate "
+        "odeber odebrat odeberte odstran odstranit smaz smazat vymaz zrus zrusit "
+        "vyprazdni vyprazdnit zobraz zobrazit ukaz ukazat rekni najdi najit "
+        "hledej vyhledej zmen zmenit uprav nastav obsah nakup nakupni seznam "
+        "muj moje moji celkem vsechno vse nic tam tady to ten ta ano ne diky dekuji"
+    ).split()
+)
+
+def fold(text: str) -> str:
+    """Lowercase and strip diacritics."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def stem(token: str) -> str:
+    """Strip one Czech inflection suffix from a folded token."""
+    if len(token) <= 3 or token.isdigit():
+        return token
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[: -len(suffix)]
+    return token
+
+
+def colloquial_variants(word: str) -> set[str]:
+    """Return standard Czech forms of a colloquial word (mlíko -> mléko)."""
+    word = word.lower()
+    variants = {word}
+    if "í" in word:
+        variants.add(word.replace("í", "é"))
+    if word.endswith("ej"):
+        variants.add(word[:-2] + "ý")
+    if word.startswith("vo") and len(word) > 4:
+        variants.add(word[1:])
+    return variants
+
+
+def tokenize(text: str, query: bool = False) -> list[str]:
+    """Return stemmed, folded tokens; queries drop command words."""
+    tokens = []
+    for word in _TOKEN_RE.findall(fold(text)):
+        if query and word in STOPWORDS:
+            continue
+        tokens.append(stem(word))
+    return tokens
+
+
+def _query_tokens(text: str) -> list[set[str]]:
+    """Return alternative stemmed tokens for each query word."""
+    alternatives = []
+    for word in _WORD_RE.findall(text):
+        if fold(word) in STOPWORDS:
+            continue
+        options = set()
+        for variant in colloquial_variants(word):
+            options.update(tokenize(variant, query=True))
+        if options:
+            alternatives.append(options)
+    return alternatives
+
+
+def trigrams(token: str) -> set[str]:
+    """Return padded character trigrams of a token."""
+    padded = f"  {token} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def _token_similarity(token: str, candidate: str) -> float:
+    """Return the Jaccard similarity of two tokens' trigram sets."""
+    grams, other = trigrams(token), trigrams(candidate)
+    return len(grams & other) / len(grams | other)
+
+
+def match_score(query: str, name: str) -> float:
+    """Return the share of query words found, possibly fuzzily, in a name."""
+    alternatives = _query_tokens(query)
+    if not alternatives:
+        return 0.0
+    name_tokens = set(tokenize(name))
+    total = 0.0
+    for options in alternatives:
+        if options & name_tokens:
+            total += 1.0
+            continue
+        best = max(
+            (
+                _token_similarity(token, candidate)
+                for token in options
+                for candidate in name_tokens
+            ),
+            default=0.0,
+        )
+        if best >= FUZZY_THRESHOLD:
+            total += best
+    return total / len(alternatives)
+
+
+class ProductIndex:
+    """Bounded in-memory index of products seen in search and cart results."""
+
+    def __init__(
+        self, hass: HomeAssistant, entry_id: str, max_products: int = MAX_PRODUCTS
+    ) -> None:
+        """Initialize the index."""
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.products"
+        )
+        self._max_products = max_products
+        # id -> product, least recently seen first
+        self._products: OrderedDict[int, Product] = OrderedDict()
+        self._seen_at: dict[int, float] = {}
+        self._cart_counts: dict[int, int] = {}
+        self._postings: dict[str, set[int]] = {}
+        self._trigrams: dict[str, set[str]] = {}
+
+    def __len__(self) -> int:
+        """Return the number of indexed products."""
+        return len(self._products)
+
+    def get(self, product_id: int) -> Product | None:
+        """Return an indexed product."""
+        return self._products.get(product_id)
+
+    def cart_count(self, product_id: int) -> int:
+        """Return how many times a product was seen in the cart."""
+        return self._cart_counts.get(product_id, 0)
+
+    async def async_load(self) -> None:
+        """Load persisted records, dropping stale ones, and rebuild the index."""
+        data = await self._store.async_load()
+        if not data or "ids" not in data:
+            return
+        oldest = time.time() - RETENTION
+        for values in zip(
+            data["ids"],
+            data["names"],
+            data["brands"],
+            data["prices"],
+            data["unit_prices"],
+            data["units"],
+            data["in_stock"],
+            data["seen_at"],
+            data["cart_counts"],
+        ):
+            if values[7] < oldest:
+                continue
+            self._insert(Product(*values[:7]), values[7], values[8])
+        _LOGGER.debug("Loaded %d indexed products", len(self._products))
+
+    async def async_save(self) -> None:
+        """Write the records to disk now, e.g. on unload."""
+        await self._store.async_save(self._data_to_save())
+
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return the records as columns, which keeps the file compact."""
+        products = self._products.values()
+        return {
+            "ids": list(self._products),
+            "names": [product.name for product in products],
+            "brands": [product.brand for product in products],
+            "prices": [product.price for product in products],
+            "unit_prices": [product.unit_price for product in products],
+            "units": [product.unit for product in products],
+            "in_stock": [product.in_stock for product in products],
+            "seen_at": [self._seen_at[product_id] for product_id in self._products],
+            "cart_counts": [
+                self.cart_count(product_id) for product_id in self._products
+            ],
+        }
+
+    def observe(
+        self, tool_name: str, arguments: dict[str, Any], result: dict[str, Any]
+    ) -> None:
+        """Index products from an MCP tool result."""
+        if tool_name == "get_cart":
+            cart = parse_cart(result)
+            products = cart.items if cart is not None else []
+        elif tool_name in ("search_products", "add_items_to_cart"):
+            products = parse_products(result)
+        else:
+            return
+        now = time.time()
+        for product in products:
+            # Cart quantities are not product attributes
+            product.quantity = None
+            cart_count = self.cart_count(product.id) + (tool_name == "get_cart")
+            self._insert(product, now, cart_count)
+        if products:
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def _insert(self, product: Product, seen_at: float, cart_count: int) -> None:
+        """Add or replace a product, evicting the least recently seen."""
+        product_id = product.id
+        if product_id in self._products:
+            self._remove(product_id)
+        self._products[product_id] = product
+        self._seen_at[product_id] = seen_at
+        if cart_count:
+            self._cart_counts[product_id] = cart_count
+        for token in set(tokenize(product.name)):
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = set()
+                for gram in trigrams(token):
+                    self._trigrams.setdefault(gram, set()).add(token)
+            postings.add(product_id)
+        while len(self._products) > self._max_products:
+            self._remove(next(iter(self._products)))
+
+    def _remove(self, product_id: int) -> None:
+        """Remove a product and drop tokens no other product uses."""
+        product = self._products.pop(product_id)
+        del self._seen_at[product_id]
+        self._cart_counts.pop(product_id, None)
+        for token in set(tokenize(product.name)):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.discard(product_id)
+            if not postings:
+                del self._postings[token]
+                for gram in trigrams(token):
+                    tokens = self._trigrams.get(gram)
+                    if tokens is not None:
+                        tokens.discard(token)
+                        if not tokens:
+                            del self._trigrams[gram]
+
+    def _match_token(self, token: str) -> dict[str, float]:
+        """Return vocabulary tokens similar to a query token with weights."""
+        if token in self._postings:
+            return {token: 1.0}
+        grams = trigrams(token)
+        overlap: dict[str, int] = {}
+        for gram in grams:
+            for candidate in self._trigrams.get(gram, ()):
+                overlap[candidate] = overlap.get(candidate, 0) + 1
+        matches = {}
+        for candidate, shared in overlap.items():
+            # Jaccard similarity of the trigram sets
+            similarity = shared / (len(grams) + len(trigrams(candidate)) - shared)
+            if similarity >= FUZZY_THRESHOLD:
+                matches[candidate] = similarity
+        return matches
+
+    def search(
+        self, text: str, limit: int = 10, max_age: float | None = None
+    ) -> list[tuple[float, Product]]:
+        """Return (score, product) pairs best matching the text, best first."""
+        query = _query_tokens(text)
+        if not query:
+            return []
+        scores: dict[int, float] = {}
+        for alternatives in query:
+            best: dict[int, float] = {}
+            for token in alternatives:
+                for match, weight in self._match_token(token).items():
+                    for product_id in self._postings[match]:
+                        if weight > best.get(product_id, 0.0):
+                            best[product_id] = weight
+            for product_id, weight in best.items():
+                scores[product_id] = scores.get(product_id, 0.0) + weight
+
+        oldest = time.time() - max_age if max_age is not None else None
+        results = []
+        for product_id, score in scores.items():
+            if oldest is not None and self._seen_at[product_id] < oldest:
+                continue
+            results.append((score / len(query), self._products[product_id]))
+        results.sort(key=lambda item: (-item[0], -self.cart_count(item[1].id)))
+        return results[:limit]
+
+    def lookup(self, keyword: str, limit: int = 10) -> list[Product] | None:
+        """Return fresh local matches if the keyword resolves confidently."""
+        results = self.search(keyword, limit, max_age=MAX_RESULT_AGE)
+        if not results or results[0][0] < CONFIDENT_SCORE:
+            return None
+        now = time.time()
+        products = []
+        for score, product in results:
+            if score < CONFIDENT_SCORE:
+                continue
+            age = now - self._seen_at[product.id]
+            if age > PRICE_MAX_AGE:
+                product = replace(product, price=None, unit_price=None, in_stock=None)
+            elif age > STOCK_MAX_AGE:
+                product = replace(product, in_stock=None)
+            products.append(product)
+        return products
+
+    def is_fresh(self, products: list[Product]) -> bool:
+        """Return True if the stock of all products was seen recently."""
+        oldest = time.time() - STOCK_MAX_AGE
+        return all(
+            self._seen_at.get(product.id, 0.0) >= oldest for product in products
+        )
@@ -0,0 +1,147 @@
+"""Sampling profiler and event-loop lag monitor for Rohlik Voice Assistant."""
+
+from __future__ import annotations
+
+from collections import Counter
+import logging
+import os
+import sys
+import threading
+import time
+from types import FrameType
+
+from homeassistant.core import HomeAssistant, callback
+
+_LOGGER = logging.getLogger(__name__)
+
+INTEGRATION_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Loop-lag monitor defaults
+LAG_THRESHOLD = 0.1
+HEARTBEAT_INTERVAL = 0.05
+
+
+def _stack(frame: FrameType | None) -> list[FrameType]:
+    """Return the frames of a stack, outermost first."""
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+def _is_integration_frame(frame: FrameType) -> bool:
+    """Return True if the frame runs code of this integration."""
+    return frame.f_code.co_filename.startswith(INTEGRATION_DIR)
+
+
+def _describe(frame: FrameType) -> str:
+    """Return a short 'function (file:line)' label for a frame."""
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def integration_call_sites(thread_id: int) -> list[str]:
+    """Return the integration frames a thread is currently executing."""
+    frame = sys._current_frames().get(thread_id)
+    return [_describe(f) for f in _stack(frame) if _is_integration_frame(f)]
+
+
+class SamplingProfiler:
+    """Sample the event loop thread and keep stacks that touch the integration."""
+
+    def __init__(self, thread_id: int, interval: float = 0.005) -> None:
+        """Initialize the profiler for the given thread."""
+        self._thread_id = thread_id
+        self._interval = interval
+        self.samples = 0
+        self.stacks: Counter[str] = Counter()
+
+    def run(self, duration: float) -> None:
+        """Sample for a duration. Blocks, run it in a worker thread."""
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(self._thread_id)
+            self.samples += 1
+            frames = _stack(frame)
+            if any(_is_integration_frame(f) for f in frames):
+                self.stacks[
+                    ";".join(
+                        f"{f.f_code.co_name} ({os.path.basename(f.f_code.co_filename)})"
+                        for f in frames
+                    )
+                ] += 1
+            time.sleep(self._interval)
+
+    def write_folded(self, path: str) -> None:
+        """Write collapsed stacks, the input format of flamegraph tools."""
+        with open(path, "w", encoding="utf-8") as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+
+class LoopLagMonitor:
+    """Log event-loop stalls that happen inside integration code."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        threshold: float = LAG_THRESHOLD,
+        interval: float = HEARTBEAT_INTERVAL,
+    ) -> None:
+        """Initialize the monitor."""
+        self._hass = hass
+        self._threshold = threshold
+        self._interval = interval
+        self._loop_thread_id = 0
+        self._last_beat = 0.0
+        self._stall_sites: list[str] | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._cancel_beat = None
+
+    @callback
+    def async_start(self) -> None:
+        """Start the heartbeat and the watchdog thread."""
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._schedule_beat()
+        self._thread = threading.Thread(
+            target=self._watch, name="rohlik_voice_loop_lag", daemon=True
+        )
+        self._thread.start()
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop monitoring."""
+        self._stop.set()
+        if self._cancel_beat is not None:
+            self._cancel_beat.cancel()
+            self._cancel_beat = None
+
+    def _schedule_beat(self) -> None:
+        """Schedule the next heartbeat on the loop."""
+        self._cancel_beat = self._hass.loop.call_later(self._interval, self._beat)
+
+    def _beat(self) -> None:
+        """Heartbeat; reports a stall once the loop is running again."""
+        now = time.monotonic()
+        lag = now - self._last_beat - self._interval
+        self._last_beat = now
+        sites, self._stall_sites = self._stall_sites, None
+        if sites:
+            _LOGGER.warning(
+                "Event loop blocked for %.0f ms in Rohlik Voice code: %s",
+                lag * 1000,
+                " -> ".join(sites),
+            )
+        if not self._stop.is_set():
+            self._schedule_beat()
+
+    def _watch(self) -> None:
+        """Watchdog thread: capture the loop stack while it is stalled."""
+        while not self._stop.wait(self._interval):
+            stalled = time.monotonic() - self._last_beat - self._interval
+            if stalled > self._threshold and self._stall_sites is None:
+                self._stall_sites = integration_call_sites(self._loop_thread_id)
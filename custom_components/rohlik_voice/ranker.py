@@ -0,0 +1,133 @@
+"""Local ranking of search results to pick the product the user means."""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+import logging
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+
+from .const import CONF_PREFERRED_BRANDS
+from .history import PurchaseHistory
+from .parsers import Product
+from .product_index import fold, match_score
+
+_LOGGER = logging.getLogger(__name__)
+
+# Feature weights, each feature is normalized to 0..1 across the result set
+WEIGHTS = {
+    "match": 0.35,
+    "history": 0.30,
+    "stock": 0.15,
+    "price": 0.10,
+    "brand": 0.10,
+}
+# Score lead over the runner-up needed to skip asking the user
+CONFIDENCE_MARGIN = 0.2
+MAX_ALTERNATIVES = 4
+
+
+def preferred_brands(options: Mapping[str, Any]) -> list[str]:
+    """Return folded preferred brands from the config entry options."""
+    value = options.get(CONF_PREFERRED_BRANDS, "")
+    return [fold(brand.strip()) for brand in value.split(",") if brand.strip()]
+
+
+def _normalize(column: list[float]) -> list[float]:
+    """Scale a column to 0..1, constant columns become 0."""
+    low = min(column)
+    spread = max(column) - low
+    if not spread:
+        return [0.0] * len(column)
+    return [(value - low) / spread for value in column]
+
+
+class ProductRanker:
+    """Score search results by match, purchase history, stock, price and brand."""
+
+    def __init__(self, history: PurchaseHistory, entry: ConfigEntry) -> None:
+        """Initialize the ranker."""
+        self._history = history
+        self._entry = entry
+
+    def score(self, keyword: str, products: list[Product]) -> list[float]:
+        """Return a score per product, computed column by column."""
+        brands = preferred_brands(self._entry.options)
+
+        match = [match_score(keyword, product.name) for product in products]
+        history = _normalize(
+            [self._history.score(product.id) for product in products]
+        )
+        stock = [
+            {True: 1.0, None: 0.5, False: 0.0}[product.in_stock] for product in products
+        ]
+        # Cheaper per unit is better, unknown prices count as the most expensive
+        prices = [
+            product.unit_price if product.unit_price is not None else product.price
+            for product in products
+        ]
+        known = [price for price in prices if price is not None]
+        worst = max(known) if known else 0.0
+        price = [
+            1.0 - value
+            for value in _normalize(
+                [worst if value is None else value for value in prices]
+            )
+        ]
+        brand = [
+            1.0
+            if product.brand and any(b in fold(product.brand) for b in brands)
+            else 0.0
+            for product in products
+        ]
+
+        columns = {
+            "match": match,
+            "history": history,
+            "stock": stock,
+            "price": price,
+            "brand": brand,
+        }
+        scores = [0.0] * len(products)
+        for feature, column in columns.items():
+            weight = WEIGHTS[feature]
+            for i, value in enumerate(column):
+                scores[i] += weight * value
+        return scores
+
+    def ranked(
+        self, keyword: str, products: list[Product]
+    ) -> list[tuple[float, Product]]:
+        """Return (score, product) pairs, best first."""
+        scores = self.score(keyword, products)
+        return sorted(zip(scores, products), key=lambda pair: -pair[0])
+
+    def rank(self, keyword: str, products: list[Product]) -> dict[str, Any]:
+        """Return the top pick, whether it is confident, and alternatives."""
+        ranked = self.ranked(keyword, products)
+        top_score, top = ranked[0]
+        _LOGGER.debug(
+            "Ranked %d results for '%s': %s (%.2f)",
+            len(ranked),
+            keyword,
+            top.name,
+            top_score,
+        )
+        return {
+            "top_pick": top.as_dict(),
+            "confident": is_confident(ranked),
+            "alternatives": [
+                product.as_dict() for _, product in ranked[1 : MAX_ALTERNATIVES + 1]
+            ],
+            "total_results": len(ranked),
+        }
+
+
+def is_confident(ranked: list[tuple[float, Product]]) -> bool:
+    """Return True if the top pick is in stock and clearly ahead."""
+    top_score, top = ranked[0]
+    runner_up = ranked[1][0] if len(ranked) > 1 else 0.0
+    return top.in_stock is not False and (
+        len(ranked) == 1 or top_score - runner_up >= CONFIDENCE_MARGIN
+    )
@@ -1,18 +1,37 @@
 """OpenAI Realtime API handler for voice conversations."""
 
 import asyncio
-import base64
-import json
+import inspect
 import logging
+import time
 from typing import Any, Callable
 
 import aiohttp
 
+from .codec import (
+    AudioAppendEncoder,
+    JSONDecodeError,
+    b64decode,
+    json_dumps,
+    json_loads,
+    send_json,
+)
 from .const import OPENAI_REALTIME_URL, OPENAI_REALTIME_MODEL
+from .metrics import (
+    STAGE_AUDIO_FIRST_BYTE,
+    STAGE_LLM_FIRST_TOKEN,
+    STAGE_LLM_REQUEST,
+    LatencyMetrics,
+)
 from .tools import ROHLIK_TOOLS, SYSTEM_PROMPT
+from .trace import TRACE_REALTIME, TraceRecorder, TurnTrace, activate
+from .usage import UsageTracker
 
 _LOGGER = logging.getLogger(__name__)
 
+# PCM16 mono at 24 kHz
+AUDIO_BYTES_PER_MS = 48
+
 
 class RealtimeAPIHandler:
     """Handler for OpenAI Realtime API WebSocket connection."""
@@ -23,16 +42,58 @@ class RealtimeAPIHandler:
         on_audio_delta: Callable[[bytes], None] | None = None,
         on_transcript: Callable[[str], None] | None = None,
         on_function_call: Callable[[str, dict], Any] | None = None,
+        on_audio_start: Callable[[str], Any] | None = None,
+        on_speech_started: Callable[[], Any] | None = None,
+        on_user_transcript: Callable[[str, bool], Any] | None = None,
+        metrics: LatencyMetrics | None = None,
+        tools: list[dict[str, Any]] | None = None,
+        instructions: str = SYSTEM_PROMPT,
+        tracer: TraceRecorder | None = None,
+        usage: UsageTracker | None = None,
     ) -> None:
         """Initialize the Realtime API handler."""
         self._api_key = api_key
+        self._tools = ROHLIK_TOOLS if tools is None else tools
+        self._instructions = instructions
+        self._metrics = metrics or LatencyMetrics()
         self._ws: aiohttp.ClientWebSocketResponse | None = None
         self._session: aiohttp.ClientSession | None = None
         self._on_audio_delta = on_audio_delta
         self._on_transcript = on_transcript
         self._on_function_call = on_function_call
+        self._on_audio_start = on_audio_start
+        self._on_speech_started = on_speech_started
+        self._on_user_transcript = on_user_transcript
         self._connected = False
         self._receive_task: asyncio.Task | None = None
+        self._audio_encoder = AudioAppendEncoder()
+
+        # Token usage of every response, attributed to the session
+        self._usage = usage
+        self._session_id: str | None = None
+
+        # Turn trace from user input to the last response.done of the turn
+        self._tracer = tracer
+        self._trace: TurnTrace | None = None
+        self._trace_call_pending = False
+        # Input audio since the last traced turn started
+        self._audio_sent = 0
+
+        # Barge-in state
+        self._response_id: str | None = None
+        self._cancelled_response_id: str | None = None
+        self._audio_item_id: str | None = None
+        self._audio_item_bytes = 0
+        self._played_ms = 0
+        self._played_reported_at: float | None = None
+
+        # Partial user transcripts by conversation item
+        self._user_transcripts: dict[str, str] = {}
+
+        # Turn timing: set when a response is requested, cleared on response.done
+        self._turn_started_at: float | None = None
+        self._first_token_seen = False
+        self._first_audio_seen = False
 
     @property
     def connected(self) -> bool:
@@ -76,7 +137,7 @@ class RealtimeAPIHandler:
             "type": "session.update",
             "session": {
                 "modalities": ["text", "audio"],
-                "instructions": SYSTEM_PROMPT,
+                "instructions": self._instructions,
                 "voice": "alloy",  # Options: alloy, echo, shimmer
                 "input_audio_format": "pcm16",
                 "output_audio_format": "pcm16",
@@ -89,12 +150,12 @@ class RealtimeAPIHandler:
                     "prefix_padding_ms": 300,
                     "silence_duration_ms": 500,
                 },
-                "tools": ROHLIK_TOOLS,
+                "tools": self._tools,
                 "tool_choice": "auto",
             },
         }
         
-        await self._ws.send_json(config)
+        await send_json(self._ws, config)
         _LOGGER.debug("Session configured")
 
     async def disconnect(self) -> None:
@@ -125,15 +186,9 @@ class RealtimeAPIHandler:
             _LOGGER.warning("Cannot send audio: not connected")
             return
         
-        # Encode audio as base64
-        audio_base64 = base64.b64encode(audio_data).decode("utf-8")
-        
-        message = {
-            "type": "input_audio_buffer.append",
-            "audio": audio_base64,
-        }
-        
-        await self._ws.send_json(message)
+        # Base64 straight into a reused frame buffer
+        await self._audio_encoder.send(self._ws, audio_data)
+        self._audio_sent += len(audio_data)
 
     async def commit_audio(self) -> None:
         """Commit the audio buffer and trigger response."""
@@ -141,10 +196,12 @@ class RealtimeAPIHandler:
             return
         
         # Commit the audio buffer
-        await self._ws.send_json({"type": "input_audio_buffer.commit"})
+        await send_json(self._ws, {"type": "input_audio_buffer.commit"})
         
         # Create a response
-        await self._ws.send_json({"type": "response.create"})
+        self._start_turn_timer()
+        self._start_trace()
+        await send_json(self._ws, {"type": "response.create"})
 
     async def send_text(self, text: str) -> None:
         """Send a text message to the API."""
@@ -166,8 +223,114 @@ class RealtimeAPIHandler:
             },
         }
         
-        await self._ws.send_json(message)
-        await self._ws.send_json({"type": "response.create"})
+        await send_json(self._ws, message)
+        self._start_turn_timer()
+        self._start_trace(text)
+        await send_json(self._ws, {"type": "response.create"})
+
+    def _start_trace(self, text: str | None = None) -> None:
+        """Start tracing a turn, with its text or a reference to its audio."""
+        if self._tracer is None or self._trace is not None:
+            return
+        if text is not None:
+            self._trace = self._tracer.start(TRACE_REALTIME, text=text)
+        else:
+            self._trace = self._tracer.start(
+                TRACE_REALTIME,
+                audio_bytes=self._audio_sent,
+                audio_ms=self._audio_sent // AUDIO_BYTES_PER_MS,
+            )
+        self._audio_sent = 0
+        self._trace_call_pending = False
+
+    def _trace_message(self, msg_type: str, message: dict[str, Any]) -> None:
+        """Add a server event to the trace, with audio replaced by its size."""
+        trace = self._trace
+        if msg_type == "response.audio.delta":
+            event = {
+                key: value for key, value in message.items() if key != "delta"
+            }
+            event["audio_bytes"] = len(message.get("delta", "")) * 3 // 4
+        else:
+            event = message
+        trace.add("realtime", event=event)
+        if msg_type == "response.audio_transcript.delta":
+            trace.speech = (trace.speech or "") + message.get("delta", "")
+        elif msg_type == "conversation.item.input_audio_transcription.completed":
+            trace.input["transcript"] = message.get("transcript", "")
+        elif msg_type == "response.function_call_arguments.done":
+            # The function result starts another response in the same turn
+            self._trace_call_pending = True
+        elif msg_type == "response.done":
+            if self._trace_call_pending:
+                self._trace_call_pending = False
+            else:
+                self._trace = None
+                trace.finish(trace.speech)
+                self._tracer.save(trace)
+
+    def _start_turn_timer(self) -> None:
+        """Start timing a response unless one is already being timed."""
+        if self._turn_started_at is None:
+            self._turn_started_at = time.monotonic()
+            self._first_token_seen = False
+            self._first_audio_seen = False
+
+    def _elapsed_ms(self) -> float:
+        """Return milliseconds since the current response was requested."""
+        return (time.monotonic() - self._turn_started_at) * 1000
+
+    def report_playback(self, item_id: str, played_ms: int) -> None:
+        """Record how much of an assistant audio item the client has played."""
+        if item_id != self._audio_item_id:
+            return
+        self._played_ms = max(0, int(played_ms))
+        self._played_reported_at = asyncio.get_running_loop().time()
+
+    def _estimate_played_ms(self) -> int:
+        """Estimate the played-out offset of the current audio item."""
+        played_ms = self._played_ms
+        if self._played_reported_at is not None:
+            # The client keeps playing between reports
+            elapsed = asyncio.get_running_loop().time() - self._played_reported_at
+            played_ms += int(elapsed * 1000)
+        return min(played_ms, self._audio_item_bytes // AUDIO_BYTES_PER_MS)
+
+    async def interrupt(self) -> None:
+        """Cancel the active response and truncate unheard assistant audio."""
+        if not self.connected:
+            return
+
+        if self._response_id is not None:
+            self._cancelled_response_id = self._response_id
+            self._response_id = None
+            await send_json(self._ws, {"type": "response.cancel"})
+
+        if self._audio_item_id is not None:
+            audio_end_ms = self._estimate_played_ms()
+            if audio_end_ms < self._audio_item_bytes // AUDIO_BYTES_PER_MS:
+                await send_json(
+                    self._ws,
+                    {
+                        "type": "conversation.item.truncate",
+                        "item_id": self._audio_item_id,
+                        "content_index": 0,
+                        "audio_end_ms": audio_end_ms,
+                    }
+                )
+                _LOGGER.debug(
+                    "Truncated item %s at %d ms", self._audio_item_id, audio_end_ms
+                )
+            self._audio_item_id = None
+
+    async def _dispatch(self, callback: Callable[..., Any] | None, *args: Any) -> Any:
+        """Invoke a callback, awaiting it if it is a coroutine function."""
+        if callback is None:
+            return None
+        result = callback(*args)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
 
     async def _receive_loop(self) -> None:
         """Receive and process messages from the API."""
@@ -177,7 +340,7 @@ class RealtimeAPIHandler:
         try:
             async for msg in self._ws:
                 if msg.type == aiohttp.WSMsgType.TEXT:
-                    await self._handle_message(json.loads(msg.data))
+                    await self._handle_message(json_loads(msg.data))
                 elif msg.type == aiohttp.WSMsgType.ERROR:
                     _LOGGER.error("WebSocket error: %s", self._ws.exception())
                     break
@@ -194,40 +357,98 @@ class RealtimeAPIHandler:
     async def _handle_message(self, message: dict[str, Any]) -> None:
         """Handle a message from the API."""
         msg_type = message.get("type", "")
+        if self._trace is not None:
+            self._trace_message(msg_type, message)
         
         if msg_type == "error":
             _LOGGER.error("API error: %s", message.get("error"))
             
         elif msg_type == "session.created":
-            _LOGGER.debug("Session created: %s", message.get("session", {}).get("id"))
+            self._session_id = message.get("session", {}).get("id")
+            _LOGGER.debug("Session created: %s", self._session_id)
             
         elif msg_type == "session.updated":
             _LOGGER.debug("Session updated")
             
+        elif msg_type == "input_audio_buffer.speech_stopped":
+            # Server VAD creates the response on its own
+            self._start_turn_timer()
+            self._start_trace()
+            
+        elif msg_type == "input_audio_buffer.speech_started":
+            # User started talking - barge in on the assistant
+            if self._response_id is not None or self._audio_item_id is not None:
+                _LOGGER.debug("Speech started during response, interrupting")
+                await self.interrupt()
+                await self._dispatch(self._on_speech_started)
+            
+        elif msg_type == "response.created":
+            self._response_id = message.get("response", {}).get("id")
+            
         elif msg_type == "response.audio.delta":
             # Audio response chunk
+            if message.get("response_id") == self._cancelled_response_id:
+                return
             audio_base64 = message.get("delta", "")
-            if audio_base64 and self._on_audio_delta:
-                audio_data = base64.b64decode(audio_base64)
-                self._on_audio_delta(audio_data)
+            if audio_base64:
+                audio_data = b64decode(audio_base64)
+                item_id = message.get("item_id")
+                if item_id != self._audio_item_id:
+                    self._audio_item_id = item_id
+                    self._audio_item_bytes = 0
+                    self._played_ms = 0
+                    self._played_reported_at = None
+                    await self._dispatch(self._on_audio_start, item_id)
+                self._audio_item_bytes += len(audio_data)
+                if self._turn_started_at is not None and not self._first_audio_seen:
+                    self._first_audio_seen = True
+                    self._metrics.record(STAGE_AUDIO_FIRST_BYTE, self._elapsed_ms())
+                await self._dispatch(self._on_audio_delta, audio_data)
                 
         elif msg_type == "response.audio_transcript.delta":
             # Transcript of the assistant's response
+            if message.get("response_id") == self._cancelled_response_id:
+                return
             transcript = message.get("delta", "")
-            if transcript and self._on_transcript:
-                self._on_transcript(transcript)
+            if self._turn_started_at is not None and not self._first_token_seen:
+                self._first_token_seen = True
+                self._metrics.record(STAGE_LLM_FIRST_TOKEN, self._elapsed_ms())
+            if transcript:
+                await self._dispatch(self._on_transcript, transcript)
                 
+        elif msg_type == "conversation.item.input_audio_transcription.delta":
+            # Partial user transcription, lets tool results be prefetched
+            item_id = message.get("item_id", "")
+            transcript = self._user_transcripts.get(item_id, "") + message.get(
+                "delta", ""
+            )
+            self._user_transcripts[item_id] = transcript
+            await self._dispatch(self._on_user_transcript, transcript, False)
+
         elif msg_type == "conversation.item.input_audio_transcription.completed":
             # User's speech transcription
+            self._user_transcripts.pop(message.get("item_id", ""), None)
             transcript = message.get("transcript", "")
             _LOGGER.debug("User said: %s", transcript)
+            if transcript:
+                await self._dispatch(self._on_user_transcript, transcript, True)
             
         elif msg_type == "response.function_call_arguments.done":
             # Function call completed
             await self._handle_function_call(message)
             
         elif msg_type == "response.done":
-            _LOGGER.debug("Response completed")
+            response = message.get("response", {})
+            if response.get("id") == self._response_id:
+                self._response_id = None
+            if self._turn_started_at is not None:
+                self._metrics.record(STAGE_LLM_REQUEST, self._elapsed_ms())
+                self._turn_started_at = None
+            if self._usage is not None:
+                self._usage.record(
+                    OPENAI_REALTIME_MODEL, response.get("usage"), self._session_id
+                )
+            _LOGGER.debug("Response %s", response.get("status", "completed"))
 
     async def _handle_function_call(self, message: dict[str, Any]) -> None:
         """Handle a function call from the API."""
@@ -236,8 +457,8 @@ class RealtimeAPIHandler:
         arguments_str = message.get("arguments", "{}")
         
         try:
-            arguments = json.loads(arguments_str)
-        except json.JSONDecodeError:
+            arguments = json_loads(arguments_str)
+        except JSONDecodeError:
             arguments = {}
         
         _LOGGER.info("Function call: %s(%s)", name, arguments)
@@ -246,7 +467,11 @@ class RealtimeAPIHandler:
         result = None
         if self._on_function_call:
             try:
-                result = await self._on_function_call(name, arguments)
+                # MCP calls made by the tool land in the turn trace
+                with activate(self._trace):
+                    result = await self._dispatch(
+                        self._on_function_call, name, arguments
+                    )
             except Exception as err:
                 _LOGGER.error("Function call error: %s", err)
                 result = {"error": str(err)}
@@ -262,7 +487,7 @@ class RealtimeAPIHandler:
         
         # Convert result to string if needed
         if isinstance(result, dict):
-            result_str = json.dumps(result, ensure_ascii=False)
+            result_str = json_dumps(result)
         else:
             result_str = str(result)
         
@@ -276,7 +501,8 @@ class RealtimeAPIHandler:
             },
         }
         
-        await self._ws.send_json(message)
+        await send_json(self._ws, message)
         
         # Trigger a new response based on the function result
-        await self._ws.send_json({"type": "response.create"})
+        self._start_turn_timer()
+        await send_json(self._ws, {"type": "response.create"})
@@ -0,0 +1,183 @@
+"""Per-turn choice between a fast and a strong chat model."""
+
+from __future__ import annotations
+
+from collections import Counter, deque
+import logging
+import re
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+
+from .const import (
+    CONF_FAST_MODEL,
+    CONF_LATENCY_BUDGET,
+    CONF_STRONG_MODEL,
+    CONF_STRONG_SHARE,
+    DEFAULT_FAST_MODEL,
+    DEFAULT_LATENCY_BUDGET,
+    DEFAULT_STRONG_MODEL,
+    DEFAULT_STRONG_SHARE,
+)
+from .product_index import fold
+from .usage import BUDGET_OK, UsageTracker
+
+_LOGGER = logging.getLogger(__name__)
+
+# Turns at or above this complexity go to the strong model
+COMPLEX_THRESHOLD = 0.5
+# Smoothing of observed request latencies
+LATENCY_ALPHA = 0.2
+# Number of recent turns the traffic share is computed over
+SHARE_WINDOW = 100
+# While over budget, every Nth complex turn still probes the strong model
+PROBE_INTERVAL = 10
+# More words than this usually means several items or conditions
+LONG_TURN_WORDS = 14
+
+_WORD_RE = re.compile(r"\w+")
+_NUMBER_RE = re.compile(r"\d+")
+
+# Folded word prefixes of requests that need judgement, not just dispatch
+AMBIGUOUS_PREFIXES = (
+    "doporuc",
+    "porad",
+    "nejak",
+    "neco",
+    "ktery",
+    "ktera",
+    "ktere",
+    "jaky",
+    "jaka",
+    "jake",
+    "proc",
+    "nebo",
+    "recept",
+    "levnejs",
+    "lepsi",
+    "zdrav",
+    "misto",
+    "vymen",
+    "nahrad",
+    "porovn",
+    "druh",
+    "prvn",
+    "recommend",
+    "which",
+    "cheaper",
+    "better",
+    "instead",
+    "replace",
+    "compare",
+)
+# Words joining several items in one request
+CONJUNCTIONS = frozenset({"a", "i", "plus", "and", "taky", "jeste"})
+
+
+def classify(text: str) -> float:
+    """Return how much a turn needs the strong model, from 0 to 1."""
+    words = _WORD_RE.findall(fold(text))
+    if not words:
+        return 0.0
+    score = 0.0
+    items = 1 + text.count(",") + sum(word in CONJUNCTIONS for word in words)
+    items = max(items, len(_NUMBER_RE.findall(text)))
+    if items > 1:
+        score += 0.5
+    if any(word.startswith(AMBIGUOUS_PREFIXES) for word in words):
+        score += 0.5
+    if len(words) > LONG_TURN_WORDS:
+        score += 0.3
+    return min(score, 1.0)
+
+
+class ModelRouter:
+    """Route turns by complexity within a latency and cost budget."""
+
+    def __init__(self, entry: ConfigEntry, usage: UsageTracker) -> None:
+        """Initialize the router."""
+        self._entry = entry
+        self._usage = usage
+        self._latency: dict[str, float] = {}
+        self._turns: Counter[str] = Counter()
+        self._recent: deque[str] = deque(maxlen=SHARE_WINDOW)
+        self._skipped = 0
+
+    @property
+    def models(self) -> tuple[str, str]:
+        """Return the configured fast and strong models."""
+        options = self._entry.options
+        return (
+            options.get(CONF_FAST_MODEL) or DEFAULT_FAST_MODEL,
+            options.get(CONF_STRONG_MODEL) or DEFAULT_STRONG_MODEL,
+        )
+
+    def share(self, model: str) -> float:
+        """Return the share of recent turns sent to a model."""
+        if not self._recent:
+            return 0.0
+        return self._recent.count(model) / len(self._recent)
+
+    def choose(self, text: str) -> str:
+        """Pick the model for a turn and count it."""
+        fast, strong = self.models
+        options = self._entry.options
+        budget = options.get(CONF_LATENCY_BUDGET, DEFAULT_LATENCY_BUDGET)
+        max_share = options.get(CONF_STRONG_SHARE, DEFAULT_STRONG_SHARE) / 100
+        complexity = classify(text)
+
+        model = fast
+        if fast == strong:
+            pass
+        elif self._usage.level != BUDGET_OK:
+            _LOGGER.debug("Keeping %s, the daily budget is nearly spent", fast)
+        elif complexity >= COMPLEX_THRESHOLD:
+            # Share and latency budgets can hold the strong model back
+            if self.share(strong) >= max_share:
+                _LOGGER.debug("Keeping %s, %s is over the cost budget", fast, strong)
+            elif (
+                self._latency.get(strong, 0) > budget >= self._latency.get(fast, 0)
+                and not self._probe()
+            ):
+                _LOGGER.debug("Keeping %s, %s is over the latency budget", fast, strong)
+            else:
+                model = strong
+        elif self._latency.get(fast, 0) > budget > self._latency.get(strong, budget):
+            # The fast model is currently the slow one
+            model = strong
+
+        self._turns[model] += 1
+        self._recent.append(model)
+        _LOGGER.debug("Routing turn (complexity %.1f) to %s", complexity, model)
+        return model
+
+    def _probe(self) -> bool:
+        """Return whether to send a held-back turn anyway to refresh latency."""
+        self._skipped += 1
+        if self._skipped < PROBE_INTERVAL:
+            return False
+        self._skipped = 0
+        return True
+
+    def observe(self, model: str, duration_ms: float) -> None:
+        """Feed an observed request latency back into routing."""
+        previous = self._latency.get(model)
+        self._latency[model] = (
+            duration_ms
+            if previous is None
+            else previous + LATENCY_ALPHA * (duration_ms - previous)
+        )
+
+    @property
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """Return turns, recent traffic share and latency per model."""
+        return {
+            model: {
+                "turns": self._turns[model],
+                "share": round(self.share(model), 3),
+                "latency_ms": round(self._latency[model], 1)
+                if model in self._latency
+                else None,
+            }
+            for model in dict.fromkeys((*self.models, *self._turns))
+        }
@@ -0,0 +1,272 @@
+"""Diagnostic sensors for Rohlik Voice Assistant."""
+
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Any
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorStateClass,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import PERCENTAGE, EntityCategory, UnitOfTime
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .cart_watch import SIGNAL_CART_UPDATED, CartWatchdog
+from .const import DOMAIN
+from .metrics import (
+    PERCENTILES,
+    STAGE_AUDIO_FIRST_BYTE,
+    STAGE_LLM_FIRST_TOKEN,
+    STAGE_LLM_REQUEST,
+    STAGE_MCP_TOOL_CALL,
+    STAGE_SSE_PARSE,
+    STAGES,
+    LatencyMetrics,
+)
+from .router import ModelRouter
+from .usage import TOKEN_KINDS, UsageTracker
+
+# Metrics live in memory, polling them is cheap
+SCAN_INTERVAL = timedelta(seconds=30)
+
+STAGE_NAMES = {
+    STAGE_LLM_REQUEST: "LLM request",
+    STAGE_LLM_FIRST_TOKEN: "LLM first token",
+    STAGE_MCP_TOOL_CALL: "MCP tool call",
+    STAGE_SSE_PARSE: "SSE parse",
+    STAGE_AUDIO_FIRST_BYTE: "Audio first byte",
+}
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Set up the Rohlik Voice diagnostic sensors."""
+    data = hass.data[DOMAIN][config_entry.entry_id]
+    metrics: LatencyMetrics = data["metrics"]
+    async_add_entities(
+        [
+            *(
+                RohlikLatencySensor(config_entry, metrics, stage, percentile)
+                for stage in STAGES
+                for percentile in PERCENTILES
+            ),
+            RohlikStrongModelShareSensor(config_entry, data["router"]),
+            RohlikCartItemsSensor(config_entry, data["cart_watch"]),
+            RohlikCartTotalSensor(config_entry, data["cart_watch"]),
+            RohlikUnavailableItemsSensor(config_entry, data["cart_watch"]),
+            RohlikCostTodaySensor(config_entry, data["usage"]),
+            RohlikTokensTodaySensor(config_entry, data["usage"]),
+        ]
+    )
+
+
+class RohlikLatencySensor(SensorEntity):
+    """Rolling latency percentile of one turn stage."""
+
+    _attr_has_entity_name = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+
+    def __init__(
+        self,
+        config_entry: ConfigEntry,
+        metrics: LatencyMetrics,
+        stage: str,
+        percentile: int,
+    ) -> None:
+        """Initialize the sensor."""
+        self._metrics = metrics
+        self._stage = stage
+        self._percentile = percentile
+        self._attr_name = f"{STAGE_NAMES[stage]} p{percentile}"
+        self._attr_unique_id = f"{config_entry.entry_id}_{stage}_p{percentile}"
+        self._attr_device_info = {
+            "identifiers": {(DOMAIN, config_entry.entry_id)},
+        }
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the current percentile."""
+        return self._metrics.percentile(self._stage, self._percentile)
+
+
+class RohlikStrongModelShareSensor(SensorEntity):
+    """Share of recent turns routed to the strong chat model."""
+
+    _attr_has_entity_name = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = PERCENTAGE
+    _attr_name = "Strong model share"
+
+    def __init__(self, config_entry: ConfigEntry, router: ModelRouter) -> None:
+        """Initialize the sensor."""
+        self._router = router
+        self._attr_unique_id = f"{config_entry.entry_id}_strong_model_share"
+        self._attr_device_info = {
+            "identifiers": {(DOMAIN, config_entry.entry_id)},
+        }
+
+    @property
+    def native_value(self) -> float:
+        """Return the current share in percent."""
+        _, strong = self._router.models
+        return round(self._router.share(strong) * 100, 1)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return turns, share and latency of every model."""
+        return {"models": self._router.stats}
+
+
+class RohlikCartSensor(SensorEntity):
+    """Cart state from the watchdog, updated only when the cart changes."""
+
+    _attr_has_entity_name = True
+    _attr_should_poll = False
+    _key: str
+
+    def __init__(self, config_entry: ConfigEntry, cart_watch: CartWatchdog) -> None:
+        """Initialize the sensor."""
+        self._cart_watch = cart_watch
+        self._entry_id = config_entry.entry_id
+        self._attr_unique_id = f"{config_entry.entry_id}_{self._key}"
+        self._attr_device_info = {
+            "identifiers": {(DOMAIN, config_entry.entry_id)},
+        }
+
+    async def async_added_to_hass(self) -> None:
+        """Subscribe to cart changes."""
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass,
+                SIGNAL_CART_UPDATED.format(self._entry_id),
+                self.async_write_ha_state,
+            )
+        )
+
+
+class RohlikCartItemsSensor(RohlikCartSensor):
+    """Number of lines in the cart."""
+
+    _key = "cart_items"
+    _attr_name = "Cart items"
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    @property
+    def native_value(self) -> int:
+        """Return the number of cart lines."""
+        return len(self._cart_watch.items)
+
+
+class RohlikCartTotalSensor(RohlikCartSensor):
+    """Total price of the cart."""
+
+    _key = "cart_total"
+    _attr_name = "Cart total"
+    _attr_device_class = SensorDeviceClass.MONETARY
+    _attr_native_unit_of_measurement = "CZK"
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the cart total."""
+        return self._cart_watch.total
+
+
+class RohlikUnavailableItemsSensor(RohlikCartSensor):
+    """Cart lines that went out of stock."""
+
+    _key = "unavailable_items"
+    _attr_name = "Unavailable cart items"
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    @property
+    def native_value(self) -> int:
+        """Return the number of unavailable lines."""
+        return len(self._cart_watch.unavailable)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the unavailable products and price changes."""
+        return {
+            "products": [product.name for product in self._cart_watch.unavailable],
+            "price_changes": [
+                {"name": product.name, "old": old, "new": product.price}
+                for product, old in self._cart_watch.price_changes
+            ],
+        }
+
+
+class RohlikUsageSensor(SensorEntity):
+    """Today's OpenAI usage from the usage tracker."""
+
+    _attr_has_entity_name = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _key: str
+
+    def __init__(self, config_entry: ConfigEntry, usage: UsageTracker) -> None:
+        """Initialize the sensor."""
+        self._usage = usage
+        self._attr_unique_id = f"{config_entry.entry_id}_{self._key}"
+        self._attr_device_info = {
+            "identifiers": {(DOMAIN, config_entry.entry_id)},
+        }
+
+
+class RohlikCostTodaySensor(RohlikUsageSensor):
+    """Estimated OpenAI cost of today's turns."""
+
+    _key = "cost_today"
+    _attr_name = "OpenAI cost today"
+    _attr_device_class = SensorDeviceClass.MONETARY
+    _attr_native_unit_of_measurement = "USD"
+    _attr_suggested_display_precision = 2
+
+    @property
+    def native_value(self) -> float:
+        """Return today's cost."""
+        return round(self._usage.today["cost"], 4)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the budget, its state and recent daily costs."""
+        return {
+            "budget": self._usage.budget or None,
+            "budget_level": self._usage.level,
+            "days": self._usage.days(7),
+            "top_tools": self._usage.top_tools(5),
+        }
+
+
+class RohlikTokensTodaySensor(RohlikUsageSensor):
+    """OpenAI tokens used today."""
+
+    _key = "tokens_today"
+    _attr_name = "OpenAI tokens today"
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_native_unit_of_measurement = "tokens"
+
+    @property
+    def native_value(self) -> int:
+        """Return today's tokens of all kinds."""
+        today = self._usage.today
+        return int(sum(today[kind] for kind in TOKEN_KINDS))
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return tokens per kind and the number of requests."""
+        today = self._usage.today
+        return {
+            **{kind: int(today[kind]) for kind in TOKEN_KINDS},
+            "requests": int(today["requests"]),
+        }
@@ -0,0 +1,130 @@
+"""Services for Rohlik Voice Assistant."""
+
+from __future__ import annotations
+
+from datetime import datetime
+import logging
+import threading
+
+import voluptuous as vol
+
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+import homeassistant.helpers.config_validation as cv
+
+from .const import DOMAIN
+from .history import DEFAULT_REORDER_LIMIT
+from .profiler import SamplingProfiler
+from .shopping_list import DEFAULT_SHOPPING_LIST, async_import_shopping_list
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_PROFILE = "profile"
+SERVICE_IMPORT_SHOPPING_LIST = "import_shopping_list"
+SERVICE_REORDER_USUAL = "reorder_usual"
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional("duration", default=30): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=600)
+        ),
+        vol.Optional("interval_ms", default=5): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=100)
+        ),
+    }
+)
+
+IMPORT_SHOPPING_LIST_SCHEMA = vol.Schema(
+    {
+        vol.Optional("entity_id", default=DEFAULT_SHOPPING_LIST): cv.entity_id,
+        vol.Optional("complete_items", default=False): cv.boolean,
+    }
+)
+
+REORDER_USUAL_SCHEMA = vol.Schema(
+    {
+        vol.Optional("limit", default=DEFAULT_REORDER_LIMIT): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=50)
+        ),
+    }
+)
+
+
+@callback
+def async_register_services(hass: HomeAssistant) -> None:
+    """Register integration services."""
+    if hass.services.has_service(DOMAIN, SERVICE_PROFILE):
+        return
+
+    async def async_profile(call: ServiceCall) -> ServiceResponse:
+        """Profile the event loop and write a flamegraph file."""
+        profiler = SamplingProfiler(
+            threading.get_ident(), call.data["interval_ms"] / 1000
+        )
+        _LOGGER.info("Profiling for %.0f s", call.data["duration"])
+        await hass.async_add_executor_job(profiler.run, call.data["duration"])
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = hass.config.path(f"{DOMAIN}_profile_{timestamp}.folded")
+        await hass.async_add_executor_job(profiler.write_folded, path)
+
+        hits = sum(profiler.stacks.values())
+        _LOGGER.info(
+            "Profile written to %s (%d of %d samples in integration code)",
+            path,
+            hits,
+            profiler.samples,
+        )
+        return {"path": path, "samples": profiler.samples, "integration_samples": hits}
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROFILE,
+        async_profile,
+        schema=PROFILE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    async def async_import(call: ServiceCall) -> ServiceResponse:
+        """Add the open items of a to-do list to the Rohlik cart."""
+        data = next(iter(hass.data[DOMAIN].values()))
+        return await async_import_shopping_list(
+            hass,
+            data["executor"],
+            call.data["entity_id"],
+            call.data["complete_items"],
+        )
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_IMPORT_SHOPPING_LIST,
+        async_import,
+        schema=IMPORT_SHOPPING_LIST_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    async def async_reorder(call: ServiceCall) -> ServiceResponse:
+        """Add the household's usual products to the cart."""
+        data = next(iter(hass.data[DOMAIN].values()))
+        return await data["executor"].async_reorder_usual(call.data["limit"])
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_REORDER_USUAL,
+        async_reorder,
+        schema=REORDER_USUAL_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+
+@callback
+def async_unregister_services(hass: HomeAssistant) -> None:
+    """Remove integration services."""
+    hass.services.async_remove(DOMAIN, SERVICE_PROFILE)
+    hass.services.async_remove(DOMAIN, SERVICE_IMPORT_SHOPPING_LIST)
+    hass.services.async_remove(DOMAIN, SERVICE_REORDER_USUAL)
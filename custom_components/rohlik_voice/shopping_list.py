@@ -0,0 +1,163 @@
+"""Import of a Home Assistant to-do list into the Rohlik cart."""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+import logging
+import re
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+
+from .executor import RohlikToolExecutor
+from .parsers import Product
+from .prefetch import cache_key
+from .ranker import is_confident
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_SHOPPING_LIST = "todo.shopping_list"
+# Searches running at once, keeps the Rohlik server from throttling us
+IMPORT_CONCURRENCY = 5
+
+# "2 mléko", "3x rohlík", "mléko 2", "máslo 2 ks"
+_LEADING_QUANTITY_RE = re.compile(r"^(\d+)\s*(?:x|×|ks|kusy?)?\s+(.+)$", re.IGNORECASE)
+_TRAILING_QUANTITY_RE = re.compile(r"^(.+?)\s+(\d+)\s*(?:x|×|ks|kusy?)?$", re.IGNORECASE)
+
+
+@dataclass(slots=True)
+class ListItem:
+    """Shopping list entries naming the same product."""
+
+    name: str
+    quantity: int
+    uids: list[str] = field(default_factory=list)
+
+
+def parse_item(summary: str) -> tuple[str, int]:
+    """Split a shopping list entry into a product name and a quantity."""
+    summary = summary.strip()
+    if match := _LEADING_QUANTITY_RE.match(summary):
+        return match.group(2).strip(), max(1, int(match.group(1)))
+    if match := _TRAILING_QUANTITY_RE.match(summary):
+        return match.group(1).strip(), max(1, int(match.group(2)))
+    return summary, 1
+
+
+def merge_items(entries: list[dict[str, Any]]) -> list[ListItem]:
+    """Merge entries for the same product, summing their quantities."""
+    merged: dict[str, ListItem] = {}
+    for entry in entries:
+        name, quantity = parse_item(entry.get("summary", ""))
+        if not name:
+            continue
+        key = cache_key(name) or name.lower()
+        if (item := merged.get(key)) is None:
+            item = merged[key] = ListItem(name, 0)
+        item.quantity += quantity
+        if uid := entry.get("uid"):
+            item.uids.append(uid)
+    return list(merged.values())
+
+
+async def async_get_open_items(
+    hass: HomeAssistant, entity_id: str
+) -> list[dict[str, Any]]:
+    """Return the items of a to-do list that still need action."""
+    response = await hass.services.async_call(
+        "todo",
+        "get_items",
+        {"entity_id": entity_id, "status": ["needs_action"]},
+        blocking=True,
+        return_response=True,
+    )
+    return response.get(entity_id, {}).get("items", [])
+
+
+async def _async_resolve(
+    executor: RohlikToolExecutor, item: ListItem, semaphore: asyncio.Semaphore
+) -> dict[str, Any]:
+    """Pick a product for one list item."""
+    report: dict[str, Any] = {"item": item.name, "quantity": item.quantity}
+    async with semaphore:
+        found = await executor.async_search(item.name)
+    if isinstance(found, dict):
+        report["status"] = "error" if "error" in found else "not_found"
+        if "error" in found:
+            report["error"] = str(found["error"])
+        return report
+
+    ranked = executor.ranker.ranked(item.name, found)
+    product: Product | None = next(
+        (product for _, product in ranked if product.in_stock is not False), None
+    )
+    if product is None:
+        report["status"] = "out_of_stock"
+        return report
+    report["status"] = "resolved"
+    report["product"] = product.as_dict()
+    report["confident"] = product is ranked[0][1] and is_confident(ranked)
+    return report
+
+
+async def async_import_shopping_list(
+    hass: HomeAssistant,
+    executor: RohlikToolExecutor,
+    entity_id: str,
+    complete_items: bool,
+) -> dict[str, Any]:
+    """Add all open items of a to-do list to the cart; return a report."""
+    items = merge_items(await async_get_open_items(hass, entity_id))
+    if not items:
+        return {"added": 0, "items": []}
+
+    semaphore = asyncio.Semaphore(IMPORT_CONCURRENCY)
+    reports = await asyncio.gather(
+        *(_async_resolve(executor, item, semaphore) for item in items)
+    )
+    resolved = [
+        (item, report)
+        for item, report in zip(items, reports)
+        if report["status"] == "resolved"
+    ]
+    if not resolved:
+        return {"added": 0, "items": reports}
+
+    # Entries such as "mléko" and "polotučné mléko" may pick the same product
+    quantities: dict[int, int] = {}
+    for item, report in resolved:
+        product_id = report["product"]["id"]
+        quantities[product_id] = quantities.get(product_id, 0) + item.quantity
+
+    # One round trip for the whole list
+    result = await executor.async_add_items(list(quantities.items()))
+    if "error" in result:
+        for _, report in resolved:
+            report["status"] = "error"
+            report["error"] = str(result["error"])
+        return {"added": 0, "items": reports, "error": str(result["error"])}
+    if result.get("queued"):
+        # Added once Rohlik is back, the list items stay open until then
+        for _, report in resolved:
+            report["status"] = "queued"
+        return {"added": 0, "queued": len(resolved), "items": reports}
+
+    for _, report in resolved:
+        report["status"] = "added"
+    if complete_items:
+        for item, _ in resolved:
+            for uid in item.uids:
+                await hass.services.async_call(
+                    "todo",
+                    "update_item",
+                    {"entity_id": entity_id, "item": uid, "status": "completed"},
+                    blocking=True,
+                )
+    _LOGGER.info(
+        "Imported %d of %d shopping list items from %s",
+        len(resolved),
+        len(items),
+        entity_id,
+    )
+    return {"added": len(resolved), "items": reports}
@@ -1,13 +1,16 @@
 """Rohlik tools definitions for OpenAI function calling."""
 
+from collections.abc import Collection
 from typing import Any
 
+from .parsers import parse_cart, parse_products
+
 # Tool definitions for OpenAI Realtime API
 ROHLIK_TOOLS = [
     {
         "type": "function",
         "name": "search_products",
-        "description": "Vyhledá produkty na Rohlíku podle názvu nebo popisu. Použij když uživatel chce najít nebo přidat konkrétní produkt. Vrací seznam produktů s productId, productName, price, inStock.",
+        "description": "Vyhledá produkty na Rohlíku podle názvu nebo popisu. Použij když uživatel chce najít nebo přidat konkrétní produkt. Vrací nejpravděpodobnější produkt (top_pick), příznak confident a alternativy (alternatives) s id, name, brand, price, unit_price, unit, in_stock.",
         "parameters": {
             "type": "object",
             "properties": {
@@ -93,26 +96,101 @@ ROHLIK_TOOLS = [
             "required": [],
         },
     },
+    {
+        "type": "function",
+        "name": "reorder_usual",
+        "description": "Přidá do košíku obvyklý nákup - produkty, které domácnost kupuje pravidelně, v obvyklém množství. Použij když uživatel chce 'obvyklý nákup' nebo 'to co vždycky'.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "limit": {
+                    "type": "integer",
+                    "description": "Maximální počet produktů (výchozí 15)",
+                },
+            },
+            "required": [],
+        },
+    },
+    {
+        "type": "function",
+        "name": "check_cart",
+        "description": "Okamžitě zkontroluje košík: vyprodané položky (unavailable) a změny cen od přidání (price_changes). Použij když se uživatel ptá, jestli něco nechybí, není vyprodané nebo nezdražilo.",
+        "parameters": {
+            "type": "object",
+            "properties": {},
+            "required": [],
+        },
+    },
 ]
 
 # System prompt for the voice assistant
-SYSTEM_PROMPT = """Jsi hlasový asistent pro nakupování na Rohlík.cz. Pomáháš uživateli s nákupem potravin.
+SYSTEM_PROMPT_HEADER = """Jsi hlasový asistent pro nakupování na Rohlík.cz. Pomáháš uživateli s nákupem potravin.
 
-PRAVIDLA:
-1. Mluv česky, přátelsky a stručně
-2. Když uživatel chce přidat produkt, nejdřív ho vyhledej pomocí search_products
-3. Pokud je více výsledků, zeptej se uživatele který chce (značka, velikost, cena)
-4. Po přidání do košíku potvrď co jsi přidal a řekni aktuální stav košíku
-5. Ceny uvádej v Kč
-6. Když si nejsi jistý, zeptej se
+PRAVIDLA:"""
 
-PŘÍKLADY ODPOVĚDÍ:
+# Prompt rules and the tools each rule needs; rules for disabled tools are dropped
+SYSTEM_PROMPT_RULES: list[tuple[str, tuple[str, ...]]] = [
+    ("Mluv česky, přátelsky a stručně", ()),
+    (
+        "Když uživatel chce přidat produkt, nejdřív ho vyhledej pomocí search_products",
+        ("search_products", "add_to_cart"),
+    ),
+    (
+        "Výsledky hledání obsahují top_pick a alternatives. Když je confident true, "
+        "použij top_pick bez doptávání a řekni, co jsi vybral. Jinak se zeptej, "
+        "který produkt uživatel chce (značka, velikost, cena)",
+        ("search_products",),
+    ),
+    (
+        "Po přidání do košíku potvrď co jsi přidal a řekni aktuální stav košíku",
+        ("add_to_cart",),
+    ),
+    (
+        "Když uživatel chce obvyklý nákup, použij reorder_usual místo vyhledávání "
+        "jednotlivých produktů",
+        ("reorder_usual",),
+    ),
+    (
+        "Když se uživatel ptá, jestli v košíku něco nechybí nebo nezdražilo, "
+        "použij check_cart místo get_cart",
+        ("check_cart",),
+    ),
+    ("Ceny uvádej v Kč", ()),
+    ("Když si nejsi jistý, zeptej se", ()),
+]
+
+SYSTEM_PROMPT_EXAMPLES = """PŘÍKLADY ODPOVĚDÍ:
 - "Našel jsem 5 druhů mléka. Chcete polotučné, plnotučné nebo odstředěné?"
 - "Přidal jsem Tatra mléko 1l za 24.90 Kč. V košíku máte 3 položky za 89 Kč celkem."
 - "Omlouvám se, tento produkt jsem nenašel. Můžete to zkusit popsat jinak?"
 """
 
 
+def build_system_prompt(enabled_tools: Collection[str]) -> str:
+    """Build the system prompt with rules for the enabled tools only."""
+    rules = [
+        rule
+        for rule, required in SYSTEM_PROMPT_RULES
+        if all(tool in enabled_tools for tool in required)
+    ]
+    lines = [SYSTEM_PROMPT_HEADER]
+    lines.extend(f"{index}. {rule}" for index, rule in enumerate(rules, 1))
+    return "\n".join(lines) + "\n\n" + SYSTEM_PROMPT_EXAMPLES
+
+
+SYSTEM_PROMPT = build_system_prompt([tool["name"] for tool in ROHLIK_TOOLS])
+
+# Fixed replies, spoken often enough to keep their audio cached
+CART_EMPTY = "Košík je prázdný."
+CART_CLEARED = "Košík jsem vyprázdnil."
+CART_OK = "V košíku je všechno skladem a ceny se nezměnily."
+
+
+def _format_price(price: float | None) -> str:
+    """Format a price in CZK for voice response."""
+    return "" if price is None else f" za {price:.2f} Kč".replace(".", ",")
+
+
 def format_search_results(results: dict[str, Any]) -> str:
     """Format search results for voice response."""
     if "error" in results:
@@ -122,7 +200,14 @@ def format_search_results(results: dict[str, Any]) -> str:
     if not content:
         return "Nenašel jsem žádné produkty odpovídající vašemu dotazu."
     
-    # Parse the content - MCP returns text content
+    if products := parse_products(results):
+        return "; ".join(
+            f"{product.name}{_format_price(product.price)}"
+            + ("" if product.in_stock is not False else " (vyprodáno)")
+            for product in products
+        )
+
+    # Not JSON, the MCP text is readable as is
     if isinstance(content, list) and len(content) > 0:
         text_content = content[0].get("text", "")
         return text_content
@@ -137,8 +222,16 @@ def format_cart_contents(cart: dict[str, Any]) -> str:
     
     content = cart.get("content", [])
     if not content:
-        return "Košík je prázdný."
+        return CART_EMPTY
     
+    if (parsed := parse_cart(cart)) is not None:
+        if not parsed.items:
+            return CART_EMPTY
+        text = "; ".join(
+            f"{item.quantity or 1}× {item.name}" for item in parsed.items
+        )
+        return text + _format_price(parsed.total).replace(" za", ", celkem")
+
     if isinstance(content, list) and len(content) > 0:
         text_content = content[0].get("text", "")
         return text_content
@@ -0,0 +1,156 @@
+"""Opt-in recording of conversation turns for offline replay."""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+import logging
+import os
+import threading
+import time
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .codec import json_dumps_bytes
+from .const import CONF_TRACE_TURNS, DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+TRACE_DIR = f"{DOMAIN}_traces"
+# Size of the active file before it is rotated
+MAX_TRACE_BYTES = 5 * 1024 * 1024
+TRACE_BACKUPS = 3
+
+TRACE_AGENT = "agent"
+TRACE_REALTIME = "realtime"
+
+_current_trace: ContextVar[TurnTrace | None] = ContextVar(
+    f"{DOMAIN}_trace", default=None
+)
+
+
+@dataclass(slots=True)
+class TurnTrace:
+    """Everything one turn sent and received, with timings."""
+
+    kind: str
+    input: dict[str, Any]
+    started_at: float = field(default_factory=time.time)
+    events: list[dict[str, Any]] = field(default_factory=list)
+    speech: str | None = None
+    duration_ms: float | None = None
+    _start: float = field(default_factory=time.monotonic)
+
+    def add(self, event_type: str, **data: Any) -> None:
+        """Append an event at its offset from the start of the turn."""
+        offset = round((time.monotonic() - self._start) * 1000, 1)
+        self.events.append({"t": offset, "type": event_type, **data})
+
+    def finish(self, speech: str | None) -> None:
+        """Set the final speech and the turn duration."""
+        self.speech = speech
+        self.duration_ms = round((time.monotonic() - self._start) * 1000, 1)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the trace as one JSONL record."""
+        return {
+            "kind": self.kind,
+            "started_at": self.started_at,
+            "input": self.input,
+            "events": self.events,
+            "speech": self.speech,
+            "duration_ms": self.duration_ms,
+        }
+
+
+def record_event(event_type: str, **data: Any) -> None:
+    """Add an event to the turn being traced in this context, if any."""
+    if (trace := _current_trace.get()) is not None:
+        trace.add(event_type, **data)
+
+
+def tracing() -> bool:
+    """Return True if a turn is being traced in this context."""
+    return _current_trace.get() is not None
+
+
+@contextmanager
+def activate(trace: TurnTrace | None) -> Iterator[None]:
+    """Make a trace receive the events recorded in this context."""
+    token = _current_trace.set(trace)
+    try:
+        yield
+    finally:
+        _current_trace.reset(token)
+
+
+class TraceRecorder:
+    """Write traced turns to a rotating JSONL file when enabled."""
+
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
+        """Initialize the recorder."""
+        self._hass = hass
+        self._entry = entry
+        self.path = hass.config.path(TRACE_DIR, f"{entry.entry_id}.jsonl")
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Return True if turns should be traced."""
+        return bool(self._entry.options.get(CONF_TRACE_TURNS, False))
+
+    def start(self, kind: str, **turn_input: Any) -> TurnTrace | None:
+        """Start a trace, or return None while tracing is off."""
+        return TurnTrace(kind, turn_input) if self.enabled else None
+
+    @contextmanager
+    def turn(self, kind: str, **turn_input: Any) -> Iterator[TurnTrace | None]:
+        """Trace the calls made inside the block as one turn."""
+        trace = self.start(kind, **turn_input)
+        if trace is None:
+            yield None
+            return
+        try:
+            with activate(trace):
+                yield trace
+        finally:
+            # Failed turns are the ones most worth replaying
+            self.save(trace)
+
+    def save(self, trace: TurnTrace) -> None:
+        """Append a finished trace in the background."""
+        if trace.duration_ms is None:
+            trace.finish(trace.speech)
+        line = json_dumps_bytes(trace.as_dict()) + b"\n"
+        self._hass.async_create_background_task(
+            self._async_write(line), f"{DOMAIN}_trace_write"
+        )
+
+    async def _async_write(self, line: bytes) -> None:
+        """Append a line in the executor."""
+        try:
+            await self._hass.async_add_executor_job(self._write, line)
+        except OSError as err:
+            _LOGGER.warning("Failed to write turn trace: %s", err)
+
+    def _write(self, line: bytes) -> None:
+        """Append a line, rotating the file when it grows too large."""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            try:
+                size = os.path.getsize(self.path)
+            except FileNotFoundError:
+                size = 0
+            if size + len(line) > MAX_TRACE_BYTES:
+                for index in range(TRACE_BACKUPS - 1, 0, -1):
+                    older = f"{self.path}.{index}"
+                    if os.path.exists(older):
+                        os.replace(older, f"{self.path}.{index + 1}")
+                if size:
+                    os.replace(self.path, f"{self.path}.1")
+            with open(self.path, "ab") as file:
+                file.write(line)
@@ -0,0 +1,249 @@
+"""Token and cost accounting with a daily budget."""
+
+from __future__ import annotations
+
+from collections import Counter, OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logging
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .codec import json_dumps_bytes
+from .const import CONF_DAILY_BUDGET, DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 60
+
+TOKEN_KINDS = ("input", "cached", "output", "audio_input", "audio_output")
+
+# USD per million tokens, in TOKEN_KINDS order
+MODEL_PRICES: dict[str, tuple[float, ...]] = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60, 0.0, 0.0),
+    "gpt-4o": (2.50, 1.25, 10.00, 0.0, 0.0),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60, 0.0, 0.0),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40, 0.0, 0.0),
+    "gpt-4.1": (2.00, 0.50, 8.00, 0.0, 0.0),
+    "gpt-4o-mini-realtime-preview": (0.60, 0.30, 2.40, 10.00, 20.00),
+    "gpt-4o-realtime-preview": (5.00, 2.50, 20.00, 40.00, 80.00),
+}
+
+# Rough size of a token in JSON tool results
+BYTES_PER_TOKEN = 4
+# Days and conversations kept in the store
+MAX_DAYS = 31
+MAX_CONVERSATIONS = 50
+
+# Share of the daily budget after which cheaper behaviour kicks in
+SAVING_THRESHOLD = 0.8
+BUDGET_OK = "ok"
+# Fast model only and shorter history
+BUDGET_SAVING = "saving"
+# As saving, and no Realtime audio sessions
+BUDGET_EXHAUSTED = "exhausted"
+
+_conversation: ContextVar[str | None] = ContextVar(
+    f"{DOMAIN}_usage_conversation", default=None
+)
+
+
+def model_prices(model: str) -> tuple[float, ...] | None:
+    """Return the prices of a model, matching dated snapshots by prefix."""
+    for name in sorted(MODEL_PRICES, key=len, reverse=True):
+        if model == name or model.startswith(f"{name}-"):
+            return MODEL_PRICES[name]
+    return None
+
+
+def parse_usage(usage: dict[str, Any]) -> dict[str, int]:
+    """Split a chat or Realtime usage block into billed token kinds."""
+    if "prompt_tokens" in usage:
+        total_in = usage.get("prompt_tokens") or 0
+        total_out = usage.get("completion_tokens") or 0
+        in_details = usage.get("prompt_tokens_details") or {}
+        out_details = usage.get("completion_tokens_details") or {}
+    else:
+        total_in = usage.get("input_tokens") or 0
+        total_out = usage.get("output_tokens") or 0
+        in_details = usage.get("input_token_details") or {}
+        out_details = usage.get("output_token_details") or {}
+    cached = in_details.get("cached_tokens") or 0
+    cached_audio = (in_details.get("cached_tokens_details") or {}).get(
+        "audio_tokens"
+    ) or 0
+    audio_in = (in_details.get("audio_tokens") or 0) - cached_audio
+    audio_out = out_details.get("audio_tokens") or 0
+    return {
+        "input": max(total_in - cached - audio_in, 0),
+        "cached": cached,
+        "output": max(total_out - audio_out, 0),
+        "audio_input": max(audio_in, 0),
+        "audio_output": audio_out,
+    }
+
+
+def cost(model: str, tokens: dict[str, int]) -> float:
+    """Return the USD cost of tokens, 0 for models without known prices."""
+    if (prices := model_prices(model)) is None:
+        return 0.0
+    return sum(tokens[kind] * price for kind, price in zip(TOKEN_KINDS, prices)) / 1e6
+
+
+@contextmanager
+def conversation_scope(conversation_id: str) -> Iterator[None]:
+    """Attribute usage recorded in this context to a conversation."""
+    token = _conversation.set(conversation_id)
+    try:
+        yield
+    finally:
+        _conversation.reset(token)
+
+
+def _totals() -> dict[str, float]:
+    """Return empty counters."""
+    return {**dict.fromkeys(TOKEN_KINDS, 0), "requests": 0, "cost": 0.0}
+
+
+class UsageTracker:
+    """Aggregate token usage per day, conversation and tool."""
+
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
+        """Initialize the tracker."""
+        self._entry = entry
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}.usage"
+        )
+        self._days: dict[str, dict[str, float]] = {}
+        self._conversations: OrderedDict[str, dict[str, float]] = OrderedDict()
+        # Calls and estimated result tokens per tool, the prompt inflation
+        self._tools: dict[str, Counter[str]] = {}
+        self._level = BUDGET_OK
+
+    async def async_load(self) -> None:
+        """Load persisted usage."""
+        if not (data := await self._store.async_load()):
+            return
+        self._days = data.get("days", {})
+        self._conversations = OrderedDict(data.get("conversations", {}))
+        self._tools = {
+            name: Counter(counts) for name, counts in data.get("tools", {}).items()
+        }
+
+    async def async_save(self) -> None:
+        """Write usage to disk now, e.g. on unload."""
+        await self._store.async_save(self._data_to_save())
+
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return data for the store."""
+        return {
+            "days": self._days,
+            "conversations": dict(self._conversations),
+            "tools": {name: dict(counts) for name, counts in self._tools.items()},
+        }
+
+    def record(
+        self,
+        model: str,
+        usage: dict[str, Any] | None,
+        conversation_id: str | None = None,
+    ) -> None:
+        """Add the usage of one model response."""
+        if not usage:
+            return
+        tokens = parse_usage(usage)
+        spent = cost(model, tokens)
+        conversation_id = conversation_id or _conversation.get()
+        totals = [self._today()]
+        if conversation_id is not None:
+            if conversation_id not in self._conversations:
+                self._conversations[conversation_id] = _totals()
+                while len(self._conversations) > MAX_CONVERSATIONS:
+                    self._conversations.popitem(last=False)
+            self._conversations.move_to_end(conversation_id)
+            totals.append(self._conversations[conversation_id])
+        for counters in totals:
+            for kind, count in tokens.items():
+                counters[kind] += count
+            counters["requests"] += 1
+            counters["cost"] += spent
+        if (level := self.level) != self._level:
+            _LOGGER.warning(
+                "Spent %.2f of the %.2f USD daily budget, budget level is now %s",
+                self._today()["cost"],
+                self.budget,
+                level,
+            )
+            self._level = level
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def record_tool(self, name: str, result: dict[str, Any]) -> None:
+        """Count a tool call and the tokens its result adds to the prompt."""
+        counts = self._tools.setdefault(name, Counter())
+        counts["calls"] += 1
+        counts["result_tokens"] += len(json_dumps_bytes(result)) // BYTES_PER_TOKEN
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def _today(self) -> dict[str, float]:
+        """Return today's counters, dropping days past retention."""
+        day = dt_util.now().date().isoformat()
+        if day not in self._days:
+            self._days[day] = _totals()
+            for old in sorted(self._days)[:-MAX_DAYS]:
+                del self._days[old]
+        return self._days[day]
+
+    @property
+    def today(self) -> dict[str, float]:
+        """Return a copy of today's counters."""
+        return dict(self._today())
+
+    @property
+    def budget(self) -> float:
+        """Return the daily budget in USD, 0 for none."""
+        return float(self._entry.options.get(CONF_DAILY_BUDGET) or 0)
+
+    @property
+    def level(self) -> str:
+        """Return how far today's spending is into the budget."""
+        if not (budget := self.budget):
+            return BUDGET_OK
+        spent = self._today()["cost"] / budget
+        if spent >= 1:
+            return BUDGET_EXHAUSTED
+        if spent >= SAVING_THRESHOLD:
+            return BUDGET_SAVING
+        return BUDGET_OK
+
+    def days(self, count: int) -> dict[str, float]:
+        """Return the cost of the last days that had usage."""
+        return {
+            day: round(self._days[day]["cost"], 4)
+            for day in sorted(self._days)[-count:]
+        }
+
+    def top_tools(self, count: int) -> dict[str, dict[str, int]]:
+        """Return the tools whose results added the most prompt tokens."""
+        ranked = sorted(
+            self._tools.items(),
+            key=lambda item: item[1]["result_tokens"],
+            reverse=True,
+        )
+        return {name: dict(counts) for name, counts in ranked[:count]}
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """Return usage for diagnostics."""
+        return {
+            "level": self.level,
+            "budget": self.budget,
+            "days": self._days,
+            "conversations": dict(self._conversations),
+            "tools": self.top_tools(len(self._tools)),
+        }
@@ -7,44 +7,68 @@ from typing import Any
 from aiohttp import web
 import voluptuous as vol
 
-from homeassistant.components import websocket_api
+from homeassistant.components import conversation, websocket_api
 from homeassistant.components.http import HomeAssistantView
-from homeassistant.core import HomeAssistant, callback
+from homeassistant.core import Context, HomeAssistant, callback
 
-from .const import DOMAIN, WS_PATH
+from .catalog import ToolCatalog, enabled_tools
+from .codec import json_loads, send_json
+from .const import CARD_MODE_ASSIST, DOMAIN, WS_PATH
+from .conversation import agent_entity_id, stream_sentences
+from .executor import RohlikToolExecutor
+from .prefetch import SearchCache
 from .mcp_client import RohlikMCPClient
-from .realtime_api import RealtimeAPIHandler
+from .usage import BUDGET_EXHAUSTED, UsageTracker
 
 _LOGGER = logging.getLogger(__name__)
 
+BUDGET_MESSAGE = "Denní rozpočet je vyčerpán, hlas je do zítřka vypnutý"
+
 
 class RohlikVoiceWebSocketView(HomeAssistantView):
     """WebSocket view for audio streaming."""
 
     url = WS_PATH
     name = "api:rohlik_voice:ws"
-    # TODO: Re-enable auth with proper token handling
-    # For now, disabled for local network testing
+    # Browsers cannot set headers on a WebSocket, the card passes its
+    # access token as a query parameter which is validated in get()
     requires_auth = False
 
     def __init__(self, hass: HomeAssistant) -> None:
         """Initialize the WebSocket view."""
         self.hass = hass
 
-    async def get(self, request: web.Request) -> web.WebSocketResponse:
+    async def get(self, request: web.Request) -> web.StreamResponse:
         """Handle WebSocket connection."""
+        token = request.query.get("token", "")
+        if not token or self.hass.auth.async_validate_access_token(token) is None:
+            return web.Response(status=401)
+        if not self.hass.data.get(DOMAIN):
+            return web.Response(status=503)
+
         ws = web.WebSocketResponse()
         await ws.prepare(request)
 
         # Get the integration data
         entry_id = list(self.hass.data[DOMAIN].keys())[0]
         data = self.hass.data[DOMAIN][entry_id]
-        
-        mcp_client: RohlikMCPClient = data["mcp_client"]
-        api_key: str = data["openai_api_key"]
 
-        # Audio buffer for collecting chunks
-        audio_buffer = bytearray()
+        if request.query.get("mode") == CARD_MODE_ASSIST:
+            # Local speech through an Assist pipeline, loaded on first use only
+            from .assist import AssistCardSession
+
+            entry = self.hass.config_entries.async_get_entry(entry_id)
+            await AssistCardSession(
+                self.hass, entry, ws, data["phrase_audio"]
+            ).async_handle()
+            return ws
+
+        usage: UsageTracker = data["usage"]
+        catalog: ToolCatalog = data["catalog"]
+        executor: RohlikToolExecutor = data["executor"]
+        api_key: str = data["openai_api_key"]
+        entry = self.hass.config_entries.async_get_entry(entry_id)
+        enabled = enabled_tools(entry.options)
 
         async def on_audio_delta(audio_data: bytes) -> None:
             """Handle audio response from OpenAI."""
@@ -56,78 +80,135 @@ class RohlikVoiceWebSocketView(HomeAssistantView):
         async def on_transcript(text: str) -> None:
             """Handle transcript updates."""
             try:
-                await ws.send_json({"type": "transcript", "text": text})
+                await send_json(ws, {"type": "transcript", "text": text})
             except Exception as err:
                 _LOGGER.error("Failed to send transcript: %s", err)
 
         async def on_function_call(name: str, arguments: dict) -> Any:
             """Handle function calls from the AI."""
             _LOGGER.info("Executing function: %s with args: %s", name, arguments)
-            
-            if name == "search_products":
-                return await mcp_client.search_products(
-                    keyword=arguments.get("keyword", ""),
-                )
-            elif name == "add_to_cart":
-                return await mcp_client.add_to_cart(
-                    product_id=int(arguments.get("product_id", 0)),
-                    quantity=int(arguments.get("quantity", 1)),
-                )
-            elif name == "get_cart":
-                return await mcp_client.get_cart()
-            elif name == "remove_from_cart":
-                return await mcp_client.remove_from_cart(
-                    product_id=int(arguments.get("product_id", 0)),
+            return await executor.async_execute(name, arguments, enabled)
+
+        async def on_audio_start(item_id: str) -> None:
+            """Tell the client which assistant item the next audio belongs to."""
+            try:
+                await send_json(ws, {"type": "audio_start", "item_id": item_id})
+            except Exception as err:
+                _LOGGER.error("Failed to send audio start: %s", err)
+
+        async def on_speech_started() -> None:
+            """Drop queued assistant audio on the client (barge-in)."""
+            try:
+                await send_json(ws, {"type": "flush"})
+            except Exception as err:
+                _LOGGER.error("Failed to send flush: %s", err)
+
+        search_cache: SearchCache = data["search_cache"]
+
+        def on_user_transcript(text: str, final: bool) -> None:
+            """Start product searches before the model asks for them."""
+            if "search_products" in enabled:
+                search_cache.prefetch_transcript(text, final)
+
+        # Only audio needs a Realtime session, it is opened on the first chunk
+        realtime = None
+        # Set when a session could not be opened, until the recording ends
+        audio_refused = False
+        # Typed messages continue one chat agent conversation
+        conversation_id: str | None = None
+        text_turn: asyncio.Task | None = None
+
+        async def run_text_turn(text: str) -> None:
+            """Answer a typed message while the socket keeps being read."""
+            nonlocal conversation_id
+            try:
+                conversation_id = await async_card_text_turn(
+                    self.hass, entry_id, ws, text, conversation_id
                 )
-            elif name == "update_cart_item":
-                return await mcp_client.update_cart_item(
-                    product_id=int(arguments.get("product_id", 0)),
-                    quantity=int(arguments.get("quantity", 0)),
+            except Exception as err:
+                _LOGGER.error("Text turn failed: %s", err)
+
+        async def lease_realtime() -> Any:
+            """Return the Realtime session, connecting it if needed."""
+            nonlocal realtime, audio_refused
+            if realtime is not None:
+                if realtime.connected:
+                    return realtime
+                # OpenAI closed the session, e.g. after its time limit
+                await realtime.disconnect()
+                realtime = None
+            if usage.level == BUDGET_EXHAUSTED:
+                # Realtime is the most expensive path, typed messages still work
+                await send_json(ws, {"type": "error", "message": BUDGET_MESSAGE})
+                audio_refused = True
+                return None
+
+            # Loaded on first use only
+            from .realtime_api import RealtimeAPIHandler
+
+            realtime = RealtimeAPIHandler(
+                api_key=api_key,
+                on_audio_delta=on_audio_delta,
+                on_transcript=on_transcript,
+                on_function_call=on_function_call,
+                on_audio_start=on_audio_start,
+                on_speech_started=on_speech_started,
+                on_user_transcript=on_user_transcript,
+                metrics=data["metrics"],
+                tools=catalog.llm_tools(enabled),
+                instructions=catalog.system_prompt(enabled),
+                tracer=data["trace_recorder"],
+                usage=usage,
+            )
+            if not await realtime.connect():
+                await send_json(
+                    ws, {"type": "error", "message": "Failed to connect to OpenAI"}
                 )
-            elif name == "clear_cart":
-                return await mcp_client.clear_cart()
-            else:
-                return {"error": f"Unknown function: {name}"}
-
-        # Create Realtime API handler
-        realtime = RealtimeAPIHandler(
-            api_key=api_key,
-            on_audio_delta=on_audio_delta,
-            on_transcript=on_transcript,
-            on_function_call=on_function_call,
-        )
+                realtime = None
+                audio_refused = True
+            return realtime
 
         try:
-            # Connect to OpenAI Realtime API
-            connected = await realtime.connect()
-            if not connected:
-                await ws.send_json({"type": "error", "message": "Failed to connect to OpenAI"})
-                await ws.close()
-                return ws
-
-            await ws.send_json({"type": "connected"})
+            await send_json(ws, {"type": "connected"})
 
             # Handle incoming messages
             async for msg in ws:
                 if msg.type == web.WSMsgType.BINARY:
                     # Audio data from client
-                    await realtime.send_audio(msg.data)
+                    if not audio_refused and (session := await lease_realtime()):
+                        await session.send_audio(msg.data)
                     
                 elif msg.type == web.WSMsgType.TEXT:
                     try:
-                        data = msg.json()
-                        msg_type = data.get("type", "")
+                        message = msg.json(loads=json_loads)
+                        msg_type = message.get("type", "")
                         
                         if msg_type == "audio_commit":
                             # Client finished sending audio
-                            await realtime.commit_audio()
+                            if realtime is not None and not audio_refused:
+                                await realtime.commit_audio()
+                            audio_refused = False
                             
                         elif msg_type == "text":
-                            # Text message instead of audio
-                            await realtime.send_text(data.get("text", ""))
+                            # Typed messages take the chat agent's cheaper path,
+                            # a new one replaces the turn still in progress
+                            if text_turn is not None and not text_turn.done():
+                                text_turn.cancel()
+                            text_turn = self.hass.async_create_background_task(
+                                run_text_turn(message.get("text", "")),
+                                f"{DOMAIN}_card_text_turn",
+                            )
+                            
+                        elif msg_type == "playback":
+                            # Played-out offset of the current assistant item
+                            if realtime is not None:
+                                realtime.report_playback(
+                                    message.get("item_id", ""),
+                                    message.get("played_ms", 0),
+                                )
                             
                         elif msg_type == "ping":
-                            await ws.send_json({"type": "pong"})
+                            await send_json(ws, {"type": "pong"})
                             
                     except Exception as err:
                         _LOGGER.error("Error processing message: %s", err)
@@ -139,11 +220,49 @@ class RohlikVoiceWebSocketView(HomeAssistantView):
         except Exception as err:
             _LOGGER.error("WebSocket handler error: %s", err)
         finally:
-            await realtime.disconnect()
+            if text_turn is not None:
+                text_turn.cancel()
+            if realtime is not None:
+                await realtime.disconnect()
 
         return ws
 
 
+async def async_card_text_turn(
+    hass: HomeAssistant,
+    entry_id: str,
+    ws: web.WebSocketResponse,
+    text: str,
+    conversation_id: str | None,
+) -> str | None:
+    """Answer a typed card message with the chat agent, as transcript frames.
+
+    Returns the conversation id to continue with.
+    """
+    streamed = False
+
+    async def on_sentence(sentence: str) -> None:
+        """Send each reply sentence as soon as it is complete."""
+        nonlocal streamed
+        streamed = True
+        await send_json(ws, {"type": "transcript", "text": sentence})
+
+    with stream_sentences(on_sentence):
+        result = await conversation.async_converse(
+            hass,
+            text,
+            conversation_id,
+            Context(),
+            language=hass.config.language,
+            agent_id=agent_entity_id(hass, entry_id),
+        )
+    if not streamed:
+        # Cached plans and non-streaming Home Assistant versions reply at once
+        speech = result.response.speech.get("plain", {}).get("speech", "")
+        await send_json(ws, {"type": "transcript", "text": speech})
+    return result.conversation_id
+
+
 @callback
 def async_register_websocket_api(hass: HomeAssistant) -> None:
     """Register WebSocket API endpoints."""
@@ -0,0 +1,245 @@
+"""Durable queue of cart writes made while Rohlik is unreachable."""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import asdict, dataclass
+import logging
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+from .mcp_client import RohlikMCPClient
+from .parsers import parse_cart
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+
+# Writes older than this are dropped instead of replayed
+MAX_QUEUE_AGE = 24 * 3600
+
+QUEUED_MESSAGE = (
+    "Rohlík je teď nedostupný. Změnu jsem si poznamenal a provedu ji, "
+    "jakmile bude zase k dispozici."
+)
+
+
+def _applied(result: dict[str, Any]) -> bool:
+    """Return True if a write reached the server and succeeded."""
+    return "error" not in result and not result.get("isError")
+
+
+@dataclass(slots=True)
+class PendingWrite:
+    """Net change of one cart line since the queue was last flushed."""
+
+    product_id: int
+    # Quantity added on top of the cart line
+    delta: int = 0
+    # Absolute quantity, set by update and remove; delta applies on top
+    target: int | None = None
+    # A timed-out call may already have reached the server
+    uncertain: bool = False
+    queued_at: float = 0.0
+
+
+class WriteQueue:
+    """Coalesce cart writes per product and replay them in bulk on recovery."""
+
+    def __init__(
+        self, hass: HomeAssistant, entry_id: str, mcp_client: RohlikMCPClient
+    ) -> None:
+        """Initialize the queue."""
+        self._hass = hass
+        self._mcp_client = mcp_client
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.write_queue"
+        )
+        self._pending: dict[int, PendingWrite] = {}
+        # Writes being replayed, new writes still wait behind them
+        self._replaying: dict[int, PendingWrite] = {}
+        # Whole cart cleared before the pending writes
+        self._clear = False
+        self._lock = asyncio.Lock()
+        # A write was queued behind a replay, replay again when it ends
+        self._replay_again = False
+
+    def __len__(self) -> int:
+        """Return the number of queued cart lines, including those replaying."""
+        return len(self._pending.keys() | self._replaying.keys()) + self._clear
+
+    async def async_load(self) -> None:
+        """Load writes queued before a restart."""
+        data = await self._store.async_load()
+        if not data:
+            return
+        self._clear = data["clear"]
+        for values in data["pending"]:
+            write = PendingWrite(**values)
+            self._pending[write.product_id] = write
+        if self:
+            _LOGGER.info("%d queued cart writes waiting for Rohlik", len(self))
+
+    async def _async_save(self) -> None:
+        """Persist the queue."""
+        await self._store.async_save(
+            {
+                "clear": self._clear,
+                "pending": [asdict(write) for write in self._pending.values()],
+            }
+        )
+
+    def _write(self, product_id: int) -> PendingWrite:
+        """Return the pending write of a product, creating it."""
+        if (write := self._pending.get(product_id)) is None:
+            write = self._pending[product_id] = PendingWrite(
+                product_id, queued_at=time.time()
+            )
+        return write
+
+    async def async_enqueue(
+        self, tool_name: str, arguments: dict[str, Any], uncertain: bool = False
+    ) -> dict[str, Any]:
+        """Queue a cart write, merging it into the net change of its product."""
+        if tool_name == "clear_cart":
+            self._pending.clear()
+            self._clear = True
+        elif tool_name == "add_items_to_cart":
+            for item in arguments["items"]:
+                write = self._write(int(item["productId"]))
+                write.delta += int(item["quantity"])
+                write.uncertain |= uncertain
+        elif tool_name == "update_cart_item":
+            write = self._write(int(arguments["product_id"]))
+            write.target, write.delta = int(arguments["quantity"]), 0
+        elif tool_name == "remove_cart_item":
+            write = self._write(int(arguments["product_id"]))
+            write.target, write.delta = 0, 0
+        else:
+            raise ValueError(f"Cannot queue {tool_name}")
+        await self._async_save()
+        _LOGGER.debug("Queued %s, %d cart writes pending", tool_name, len(self))
+        if self._lock.locked():
+            self._replay_again = True
+        elif not self._mcp_client.retry_in:
+            # Queued behind earlier writes while the server is back
+            self._async_schedule_replay()
+        return {"queued": True, "message": QUEUED_MESSAGE}
+
+    def _async_schedule_replay(self) -> None:
+        """Replay in the background."""
+        self._hass.async_create_background_task(
+            self.async_replay(), f"{DOMAIN}_write_queue_replay"
+        )
+
+    def observe(
+        self, tool_name: str, arguments: dict[str, Any], result: dict[str, Any]
+    ) -> None:
+        """Replay queued writes once any call succeeds again."""
+        if self and not self._lock.locked():
+            self._async_schedule_replay()
+
+    async def async_replay(self) -> None:
+        """Apply the queued writes if Rohlik is reachable."""
+        if not self or self._mcp_client.retry_in or self._lock.locked():
+            return
+        async with self._lock:
+            await self._async_replay()
+        if self._replay_again:
+            self._replay_again = False
+            self._async_schedule_replay()
+
+    async def _async_replay(self) -> None:
+        """Replay queued writes with as few calls as possible."""
+        mcp_client = self._mcp_client
+        now = time.time()
+        stale = [
+            product_id
+            for product_id, write in self._pending.items()
+            if now - write.queued_at > MAX_QUEUE_AGE
+        ]
+        for product_id in stale:
+            _LOGGER.warning("Dropping cart write for %s, queued too long", product_id)
+            del self._pending[product_id]
+
+        if self._clear:
+            if not _applied(await mcp_client.clear_cart()):
+                return
+            self._clear = False
+            await self._async_save()
+        if not self._pending:
+            return
+
+        # Writes queued during the replay collect separately
+        batch, self._pending = self._pending, {}
+        self._replaying = batch
+        done: set[int] = set()
+        try:
+            await self._async_apply(batch, done)
+        finally:
+            self._replaying = {}
+            for product_id, write in batch.items():
+                if product_id not in done:
+                    self._merge_back(write)
+            await self._async_save()
+        _LOGGER.info(
+            "Replayed %d queued cart writes, %d still pending", len(done), len(self)
+        )
+
+    def _merge_back(self, write: PendingWrite) -> None:
+        """Return an unapplied write to the queue, before any newer one."""
+        if self._clear:
+            # The cart was cleared after this write
+            return
+        later = self._pending.get(write.product_id)
+        if later is None:
+            self._pending[write.product_id] = write
+        elif later.target is None:
+            later.target = write.target
+            later.delta += write.delta
+            later.uncertain |= write.uncertain
+            later.queued_at = write.queued_at
+
+    async def _async_apply(
+        self, batch: dict[int, PendingWrite], done: set[int]
+    ) -> None:
+        """Apply a batch of writes, adding applied product ids to done."""
+        mcp_client = self._mcp_client
+        # The cart decides which writes are still needed
+        cart = parse_cart(await mcp_client.get_cart())
+        if cart is None:
+            return
+        in_cart = {item.id: item.quantity or 0 for item in cart.items}
+
+        additions: list[tuple[int, int]] = []
+        for write in batch.values():
+            current = in_cart.get(write.product_id, 0)
+            if write.target is None:
+                if write.uncertain and current >= write.delta:
+                    # The timed-out add most likely made it to the cart
+                    done.add(write.product_id)
+                else:
+                    additions.append((write.product_id, write.delta))
+                continue
+            wanted = write.target + write.delta
+            if wanted == current:
+                done.add(write.product_id)
+            elif wanted == 0:
+                result = await mcp_client.remove_from_cart(write.product_id)
+                if _applied(result):
+                    done.add(write.product_id)
+            elif current == 0:
+                additions.append((write.product_id, wanted))
+            else:
+                result = await mcp_client.update_cart_item(write.product_id, wanted)
+                if _applied(result):
+                    done.add(write.product_id)
+
+        if additions:
+            result = await mcp_client.add_items_to_cart(additions)
+            if _applied(result):
+                done.update(product_id for product_id, _ in additions)
@@ -0,0 +1,43 @@
+"""Tests for the chat agent helpers."""
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.rohlik_voice.conversation import _trace_request  # noqa: E402
+from custom_components.rohlik_voice.trace import (  # noqa: E402
+    TRACE_AGENT,
+    TurnTrace,
+    activate,
+    record_event,
+)
+
+SYSTEM = {"role": "system", "content": "Jsi nákupní asistent."}
+HISTORY = [
+    {"role": "user", "content": "Ahoj"},
+    {"role": "assistant", "content": "Dobrý den."},
+]
+USER = {"role": "user", "content": "Co mám v košíku?"}
+TOOL = {
+    "type": "function",
+    "function": {"name": "get_cart", "description": "", "parameters": {}},
+}
+
+
+@pytest.mark.parametrize("tools", [None, [TOOL]])
+def test_traced_request_is_a_snapshot(tools: list | None) -> None:
+    """Messages the turn appends later do not leak into the first request."""
+    payload = {"model": "gpt-4o-mini", "messages": [SYSTEM, *HISTORY, USER]}
+    if tools:
+        payload["tools"] = tools
+    trace = TurnTrace(TRACE_AGENT, {"text": USER["content"]})
+    with activate(trace):
+        record_event("openai", request=_trace_request(payload))
+
+    # What the agent does after the first completion asked for a tool
+    payload["messages"].append({"role": "assistant", "tool_calls": []})
+    payload["messages"].append({"role": "tool", "content": "{}"})
+
+    request = trace.as_dict()["events"][0]["request"]
+    assert request["messages"] == [SYSTEM, *HISTORY, USER]
+    assert request.get("tools") == (["get_cart"] if tools else None)
@@ -0,0 +1,113 @@
+"""Tests for the learned tool-call plan cache."""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.rohlik_voice import plan_cache  # noqa: E402
+from custom_components.rohlik_voice.plan_cache import (  # noqa: E402
+    PRODUCT_SLOT,
+    QUANTITY_SLOT,
+    PlanCache,
+)
+
+ENABLED = {"search_products", "add_to_cart", "get_cart", "clear_cart"}
+
+
+@pytest.fixture
+def cache(monkeypatch: pytest.MonkeyPatch) -> PlanCache:
+    """Return a plan cache that does not write to disk."""
+    monkeypatch.setattr(plan_cache, "Store", MagicMock())
+    return PlanCache(MagicMock(), "entry")
+
+
+def test_template_slots_product_and_quantity() -> None:
+    """Quantity and product words become slots, the rest stays literal."""
+    assert PlanCache.template(
+        "Přidej dva rohlíky",
+        [("add_to_cart", {"keyword": "rohlíky", "quantity": 2})],
+    ) == (
+        f"pridej {QUANTITY_SLOT} {PRODUCT_SLOT}",
+        [("add_to_cart", {"keyword": PRODUCT_SLOT, "quantity": QUANTITY_SLOT})],
+    )
+
+
+def test_template_rejects_slots_only() -> None:
+    """An utterance that is all product would match anything."""
+    plan = [("search_products", {"keyword": "mléko"})]
+    assert PlanCache.template("mléko", plan) is None
+    assert (
+        PlanCache.template(
+            "dva rohlíky", [("add_to_cart", {"keyword": "rohlíky", "quantity": 2})]
+        )
+        is None
+    )
+
+
+def test_template_rejects_context_arguments() -> None:
+    """Plans that refer to earlier results are not cached."""
+    plan = [("add_to_cart", {"product_id": 1})]
+    assert PlanCache.template("přidej ho", plan) is None
+
+
+def test_candidates_keep_a_literal_word(cache: PlanCache) -> None:
+    """No candidate key consists of slots only."""
+    candidates = cache._candidates("vyprázdni košík")
+    assert candidates[0] == ("vyprazdni kosik", {})
+    assert all(
+        set(key.split()) - {PRODUCT_SLOT, QUANTITY_SLOT} for key, _ in candidates
+    )
+    assert (f"vyprazdni {PRODUCT_SLOT}", {PRODUCT_SLOT: "košík"}) in candidates
+    assert cache._candidates("mléko") == [("mleko", {})]
+
+
+def test_lookup_needs_confirmations(cache: PlanCache) -> None:
+    """A plan is served only after the model made it repeatedly."""
+    plan = [("search_products", {"keyword": "mléko"})]
+    cache.learn("najdi mléko", plan)
+    assert cache.lookup("najdi máslo", ENABLED) is None
+    cache.learn("najdi mléko", plan)
+    assert cache.lookup("najdi máslo", ENABLED) == (
+        f"najdi {PRODUCT_SLOT}",
+        [("search_products", {"keyword": "máslo"})],
+    )
+
+
+def test_lookup_ignores_unrelated_utterances(cache: PlanCache) -> None:
+    """A learned product search does not answer other commands."""
+    for _ in range(2):
+        cache.learn("mléko", [("search_products", {"keyword": "mléko"})])
+        cache.learn("najdi mléko", [("search_products", {"keyword": "mléko"})])
+    assert cache.lookup("vyprázdni košík", ENABLED) is None
+    assert cache.lookup("kolik mám v košíku", ENABLED) is None
+
+
+def test_lookup_skips_disabled_tools(cache: PlanCache) -> None:
+    """Plans using a disabled tool are not served."""
+    for _ in range(2):
+        cache.learn("co mám v košíku", [("get_cart", {})])
+    assert cache.lookup("co mám v košíku", ENABLED - {"get_cart"}) is None
+    assert cache.lookup("co mám v košíku", ENABLED) == (
+        "co mam v kosiku",
+        [("get_cart", {})],
+    )
+
+
+@pytest.mark.parametrize("text", ["ano", "Jo!", "ok", "jo, ano"])
+def test_confirmations_are_not_learned(cache: PlanCache, text: str) -> None:
+    """A bare yes answers the previous question, not a fixed plan."""
+    plan = [("get_cart", {})]
+    assert PlanCache.template(text, plan) is None
+    for _ in range(2):
+        assert cache.learn(text, plan) is None
+    assert cache.lookup(text, ENABLED) is None
+    assert len(cache) == 0
+
+
+def test_destructive_tools_are_not_learned(cache: PlanCache) -> None:
+    """Clearing the cart always goes through the model."""
+    for _ in range(2):
+        assert cache.learn("vyprázdni košík", [("clear_cart", {})]) is None
+    assert cache.lookup("vyprázdni košík", ENABLED) is None
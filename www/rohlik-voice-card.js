@@ -5,8 +5,172 @@
  * type: custom:rohlik-voice-card
  * show_cart: true
  * show_transcript: true
+ * mode: realtime   # or "assist": local speech through a Home Assistant Assist pipeline
  */
 
+const SAMPLE_RATE = 24000;
+
+/**
+ * Gapless PCM16 player on a single persistent AudioContext.
+ *
+ * Incoming chunks are held in a small jitter buffer until `targetDepthMs`
+ * of audio is queued, then scheduled back to back on the context clock so
+ * consecutive buffers play without gaps. Conversion to float reuses one
+ * scratch buffer, and `flush()` stops everything immediately (barge-in).
+ */
+class PcmPlayer {
+  constructor({ sampleRate = SAMPLE_RATE, targetDepthMs = 120, onIdle = null } = {}) {
+    this._sampleRate = sampleRate;
+    this._targetDepth = targetDepthMs / 1000;
+    this._onIdle = onIdle;
+    this._context = null;
+    this._pending = [];
+    this._pendingDuration = 0;
+    this._sources = new Set();
+    this._nextTime = 0;
+    this._playing = false;
+    this._drainTimer = null;
+    this._scratch = new Float32Array(4096);
+    this._queuedSec = 0;
+    this._playedSec = 0;
+    this._itemStartSec = 0;
+  }
+
+  get context() {
+    if (!this._context || this._context.state === 'closed') {
+      this._context = new AudioContext({ sampleRate: this._sampleRate });
+    }
+    if (this._context.state === 'suspended') {
+      this._context.resume();
+    }
+    return this._context;
+  }
+
+  get active() {
+    return this._playing || this._pending.length > 0;
+  }
+
+  /** Milliseconds of the current item that have actually been played out. */
+  get itemPlayedMs() {
+    return Math.max(0, this._totalPlayedSec() - this._itemStartSec) * 1000;
+  }
+
+  /** Mark that the following chunks belong to a new assistant item. */
+  startItem() {
+    this._itemStartSec = this._queuedSec;
+  }
+
+  enqueue(arrayBuffer) {
+    const samples = arrayBuffer.byteLength >> 1;
+    if (samples === 0) return;
+
+    const ctx = this.context;
+    const pcm = new Int16Array(arrayBuffer, 0, samples);
+    if (this._scratch.length < samples) {
+      this._scratch = new Float32Array(samples);
+    }
+    const scratch = this._scratch;
+    for (let i = 0; i < samples; i++) {
+      scratch[i] = pcm[i] / 32768;
+    }
+
+    const buffer = ctx.createBuffer(1, samples, this._sampleRate);
+    buffer.copyToChannel(scratch.subarray(0, samples), 0);
+    this._queuedSec += buffer.duration;
+
+    if (this._playing && this._nextTime >= ctx.currentTime) {
+      this._schedule(buffer);
+      return;
+    }
+
+    // Not playing (or underrun): refill the jitter buffer first
+    this._playing = false;
+    this._pending.push(buffer);
+    this._pendingDuration += buffer.duration;
+    if (this._pendingDuration >= this._targetDepth) {
+      this._drain();
+    } else if (!this._drainTimer) {
+      // Short replies may never reach the target depth
+      this._drainTimer = setTimeout(() => this._drain(), this._targetDepth * 1000);
+    }
+  }
+
+  flush() {
+    // Whatever was not heard yet is dropped from the position accounting
+    this._playedSec = this._totalPlayedSec();
+    this._queuedSec = this._playedSec;
+    clearTimeout(this._drainTimer);
+    this._drainTimer = null;
+    this._pending = [];
+    this._pendingDuration = 0;
+    for (const source of this._sources) {
+      source.onended = null;
+      try {
+        source.stop();
+      } catch (err) {
+        // Source was never started or already stopped
+      }
+      source.disconnect();
+    }
+    this._sources.clear();
+    this._playing = false;
+    this._nextTime = 0;
+  }
+
+  async close() {
+    this.flush();
+    if (this._context) {
+      await this._context.close();
+      this._context = null;
+    }
+  }
+
+  _drain() {
+    clearTimeout(this._drainTimer);
+    this._drainTimer = null;
+    if (this._pending.length === 0) return;
+
+    // Small lead so the first buffer is never scheduled in the past
+    this._nextTime = this.context.currentTime + 0.02;
+    this._playing = true;
+    for (const buffer of this._pending) {
+      this._schedule(buffer);
+    }
+    this._pending = [];
+    this._pendingDuration = 0;
+  }
+
+  _schedule(buffer) {
+    const source = this._context.createBufferSource();
+    source.buffer = buffer;
+    source.connect(this._context.destination);
+    source._startAt = this._nextTime;
+    source.onended = () => {
+      this._playedSec += buffer.duration;
+      this._sources.delete(source);
+      source.disconnect();
+      if (this._sources.size === 0 && this._pending.length === 0) {
+        this._playing = false;
+        if (this._onIdle) this._onIdle();
+      }
+    };
+    source.start(this._nextTime);
+    this._nextTime += buffer.duration;
+    this._sources.add(source);
+  }
+
+  _totalPlayedSec() {
+    let played = this._playedSec;
+    if (this._context) {
+      const now = this._context.currentTime;
+      for (const source of this._sources) {
+        played += Math.min(Math.max(now - source._startAt, 0), source.buffer.duration);
+      }
+    }
+    return played;
+  }
+}
+
 class RohlikVoiceCard extends HTMLElement {
   constructor() {
     super();
@@ -15,13 +179,13 @@ class RohlikVoiceCard extends HTMLElement {
     this._hass = null;
     this._ws = null;
     this._mediaRecorder = null;
-    this._audioContext = null;
     this._isRecording = false;
     this._isConnected = false;
     this._transcript = '';
     this._cartItems = [];
-    this._audioQueue = [];
-    this._isPlaying = false;
+    this._player = new PcmPlayer({ onIdle: () => this._onPlaybackIdle() });
+    this._playbackItemId = null;
+    this._playbackTimer = null;
   }
 
   static get properties() {
@@ -35,6 +199,7 @@ class RohlikVoiceCard extends HTMLElement {
     this._config = {
       show_cart: true,
       show_transcript: true,
+      mode: 'realtime',
       ...config,
     };
     this._render();
@@ -306,6 +471,11 @@ class RohlikVoiceCard extends HTMLElement {
   async _startRecording() {
     if (this._isRecording) return;
     
+    // Barge-in: stop the assistant immediately when the user takes over
+    if (this._player.active) {
+      this._flushPlayback();
+    }
+    
     const micButton = this.shadowRoot.getElementById('micButton');
     const status = this.shadowRoot.getElementById('status');
     const waveform = this.shadowRoot.getElementById('waveform');
@@ -329,10 +499,10 @@ class RohlikVoiceCard extends HTMLElement {
         }
       });
       
-      // Create AudioContext for processing
-      this._audioContext = new AudioContext({ sampleRate: 24000 });
-      const source = this._audioContext.createMediaStreamSource(stream);
-      const processor = this._audioContext.createScriptProcessor(4096, 1, 1);
+      // Capture shares the player's persistent AudioContext
+      const audioContext = this._player.context;
+      const source = audioContext.createMediaStreamSource(stream);
+      const processor = audioContext.createScriptProcessor(4096, 1, 1);
       
       processor.onaudioprocess = (e) => {
         if (this._isRecording && this._ws && this._ws.readyState === WebSocket.OPEN) {
@@ -347,9 +517,10 @@ class RohlikVoiceCard extends HTMLElement {
       };
       
       source.connect(processor);
-      processor.connect(this._audioContext.destination);
+      processor.connect(audioContext.destination);
       
       this._stream = stream;
+      this._source = source;
       this._processor = processor;
       this._isRecording = true;
       
@@ -383,16 +554,16 @@ class RohlikVoiceCard extends HTMLElement {
       this._processor = null;
     }
     
+    if (this._source) {
+      this._source.disconnect();
+      this._source = null;
+    }
+    
     if (this._stream) {
       this._stream.getTracks().forEach(track => track.stop());
       this._stream = null;
     }
     
-    if (this._audioContext) {
-      await this._audioContext.close();
-      this._audioContext = null;
-    }
-    
     // Tell server we're done sending audio
     if (this._ws && this._ws.readyState === WebSocket.OPEN) {
       this._ws.send(JSON.stringify({ type: 'audio_commit' }));
@@ -404,7 +575,8 @@ class RohlikVoiceCard extends HTMLElement {
       const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
       // Add authentication token to WebSocket URL
       const token = this._hass?.auth?.data?.access_token || '';
-      const wsUrl = `${protocol}//${window.location.host}/api/rohlik_voice/ws?token=${token}`;
+      const mode = encodeURIComponent(this._config.mode);
+      const wsUrl = `${protocol}//${window.location.host}/api/rohlik_voice/ws?token=${token}&mode=${mode}`;
       
       this._ws = new WebSocket(wsUrl);
       this._ws.binaryType = 'arraybuffer';
@@ -415,9 +587,12 @@ class RohlikVoiceCard extends HTMLElement {
       
       this._ws.onmessage = async (event) => {
         if (event.data instanceof ArrayBuffer) {
-          // Audio data - queue for playback
-          this._audioQueue.push(event.data);
-          this._playAudioQueue();
+          // Audio data - schedule for gapless playback
+          if (!this._player.active) {
+            this.shadowRoot.getElementById('status').textContent = 'Přehrávám odpověď...';
+            this._startPlaybackReports();
+          }
+          this._player.enqueue(event.data);
         } else {
           // JSON message
           const data = JSON.parse(event.data);
@@ -425,6 +600,11 @@ class RohlikVoiceCard extends HTMLElement {
           if (data.type === 'connected') {
             this._isConnected = true;
             resolve();
+          } else if (data.type === 'audio_start') {
+            this._playbackItemId = data.item_id;
+            this._player.startItem();
+          } else if (data.type === 'flush') {
+            this._flushPlayback();
           } else if (data.type === 'transcript') {
             this._updateTranscript(data.text);
           } else if (data.type === 'error') {
@@ -456,48 +636,40 @@ class RohlikVoiceCard extends HTMLElement {
     });
   }
 
-  async _playAudioQueue() {
-    if (this._isPlaying || this._audioQueue.length === 0) return;
-    
-    this._isPlaying = true;
-    const status = this.shadowRoot.getElementById('status');
-    status.textContent = 'Přehrávám odpověď...';
+  _startPlaybackReports() {
+    if (this._playbackTimer) return;
+    this._playbackTimer = setInterval(() => this._reportPlayback(), 250);
+  }
+
+  _stopPlaybackReports() {
+    clearInterval(this._playbackTimer);
+    this._playbackTimer = null;
+  }
+
+  _reportPlayback() {
+    // Server uses the played-out offset to truncate the item on barge-in
+    if (!this._playbackItemId || !this._ws || this._ws.readyState !== WebSocket.OPEN) return;
+    this._ws.send(JSON.stringify({
+      type: 'playback',
+      item_id: this._playbackItemId,
+      played_ms: Math.round(this._player.itemPlayedMs),
+    }));
+  }
+
+  _flushPlayback() {
+    this._player.flush();
+    this._reportPlayback();
+    this._stopPlaybackReports();
+  }
+
+  _onPlaybackIdle() {
+    this._reportPlayback();
+    this._stopPlaybackReports();
     
-    try {
-      const audioContext = new AudioContext({ sampleRate: 24000 });
-      
-      while (this._audioQueue.length > 0) {
-        const audioData = this._audioQueue.shift();
-        const pcmData = new Int16Array(audioData);
-        const floatData = new Float32Array(pcmData.length);
-        
-        for (let i = 0; i < pcmData.length; i++) {
-          floatData[i] = pcmData[i] / 32768;
-        }
-        
-        const audioBuffer = audioContext.createBuffer(1, floatData.length, 24000);
-        audioBuffer.getChannelData(0).set(floatData);
-        
-        const source = audioContext.createBufferSource();
-        source.buffer = audioBuffer;
-        source.connect(audioContext.destination);
-        source.start();
-        
-        // Wait for playback to complete
-        await new Promise(resolve => {
-          source.onended = resolve;
-        });
-      }
-      
-      await audioContext.close();
-      
-    } catch (err) {
-      console.error('Audio playback error:', err);
+    if (!this._isRecording) {
+      this.shadowRoot.getElementById('status').textContent = 'Klikněte pro nahrávání';
     }
     
-    this._isPlaying = false;
-    this.shadowRoot.getElementById('status').textContent = 'Klikněte pro nahrávání';
-    
     // Refresh cart after response
     this._updateCart();
   }
@@ -538,6 +710,12 @@ class RohlikVoiceCard extends HTMLElement {
     }
   }
 
+  disconnectedCallback() {
+    // Release the AudioContext; it is recreated lazily when needed again
+    this._stopPlaybackReports();
+    this._player.close();
+  }
+
   getCardSize() {
     return 4;
   }